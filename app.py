@@ -1,12 +1,11 @@
 import os
-import cv2
+import click
 import numpy as np
 from datetime import datetime
 from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, Response
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
 from werkzeug.security import check_password_hash, generate_password_hash
 from werkzeug.utils import secure_filename
-import time
 import threading
 
 # Import configuration
@@ -16,16 +15,21 @@ import config
 from database import (
     db, init_db, User, Vehicle, PlateImage, Face, AccessLog,
     register_vehicle, save_plate_image, save_face_image, log_access,
-    get_all_vehicles, get_all_users, find_vehicle_by_plate
+    get_all_vehicles, get_all_users, find_vehicle_by_plate, get_plate_index,
+    get_access_event_writer
 )
 
 # Import hardware interfaces
-from hardware import get_camera, get_relay_controller
+from hardware import (
+    get_cameras, get_relay_controller, get_relay_controllers,
+    get_frame_broadcaster, get_frame_broadcasters
+)
 
 # Import recognition modules
 from recognition import (
     get_plate_recognizer, get_plate_detection_service,
-    get_face_recognizer, get_face_detection_service
+    get_face_recognizer, get_face_detection_service,
+    get_worker_pool, get_enrollment_worker, migrate_legacy_encodings
 )
 
 # Initialize Flask app
@@ -40,9 +44,10 @@ login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = 'login'
 
-# Global detection services
-plate_detection_service = None
-face_detection_service = None
+# Global detection services, keyed by camera id
+plate_detection_services = {}
+face_detection_services = {}
+services_started = False
 
 # User loader for Flask-Login
 @login_manager.user_loader
@@ -50,29 +55,22 @@ def load_user(user_id):
     return User.query.get(int(user_id))
 
 # Helper function for generating camera frames
-def generate_camera_frames():
-    """Generate frames from the camera for video streaming"""
-    camera = get_camera()
-    
-    # Start camera if not already running
-    if not camera.is_running:
-        camera.start()
-    
-    while True:
-        # Get frame from camera
-        frame = camera.get_frame()
-        if frame is None:
-            time.sleep(0.1)
-            continue
-        
-        # Encode frame as JPEG
-        ret, jpeg = cv2.imencode('.jpg', frame)
-        if not ret:
-            continue
-            
-        # Convert to bytes
-        yield (b'--frame\r\n'
-               b'Content-Type: image/jpeg\r\n\r\n' + jpeg.tobytes() + b'\r\n')
+def generate_camera_frames(profile=None, remote_addr=None, camera_id=None):
+    """
+    Generate frames from a camera for video streaming
+    Viewers of the same camera and profile share one broadcaster, so each frame is encoded once per profile
+    """
+    return get_frame_broadcaster(profile, camera_id).stream(remote_addr)
+
+def stream_arguments():
+    """Camera id and stream profile selected by the request, falling back to the defaults"""
+    camera_id = request.args.get('camera', config.DEFAULT_CAMERA_ID)
+    if camera_id not in config.CAMERAS:
+        camera_id = config.DEFAULT_CAMERA_ID
+    profile = request.args.get('profile', config.STREAM_DEFAULT_PROFILE)
+    if profile not in config.STREAM_PROFILES:
+        profile = config.STREAM_DEFAULT_PROFILE
+    return camera_id, profile
 
 # Routes
 @app.route('/')
@@ -213,6 +211,9 @@ def edit_user(user_id):
         
         db.session.commit()
         
+        # Deactivation, reactivation and renames take effect without a full reload
+        get_face_recognizer().update_user(user)
+        
         flash('User updated successfully', 'success')
         return redirect(url_for('users') if current_user.role == 'admin' else url_for('index'))
     
@@ -237,6 +238,9 @@ def delete_user(user_id):
     db.session.delete(user)
     db.session.commit()
     
+    # Forget the user's faces in the recognizer
+    get_face_recognizer().remove_user(user_id)
+    
     flash('User deleted successfully', 'success')
     return redirect(url_for('users'))
 
@@ -244,13 +248,21 @@ def delete_user(user_id):
 @app.route('/vehicles')
 @login_required
 def vehicles():
-    """List all vehicles"""
-    if current_user.role == 'admin':
-        vehicles = Vehicle.query.all()
+    """List all vehicles, optionally filtered by a fuzzy plate search"""
+    query = Vehicle.query
+    if current_user.role != 'admin':
+        query = query.filter_by(owner_id=current_user.id)
+    
+    search = request.args.get('q', '').strip()
+    if search:
+        # Rank by the plate index, tolerant of 0/O, 1/I, 8/B style confusions
+        vehicle_ids = get_plate_index().search(search)
+        found = {vehicle.id: vehicle for vehicle in query.filter(Vehicle.id.in_(vehicle_ids)).all()}
+        vehicles = [found[vehicle_id] for vehicle_id in vehicle_ids if vehicle_id in found]
     else:
-        vehicles = Vehicle.query.filter_by(owner_id=current_user.id).all()
+        vehicles = query.all()
     
-    return render_template('plates/index.html', vehicles=vehicles)
+    return render_template('plates/index.html', vehicles=vehicles, search=search)
 
 @app.route('/vehicles/add', methods=['GET', 'POST'])
 @login_required
@@ -341,6 +353,10 @@ def edit_vehicle(vehicle_id):
         
         db.session.commit()
         
+        # Keep the plate indexes in sync with plate string and active status
+        get_plate_index().update(vehicle)
+        get_plate_recognizer().update_vehicle(vehicle)
+        
         # Handle plate image upload
         plate_image = request.files.get('plate_image')
         if plate_image and plate_image.filename:
@@ -372,6 +388,10 @@ def delete_vehicle(vehicle_id):
     db.session.delete(vehicle)
     db.session.commit()
     
+    # Drop it from the plate indexes
+    get_plate_index().remove(vehicle_id)
+    get_plate_recognizer().remove_vehicle(vehicle_id)
+    
     flash('Vehicle deleted successfully', 'success')
     return redirect(url_for('vehicles'))
 
@@ -413,6 +433,9 @@ def delete_plate_image(vehicle_id, plate_id):
     db.session.delete(plate_image)
     db.session.commit()
     
+    # Drop the template from the plate recognizer
+    get_plate_recognizer().remove_plate_image(plate_id)
+    
     flash('Plate image deleted successfully', 'success')
     return redirect(url_for('vehicle_plates', vehicle_id=vehicle_id))
 
@@ -443,13 +466,13 @@ def add_face():
         face_image = request.files.get('face_image')
         if face_image and face_image.filename:
             image_data = face_image.read()
-            save_face_image(user_id, image_data)
+            face = save_face_image(user_id, image_data)
             
-            # Reload face recognizer
-            face_recognizer = get_face_recognizer()
-            face_recognizer.load_face_encodings()
+            # Encoding happens in the background; the worker adds the face to the gallery when done
+            if face:
+                get_enrollment_worker().submit(face.id)
             
-            flash('Face added successfully', 'success')
+            flash('Face uploaded; it will be usable for recognition once enrollment finishes', 'success')
             return redirect(url_for('faces'))
         else:
             flash('No face image provided', 'danger')
@@ -483,9 +506,8 @@ def delete_face(face_id):
     db.session.delete(face)
     db.session.commit()
     
-    # Reload face recognizer
-    face_recognizer = get_face_recognizer()
-    face_recognizer.load_face_encodings()
+    # Drop the face from the recognizer's gallery and index incrementally
+    get_face_recognizer().remove_face(face_id)
     
     flash('Face deleted successfully', 'success')
     return redirect(url_for('faces'))
@@ -511,15 +533,18 @@ def access_logs():
 @app.route('/video_feed')
 @login_required
 def video_feed():
-    """Video streaming route for the camera"""
-    return Response(generate_camera_frames(),
+    """Video streaming route; ?camera= selects the camera, ?profile= thumbnail, preview or full"""
+    camera_id, profile = stream_arguments()
+    return Response(generate_camera_frames(profile, request.remote_addr, camera_id),
                     mimetype='multipart/x-mixed-replace; boundary=frame')
 
 @app.route('/camera')
 @login_required
 def camera():
     """Camera monitoring page"""
-    return render_template('camera.html')
+    camera_id, profile = stream_arguments()
+    return render_template('camera.html', camera_id=camera_id, cameras=list(config.CAMERAS),
+                           profile=profile, profiles=list(config.STREAM_PROFILES))
 
 # Testing routes for manual control
 @app.route('/test/open_gate', methods=['POST'])
@@ -573,48 +598,116 @@ def api_status():
         'time': datetime.now().isoformat()
     })
 
+@app.route('/api/detection_stats')
+@login_required
+def api_detection_stats():
+    """API endpoint for detection pipeline counters"""
+    stats = {}
+    for camera_id, service in plate_detection_services.items():
+        stats.setdefault(camera_id, {})['plate'] = service.get_stats()
+    for camera_id, service in face_detection_services.items():
+        stats.setdefault(camera_id, {})['face'] = service.get_stats()
+    return jsonify(stats)
+
+@app.route('/api/enrollment_stats')
+@login_required
+def api_enrollment_stats():
+    """API endpoint for the face enrollment queue"""
+    return jsonify(get_enrollment_worker().get_stats())
+
+@app.route('/api/access_event_stats')
+@login_required
+def api_access_event_stats():
+    """API endpoint for the access event writer queue and overload counters"""
+    return jsonify(get_access_event_writer().get_stats())
+
+@app.route('/api/stream_stats')
+@login_required
+def api_stream_stats():
+    """API endpoint for camera stream encoders and viewer lag, per camera and profile"""
+    stats = {}
+    for (camera_id, profile), broadcaster in get_frame_broadcasters().items():
+        stats.setdefault(camera_id, {})[profile] = broadcaster.get_stats()
+    return jsonify(stats)
+
 def start_services():
     """Start all background services"""
-    global plate_detection_service, face_detection_service
+    global services_started
+    services_started = True
+    
+    # Write access events off the gate path, including any spilled by the last run
+    get_access_event_writer().start(app)
     
-    # Start plate detection service
-    plate_detection_service = get_plate_detection_service()
-    plate_detection_service.start()
+    # Encode uploaded faces in the background, including any left unfinished by the last run
+    get_enrollment_worker().start(app)
     
-    # Start face detection service if enabled
+    # Load the known faces in the background; the face pipelines skip frames until it is done
     if config.FACE_RECOGNITION_ENABLED:
-        face_detection_service = get_face_detection_service()
-        face_detection_service.start()
+        get_face_recognizer().reload_async(app)
+    
+    # Index the registered plates for OCR lookups and the search box
+    with app.app_context():
+        get_plate_index().ensure_loaded()
+    
+    # Open the compiled template cache, or build it, before the plate pipelines need it
+    if any('plate' in settings.get('pipelines', ['plate', 'face']) for settings in config.CAMERAS.values()):
+        with app.app_context():
+            get_plate_recognizer().load_templates()
+    
+    # Start the detection pipelines assigned to each camera; recognizers are shared
+    for camera_id, settings in config.CAMERAS.items():
+        pipelines = settings.get('pipelines', ['plate', 'face'])
+        
+        # Start plate detection service
+        if 'plate' in pipelines:
+            plate_detection_services[camera_id] = get_plate_detection_service(camera_id)
+            plate_detection_services[camera_id].start(app)
+        
+        # Start face detection service if enabled
+        if 'face' in pipelines and config.FACE_RECOGNITION_ENABLED:
+            face_detection_services[camera_id] = get_face_detection_service(camera_id)
+            face_detection_services[camera_id].start(app)
 
 # Register startup function to be executed with app context
 @app.before_request
 def check_services():
     """Ensure services are running before handling requests"""
-    global plate_detection_service, face_detection_service
-    
     # Start services if they're not already running
-    if plate_detection_service is None:
+    if not services_started:
         start_services()
 
 def stop_services():
     """Stop all background services"""
-    global plate_detection_service, face_detection_service
+    # Stop plate detection services
+    for service in plate_detection_services.values():
+        service.stop()
     
-    # Stop plate detection service
-    if plate_detection_service:
-        plate_detection_service.stop()
+    # Stop face detection services
+    for service in face_detection_services.values():
+        service.stop()
     
-    # Stop face detection service
-    if face_detection_service:
-        face_detection_service.stop()
+    # Disconnect stream viewers and stop the shared encoders
+    for broadcaster in get_frame_broadcasters().values():
+        broadcaster.stop()
     
-    # Stop camera
-    camera = get_camera()
-    camera.stop()
+    # Stop recognition worker processes and the enrollment queue
+    get_worker_pool().stop()
+    get_enrollment_worker().stop()
     
-    # Clean up relay controller
-    relay = get_relay_controller()
-    relay.cleanup()
+    # Persist index changes still waiting for their debounced save
+    get_face_recognizer().save_index()
+    
+    # Flush queued access events now that no pipeline can add more
+    get_access_event_writer().stop()
+    
+    # Stop cameras
+    for camera in get_cameras().values():
+        if camera.is_running:
+            camera.stop()
+    
+    # Clean up relay controllers
+    for relay in get_relay_controllers().values():
+        relay.cleanup()
 
 def initialize_app():
     """Initialize the application, database, and services"""
@@ -627,6 +720,13 @@ def initialize_app():
     with app.app_context():
         init_db()
 
+@app.cli.command('migrate-face-encodings')
+@click.option('--keep-files', is_flag=True, help='Keep the old *_encoding.dat files after migrating them')
+def migrate_face_encodings(keep_files):
+    """Move legacy pickled face encodings into the packed encoding store"""
+    migrated, failed = migrate_legacy_encodings(remove_files=not keep_files)
+    click.echo(f"Migrated {migrated} face encodings, {failed} failed")
+
 # Entry point
 if __name__ == '__main__':
     try:
@@ -1,4 +1,5 @@
 import os
+import json
 from dotenv import load_dotenv
 
 # Load environment variables from .env file if it exists
@@ -11,21 +12,114 @@ BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 CAMERA_RESOLUTION = (1920, 1080)
 CAMERA_FRAMERATE = 30
 CAMERA_ROTATION = 0  # Rotate camera if needed (0, 90, 180, 270)
+CAMERA_RING_BUFFER_SIZE = 6  # preallocated frame slots; must exceed the number of concurrent consumers
+CAMERA_SHARED_MEMORY = False  # back frame slots with shared memory so worker processes read frames without a copy
+CAMERA_SOURCE = os.environ.get('CAMERA_SOURCE', 'picamera')  # 'picamera', 'mock', 'stream' (RTSP/HTTP), 'file' or 'images'
+CAMERA_URI = os.environ.get('CAMERA_URI')  # stream URL, video file or image directory for non-Pi sources
+CAMERA_FRAME_SKIP = 0  # frames dropped between captured frames
+CAMERA_PACING = os.environ.get('CAMERA_PACING', 'realtime')  # recorded sources: 'realtime' or 'fast' (as fast as possible)
+CAMERA_LOOP = True  # restart recorded sources at the end
+CAMERA_CAPTURE_FORMAT = 'yuv420'  # Picamera2 capture format: 'yuv420' (gray is free, color converted on demand) or 'bgr'
+MOCK_CAMERA_OBJECTS = [
+    # Synthetic objects drawn by the mock camera, e.g. to load test the recognizers:
+    # {'type': 'plate', 'text': 'ABC123', 'position': (840, 700), 'size': (240, 80), 'speed': 0},
+    # {'type': 'face', 'image': 'faces/face_1.jpg', 'position': (200, 300), 'size': (160, 200)}
+    # 'image' pastes a real plate or face photo; 'speed' moves the object in pixels per frame
+]
+
+# Live stream settings
+STREAM_PROFILES = {
+    # name: output size (None keeps the camera resolution), frame rate cap, JPEG quality
+    'thumbnail': {'resolution': (320, 180), 'fps': 5, 'quality': 60},
+    'preview': {'resolution': (960, 540), 'fps': 15, 'quality': 75},
+    'full': {'resolution': None, 'fps': None, 'quality': 90}
+}
+STREAM_DEFAULT_PROFILE = 'preview'
 
 # License plate recognition settings
 PLATE_CONFIDENCE_THRESHOLD = 0.7
-PLATE_DETECTION_INTERVAL = 1  # seconds between detection attempts
-PLATE_MATCH_THRESHOLD = 0.8  # similarity threshold for plate matching
+PLATE_DETECTION_INTERVAL = 1  # seconds between detection attempts while idle (slowest adaptive rate)
+PLATE_MATCH_THRESHOLD = 0.8  # similarity threshold for plate matching (also bounds fuzzy plate string edits)
+PLATE_SEARCH_MAX_DISTANCE = 2  # max edit distance for the vehicle search box
+PLATE_TEMPLATE_SIZE = (240, 80)  # canonical (width, height) plates are normalized to for matching
+PLATE_TEMPLATE_RETRY_INTERVAL = 60  # seconds between attempts to load templates after a failed load
+PLATE_RECOGNITION_MODE = os.environ.get('PLATE_RECOGNITION_MODE', 'template')  # 'template' or 'ocr'
+PLATE_OCR_MODEL_PATH = os.path.join(BASE_DIR, 'models', 'plate_chars.npz')  # optional glyph samples
+PLATE_OCR_GLYPH_SIZE = (20, 30)  # (width, height) characters are normalized to
+PLATE_OCR_MIN_CHARACTERS = 4  # fewer segmented characters than this is not a plate
+PLATE_MOTION_GATING = True  # only run plate recognition when motion is detected
+PLATE_DETECTION_ROI = None  # polygon of normalized (x, y) points to search for plates, None = whole frame
+PLATE_COARSE_TO_FINE = True  # localize plates on a downscaled frame, refine at full resolution
+PLATE_COARSE_SCALE = 0.5  # downscale factor for the coarse localization pass
+PLATE_REFINE_MARGIN = 0.15  # padding around a coarse box, as a fraction of its size, for refinement
+PLATE_VOTE_FRAMES = 2  # frames that must agree on a plate before the gate decision is made
+PLATE_TRACK_IOU_THRESHOLD = 0.3  # minimum overlap to associate a region with an existing track
+PLATE_TRACK_MAX_SHIFT = 1.0  # max centre movement between samples, in plate widths
+PLATE_TRACK_TIMEOUT = 10  # seconds a track survives unseen; also suppresses repeat decisions
+PLATE_TRACK_DECISION_GRACE = 2  # seconds past the timeout an ended track may still open the gate
+
+# Motion detection settings (cheap front stage for the recognizers)
+MOTION_DOWNSCALE_WIDTH = 320  # width frames are downscaled to before differencing
+MOTION_PIXEL_THRESHOLD = 25  # per-pixel gray level change counted as motion
+MOTION_MIN_AREA = 0.005  # fraction of the ROI that must change to count as motion
+MOTION_ROI = None  # polygon of normalized (x, y) points, e.g. [(0.2, 0.4), (0.8, 0.4), (0.9, 1.0), (0.1, 1.0)]
+MOTION_HOLD_TIME = 5  # seconds to keep recognizing after the last motion
+MOTION_LEARNING_RATE = 0.05  # how quickly the background adapts to the scene
 
 # Face recognition settings
 FACE_RECOGNITION_ENABLED = False  # For future implementation
-FACE_DETECTION_INTERVAL = 1  # seconds between detection attempts
+FACE_DETECTION_INTERVAL = 1  # seconds between detection attempts while idle (slowest adaptive rate)
 FACE_MATCH_THRESHOLD = 0.6  # lower = more strict
+FACE_DETECTOR = 'cascade'  # 'cascade' (fast first stage, encoder only on tracked hits) or 'hog' (dlib on every frame)
+FACE_CASCADE_PATH = os.environ.get('FACE_CASCADE_PATH') or None  # Haar/LBP cascade XML; None = OpenCV's bundled frontal face cascade
+FACE_CASCADE_WIDTH = 320  # width frames are downscaled to for the cascade
+FACE_CASCADE_MIN_NEIGHBORS = 5  # higher = fewer false positives, more missed faces
+FACE_CASCADE_MIN_SIZE = 24  # smallest face in pixels at the cascade width
+FACE_TRACK_REFRESH = 5  # seconds before a face that stays in view is encoded again
+FACE_TRACK_ATTEMPTS = 3  # consecutive encodings of an unknown face before backing off to the refresh
+FACE_TRACK_IOU_THRESHOLD = 0.3  # minimum overlap to associate a face with an existing track
+FACE_TRACK_MAX_SHIFT = 1.0  # max centre movement between samples, in face widths
+FACE_TRACK_TIMEOUT = 3  # seconds a face track survives unseen
+FACE_GRANT_COOLDOWN = 10  # seconds before the same person is granted access again without face tracks
+FACE_ANN_ENABLED = os.environ.get('FACE_ANN_ENABLED', 'False').lower() == 'true'  # approximate search for large galleries
+FACE_ANN_MIN_SIZE = 5000  # below this many encodings exact search is used
+FACE_ANN_LISTS = 0  # index clusters; 0 picks sqrt(number of encodings)
+FACE_ANN_PROBES = 8  # clusters scanned per query; higher = better recall, slower
+FACE_ANN_SAVE_DELAY = 30  # seconds enrollment changes are collected before the index is persisted
+FACE_ENROLLMENT_WORKERS = 1  # background threads encoding uploaded faces
+FACE_ENROLLMENT_MAX_SIZE = 800  # longest image side faces are detected at during enrollment
+FACE_ENROLLMENT_JITTERS = 1  # re-samples per enrollment encoding; higher = more robust, slower
+
+# Adaptive detection scheduling, shared by all pipelines
+DETECTION_MIN_INTERVAL = 0.1  # seconds between detection attempts while motion or a candidate is seen
+DETECTION_BACKOFF = 1.5  # interval growth per idle attempt, up to the pipeline's detection interval
+DETECTION_CPU_BUDGET = 0.5  # seconds of detection work per second across all pipelines; intervals stretch beyond it
+
+# Recognition execution settings
+RECOGNITION_EXECUTION_MODE = os.environ.get('RECOGNITION_EXECUTION_MODE', 'thread')  # 'thread' or 'process'
+RECOGNITION_WORKERS = 2  # worker processes when running in 'process' mode
+RECOGNITION_TASK_TIMEOUT = 10  # seconds to wait for a worker result
+RECOGNITION_START_METHOD = 'spawn'  # multiprocessing start method; spawn avoids forking Flask threads
 
 # Relay settings
 RELAY_PIN_GATE = 17  # GPIO pin for gate relay
 RELAY_ACTIVATION_TIME = 3  # seconds to keep relay activated
 
+# Camera registry: camera id -> settings, overridable as JSON in the CAMERAS environment variable
+# Each camera runs its own capture thread and feeds the detection pipelines listed for it;
+# resolution, framerate and rotation default to the camera settings above
+#   source, uri: frame source of the camera (see CAMERA_SOURCE), e.g. 'stream' and an RTSP URL
+#   frame_skip, pacing, loop: override the CAMERA_* defaults for recorded sources
+#   mock_objects: synthetic objects of a mock camera (see MOCK_CAMERA_OBJECTS)
+#   capture_format: Picamera2 capture format (see CAMERA_CAPTURE_FORMAT)
+#   camera_num: index of the sensor for Picamera2
+#   pipelines: detection services fed by this camera ('plate', 'face')
+#   relay_pin: GPIO pin of the gate or door this camera opens
+DEFAULT_CAMERA_ID = os.environ.get('DEFAULT_CAMERA_ID', 'main')
+CAMERAS = json.loads(os.environ['CAMERAS']) if os.environ.get('CAMERAS') else {
+    'main': {'uri': CAMERA_URI, 'camera_num': 0, 'pipelines': ['plate', 'face'], 'relay_pin': RELAY_PIN_GATE}
+}
+
 # Database settings
 SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(BASE_DIR, 'sms.db')
 SQLALCHEMY_TRACK_MODIFICATIONS = False
@@ -37,12 +131,21 @@ DEBUG = os.environ.get('DEBUG', 'True').lower() == 'true'
 # Access control settings
 GATE_OPEN_DURATION = 10  # seconds to keep gate open
 ACCESS_LOG_RETENTION_DAYS = 30  # days to keep access logs
+ACCESS_EVENT_QUEUE_SIZE = 64  # access events waiting for the writer; beyond this they are spilled to disk
+ACCESS_EVENT_BATCH_SIZE = 16  # access events inserted per commit
+ACCESS_EVENT_FLUSH_INTERVAL = 0.5  # seconds the writer waits to fill a batch
+ACCESS_EVENT_SPILL_PATH = os.path.join(BASE_DIR, 'access_events.spill')  # durable overflow of the event queue
 
 # Paths for storing images
 PLATE_IMAGES_DIR = os.path.join(BASE_DIR, 'static', 'img', 'plates')
 FACE_IMAGES_DIR = os.path.join(BASE_DIR, 'static', 'img', 'faces')
+FACE_ANN_INDEX_PATH = os.path.join(FACE_IMAGES_DIR, 'face_index.npz')  # persisted face index
+FACE_ENCODING_STORE_PATH = os.path.join(FACE_IMAGES_DIR, 'face_encodings.bin')  # packed face encodings, manifest alongside
 LOG_IMAGES_DIR = os.path.join(BASE_DIR, 'static', 'img', 'logs')
 
+# Compiled plate template store, memory-mapped at startup
+PLATE_TEMPLATE_CACHE_DIR = os.path.join(BASE_DIR, 'cache')
+
 # Create directories if they don't exist
-for directory in [PLATE_IMAGES_DIR, FACE_IMAGES_DIR, LOG_IMAGES_DIR]:
+for directory in [PLATE_IMAGES_DIR, FACE_IMAGES_DIR, LOG_IMAGES_DIR, PLATE_TEMPLATE_CACHE_DIR]:
     os.makedirs(directory, exist_ok=True)
@@ -11,6 +11,8 @@ from .db_utils import (
     find_vehicle_by_plate,
     cleanup_old_logs
 )
+from .plate_index import get_plate_index, PlateIndex
+from .access_events import get_access_event_writer, AccessEventWriter, AccessEvent
 
 __all__ = [
     'db',
@@ -28,5 +30,10 @@ __all__ = [
     'get_all_vehicles',
     'get_all_users',
     'find_vehicle_by_plate',
-    'cleanup_old_logs'
+    'cleanup_old_logs',
+    'get_plate_index',
+    'PlateIndex',
+    'get_access_event_writer',
+    'AccessEventWriter',
+    'AccessEvent'
 ]
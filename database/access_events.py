@@ -0,0 +1,308 @@
+import os
+import json
+import queue
+import time
+import threading
+import logging
+from datetime import datetime
+import cv2
+import config
+from .models import db, AccessLog
+
+logger = logging.getLogger(__name__)
+
+# AccessLog columns carried by an access event
+EVENT_FIELDS = ('access_type', 'recognition_type', 'is_authorized', 'confidence_score',
+                'vehicle_id', 'user_id', 'notes')
+
+class AccessEvent:
+    """
+    One access decision waiting to be logged
+    Images that may be overwritten once the camera reuses their slot are copied;
+    immutable converted frames are only referenced
+    """
+
+    def __init__(self, frame=None, crop=None, **fields):
+        self.timestamp = datetime.utcnow()
+        self.queued_at = time.time()
+        self.frame = _detach(frame)
+        self.crop = _detach(crop)
+        self.fields = {name: fields.get(name) for name in EVENT_FIELDS}
+        self.image_path = None
+        self.crop_path = None
+
+    def write_images(self):
+        """Encode and write the frame and crop JPEGs to the log image directory"""
+        stamp = self.timestamp.strftime('%Y%m%d_%H%M%S_%f')
+        if self.frame is not None:
+            self.image_path = _write_jpeg(os.path.join(config.LOG_IMAGES_DIR, f"access_{stamp}.jpg"), self.frame)
+        if self.crop is not None:
+            self.crop_path = _write_jpeg(os.path.join(config.LOG_IMAGES_DIR, f"access_{stamp}_crop.jpg"), self.crop)
+        self.frame = self.crop = None
+
+    def to_record(self):
+        """JSON-serializable form for the spill file"""
+        return dict(self.fields, timestamp=self.timestamp.isoformat(),
+                    image_path=self.image_path, crop_path=self.crop_path)
+
+    def to_log(self):
+        return AccessLog(timestamp=self.timestamp, image_path=self.image_path,
+                         crop_path=self.crop_path, **self.fields)
+
+def _detach(image):
+    """The image itself if it is a read-only array owning its memory, otherwise a copy"""
+    if image is None:
+        return None
+    if image.base is None and not image.flags.writeable:
+        return image
+    return image.copy()
+
+def _write_jpeg(path, image):
+    ret, jpeg = cv2.imencode('.jpg', image)
+    if not ret:
+        return None
+    with open(path, 'wb') as f:
+        f.write(jpeg.tobytes())
+    return path
+
+def _log_from_record(record):
+    return AccessLog(timestamp=datetime.fromisoformat(record['timestamp']),
+                     image_path=record.get('image_path'), crop_path=record.get('crop_path'),
+                     **{name: record.get(name) for name in EVENT_FIELDS})
+
+
+class AccessEventWriter:
+    """
+    Writes access events off the gate path
+    Recognizers open the relay first and then queue the event; a writer thread
+    encodes the images and inserts queued events in batches with one commit.
+    When the database rejects a batch, events are appended to a spill file and
+    inserted once the writer catches up. When the queue is full, the event
+    keeps only its fields and the writer spills it; the detection thread never
+    encodes or syncs anything
+    """
+
+    def __init__(self, app=None, queue_size=None, batch_size=None, flush_interval=None, spill_path=None):
+        """Initialize writer with specified parameters or use defaults from config"""
+        self.app = app
+        self.queue = queue.Queue(maxsize=queue_size or config.ACCESS_EVENT_QUEUE_SIZE)
+        self.batch_size = batch_size or config.ACCESS_EVENT_BATCH_SIZE
+        self.flush_interval = flush_interval or config.ACCESS_EVENT_FLUSH_INTERVAL
+        self.spill_path = spill_path or config.ACCESS_EVENT_SPILL_PATH
+        self.spill_lock = threading.Lock()
+        self.overflow = []  # events that found the queue full, waiting to be spilled by the writer
+        self.overflow_lock = threading.Lock()
+        self.lock = threading.Lock()
+        self.writer_thread = None
+        self.running = False
+
+        # Backpressure and throughput counters
+        self.events_queued = 0
+        self.events_written = 0
+        self.events_spilled = 0
+        self.events_overflowed = 0
+        self.events_dropped = 0
+        self.spill_lines_rejected = 0
+        self.batches = 0
+        self.max_queue_depth = 0
+        self.write_latency = 0.0
+        self.latency_samples = 0
+        self.last_error = None
+
+    def start(self, app=None):
+        """Start the writer thread; events spilled by a previous run are written first"""
+        with self.lock:
+            if app is not None:
+                self.app = app
+            if self.running:
+                return
+            if self.app is None:
+                from flask import current_app
+                self.app = current_app._get_current_object()
+            self.running = True
+            self.writer_thread = threading.Thread(target=self._write_loop)
+            self.writer_thread.daemon = True
+            self.writer_thread.start()
+
+        logger.info("Access event writer started")
+
+    def stop(self):
+        """Stop the writer after it has written everything still queued"""
+        with self.lock:
+            if not self.running:
+                return
+            self.running = False
+        if self.writer_thread and self.writer_thread.is_alive():
+            self.writer_thread.join(timeout=5.0)
+        logger.info("Access event writer stopped")
+
+    def submit(self, frame=None, crop=None, **fields):
+        """
+        Queue an access event with the AccessLog fields given as keyword arguments
+        Never blocks on disk; returns the AccessEvent
+        """
+        event = AccessEvent(frame, crop, **fields)
+        try:
+            self.queue.put_nowait(event)
+            self.events_queued += 1
+            self.max_queue_depth = max(self.max_queue_depth, self.queue.qsize())
+        except queue.Full:
+            # Overload: hand the fields to the writer for the spill file; the images are dropped
+            logger.warning("Access event queue is full; spilling event without images")
+            event.frame = event.crop = None
+            with self.overflow_lock:
+                self.overflow.append(event)
+            self.events_overflowed += 1
+        return event
+
+    def _next_batch(self):
+        """Block for the first event, then collect more until the batch is full or the flush interval ends"""
+        try:
+            batch = [self.queue.get(timeout=1.0)]
+        except queue.Empty:
+            return []
+
+        deadline = time.time() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write_loop(self):
+        """Background thread writing batches of queued events"""
+        with self.app.app_context():
+            self._replay_spill()
+
+            while self.running or not self.queue.empty() or self.overflow:
+                self._spill_overflow()
+                batch = self._next_batch()
+                if batch:
+                    self._write_batch(batch)
+                elif os.path.exists(self.spill_path):
+                    # Caught up; insert what overload left in the spill file
+                    self._replay_spill()
+
+    def _write_batch(self, batch):
+        """Write the images of a batch and insert its rows with a single commit"""
+        for event in batch:
+            try:
+                event.write_images()
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error(f"Error writing access event image: {str(e)}")
+
+        try:
+            db.session.add_all([event.to_log() for event in batch])
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            self.last_error = str(e)
+            logger.error(f"Error inserting access events; spilling {len(batch)} to disk: {str(e)}")
+            self._spill(batch)
+            return
+
+        now = time.time()
+        self.batches += 1
+        self.events_written += len(batch)
+        self.write_latency += sum(now - event.queued_at for event in batch)
+        self.latency_samples += len(batch)
+
+    def _spill_overflow(self):
+        """Spill the events that found the queue full"""
+        with self.overflow_lock:
+            events, self.overflow = self.overflow, []
+        if not events:
+            return
+        try:
+            self._spill(events)
+        except Exception as e:
+            self.events_dropped += len(events)
+            self.last_error = str(e)
+            logger.error(f"Error spilling {len(events)} access events: {str(e)}")
+
+    def _spill(self, events):
+        """Append events to the spill file, one JSON record per line, and fsync it"""
+        with self.spill_lock:
+            with open(self.spill_path, 'a') as f:
+                for event in events:
+                    f.write(json.dumps(event.to_record()) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+        self.events_spilled += len(events)
+
+    def _replay_spill(self):
+        """
+        Insert spilled events and remove the spill file once they are committed
+        Lines that cannot be parsed, e.g. one torn by a crash, are moved to a
+        .rejected file next to the spill file instead of blocking the rest
+        """
+        with self.spill_lock:
+            if not os.path.exists(self.spill_path):
+                return
+            try:
+                logs = []
+                rejected = []
+                with open(self.spill_path, 'r') as f:
+                    for line in f:
+                        if not line.strip():
+                            continue
+                        try:
+                            logs.append(_log_from_record(json.loads(line)))
+                        except (ValueError, KeyError, TypeError):
+                            rejected.append(line if line.endswith('\n') else line + '\n')
+
+                db.session.add_all(logs)
+                db.session.commit()
+
+                if rejected:
+                    with open(self.spill_path + '.rejected', 'a') as f:
+                        f.writelines(rejected)
+                    self.spill_lines_rejected += len(rejected)
+                    logger.warning(f"Moved {len(rejected)} unreadable spilled access events to "
+                                   f"{self.spill_path}.rejected")
+                os.remove(self.spill_path)
+                self.events_written += len(logs)
+                logger.info(f"Wrote {len(logs)} spilled access events")
+            except Exception as e:
+                db.session.rollback()
+                self.last_error = str(e)
+                logger.error(f"Error replaying spilled access events: {str(e)}")
+
+    def get_stats(self):
+        """Queue depth, throughput and overload counters"""
+        return {
+            'running': self.running,
+            'queue_depth': self.queue.qsize(),
+            'queue_size': self.queue.maxsize,
+            'max_queue_depth': self.max_queue_depth,
+            'events_queued': self.events_queued,
+            'events_written': self.events_written,
+            'events_spilled': self.events_spilled,
+            'events_overflowed': self.events_overflowed,
+            'events_dropped': self.events_dropped,
+            'spill_lines_rejected': self.spill_lines_rejected,
+            'batches': self.batches,
+            'mean_batch_size': round(self.events_written / self.batches, 2) if self.batches else None,
+            'mean_write_latency_ms': round(1000 * self.write_latency / self.latency_samples, 1)
+                if self.latency_samples else None,
+            'spill_pending': os.path.exists(self.spill_path),
+            'last_error': self.last_error
+        }
+
+
+# Global writer instance
+_access_event_writer = None
+_writer_lock = threading.Lock()
+
+def get_access_event_writer():
+    """Get the global access event writer, initializing if necessary"""
+    global _access_event_writer
+    with _writer_lock:
+        if _access_event_writer is None:
+            _access_event_writer = AccessEventWriter()
+        return _access_event_writer
@@ -1,18 +1,38 @@
 import os
 import shutil
+import logging
 from datetime import datetime, timedelta
+from sqlalchemy import inspect, text
 from werkzeug.security import generate_password_hash
 from .models import db, User, Vehicle, PlateImage, Face, AccessLog
+from .plate_index import get_plate_index
 import config
 
+logger = logging.getLogger(__name__)
+
 def init_db():
     """Initialize the database and create tables"""
     db.create_all()
+    _add_missing_columns()
     
     # Create admin user if no users exist
     if User.query.count() == 0:
         create_admin_user('admin', 'admin@example.com', 'admin123')
         
+def _add_missing_columns():
+    """Add columns introduced after a table was created; create_all only creates missing tables"""
+    missing = [
+        ('face', 'enrollment_status', "VARCHAR(20) DEFAULT 'pending'"),
+        ('access_log', 'crop_path', 'VARCHAR(255)')
+    ]
+    inspector = inspect(db.engine)
+    for table, column, definition in missing:
+        if column in {existing['name'] for existing in inspector.get_columns(table)}:
+            continue
+        with db.engine.begin() as connection:
+            connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {definition}"))
+        logger.info(f"Added {table}.{column} column")
+
 def create_admin_user(username, email, password):
     """Create an admin user"""
     admin = User(
@@ -39,6 +59,9 @@ def register_vehicle(owner_id, license_plate, make=None, model=None, color=None,
     )
     db.session.add(vehicle)
     db.session.commit()
+    
+    # Keep the in-memory plate index in sync
+    get_plate_index().add(vehicle)
     return vehicle
 
 def save_plate_image(vehicle_id, image_data, filename=None):
@@ -67,10 +90,18 @@ def save_plate_image(vehicle_id, image_data, filename=None):
     db.session.add(plate_image)
     db.session.commit()
     
+    # Feed the new template to the live recognizer without a full reload
+    try:
+        # Import here to avoid circular imports
+        from recognition import get_plate_recognizer
+        get_plate_recognizer().add_plate_image(plate_image, image_data)
+    except Exception as e:
+        logger.error(f"Error indexing plate image {file_path}: {str(e)}")
+    
     return plate_image
 
-def save_face_image(user_id, image_data, encoding_data=None, filename=None):
-    """Save a face image and optional encoding for a user"""
+def save_face_image(user_id, image_data, encoding=None, filename=None):
+    """Save a face image and optional precomputed encoding for a user"""
     user = User.query.get(user_id)
     if not user:
         return None
@@ -87,23 +118,20 @@ def save_face_image(user_id, image_data, encoding_data=None, filename=None):
     with open(file_path, 'wb') as f:
         f.write(image_data)
     
-    # Save encoding if provided
-    encoding_path = None
-    if encoding_data:
-        encoding_filename = f"{os.path.splitext(filename)[0]}_encoding.dat"
-        encoding_path = os.path.join(config.FACE_IMAGES_DIR, encoding_filename)
-        with open(encoding_path, 'wb') as f:
-            f.write(encoding_data)
-    
     # Create database record
     face = Face(
         user_id=user_id,
         file_path=file_path,
-        encoding_path=encoding_path
+        enrollment_status='enrolled' if encoding is not None else 'pending'
     )
     db.session.add(face)
     db.session.commit()
     
+    # Append the encoding to the packed store if provided; otherwise it is generated on first load
+    if encoding is not None:
+        from recognition import get_face_encoding_store
+        get_face_encoding_store().append(face.id, encoding)
+    
     return face
 
 def log_access(access_type, recognition_type, image_data=None, 
@@ -163,8 +191,9 @@ def cleanup_old_logs(days=None):
     
     # Delete associated images
     for log in old_logs:
-        if log.image_path and os.path.exists(log.image_path):
-            os.remove(log.image_path)
+        for path in (log.image_path, log.crop_path):
+            if path and os.path.exists(path):
+                os.remove(path)
     
     # Delete log entries
     AccessLog.query.filter(AccessLog.timestamp < cutoff_date).delete()
@@ -65,7 +65,8 @@ class Face(db.Model):
     """Stores face images and encodings for recognition"""
     id = db.Column(db.Integer, primary_key=True)
     file_path = db.Column(db.String(255), unique=True, nullable=False)
-    encoding_path = db.Column(db.String(255), unique=True, nullable=True)
+    encoding_path = db.Column(db.String(255), unique=True, nullable=True)  # legacy pickle file; see migrate-face-encodings
+    enrollment_status = db.Column(db.String(20), default='pending')  # pending, processing, enrolled, no_face, failed
     is_active = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
@@ -87,6 +88,7 @@ class AccessLog(db.Model):
     is_authorized = db.Column(db.Boolean, default=False)
     confidence_score = db.Column(db.Float)
     image_path = db.Column(db.String(255))
+    crop_path = db.Column(db.String(255))  # plate or face crop of image_path
     notes = db.Column(db.Text)
     
     # Foreign keys - can be null for unrecognized/unauthorized access attempts
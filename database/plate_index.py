@@ -0,0 +1,213 @@
+import threading
+import logging
+import config
+
+logger = logging.getLogger(__name__)
+
+# Characters that OCR and humans confuse, folded to one representative
+CONFUSABLE_CHARACTERS = str.maketrans({
+    'O': '0', 'Q': '0',
+    'I': '1', 'L': '1',
+    'B': '8',
+    'S': '5',
+    'Z': '2'
+})
+
+def normalize_plate_string(license_plate):
+    """Canonical form of a plate string for lookups: uppercase letters and digits only"""
+    if not license_plate:
+        return ''
+    return ''.join(c for c in license_plate.upper() if c.isalnum())
+
+def fold_plate_string(license_plate):
+    """Normalize a plate string and fold confusable characters (0/O, 1/I, 8/B, ...)"""
+    return normalize_plate_string(license_plate).translate(CONFUSABLE_CHARACTERS)
+
+def edit_distance(a, b):
+    """Levenshtein distance between two strings"""
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+
+class _BKNode:
+    """BK-tree node holding every vehicle whose folded plate equals its key"""
+    __slots__ = ('key', 'children', 'entries')
+
+    def __init__(self, key):
+        self.key = key
+        self.children = {}  # edit distance -> child node
+        self.entries = {}  # vehicle id -> (license plate, is active)
+
+
+class PlateIndex:
+    """
+    In-memory BK-tree over registered plate strings
+    Answers "closest registered plate within distance k" without scanning the fleet
+    """
+
+    def __init__(self):
+        """Initialize an empty index; it is filled from the database on first use"""
+        self.lock = threading.Lock()
+        self.loaded = False
+        self._reset()
+
+    def _reset(self):
+        self.root = None
+        self.keys = {}  # folded plate -> node, for exact hits without walking the tree
+        self.nodes = {}  # vehicle id -> node holding it
+        self.empty_nodes = 0
+
+    def ensure_loaded(self):
+        """Load all vehicles from the database if that has not happened yet"""
+        if self.loaded:
+            return
+        from flask import has_app_context
+        if not has_app_context():
+            logger.warning("No Flask application context available to load the plate index")
+            return
+        from .models import Vehicle
+        self.load(Vehicle.query.all())
+
+    def load(self, vehicles):
+        """Rebuild the index from the given vehicles"""
+        with self.lock:
+            self._reset()
+            for vehicle in vehicles:
+                self._add_locked(vehicle.id, vehicle.license_plate, vehicle.is_active)
+            self.loaded = True
+        logger.info(f"Plate index loaded with {len(self.nodes)} vehicles")
+
+    def _add_locked(self, vehicle_id, license_plate, is_active):
+        key = fold_plate_string(license_plate)
+        if not key:
+            return
+
+        node = self.root
+        if node is None:
+            node = self.root = self.keys[key] = _BKNode(key)
+        else:
+            while True:
+                distance = edit_distance(key, node.key)
+                if distance == 0:
+                    # Reusing a node emptied by an earlier removal
+                    if not node.entries:
+                        self.empty_nodes -= 1
+                    break
+                child = node.children.get(distance)
+                if child is None:
+                    node = node.children[distance] = self.keys[key] = _BKNode(key)
+                    break
+                node = child
+
+        node.entries[vehicle_id] = (license_plate, is_active)
+        self.nodes[vehicle_id] = node
+
+    def _remove_locked(self, vehicle_id):
+        node = self.nodes.pop(vehicle_id, None)
+        if node is None:
+            return
+        node.entries.pop(vehicle_id, None)
+
+        # BK-trees cannot unlink nodes; rebuild once tombstones dominate
+        if not node.entries:
+            self.empty_nodes += 1
+            if self.empty_nodes > len(self.nodes):
+                entries = [(vid, entry) for n in set(self.nodes.values()) for vid, entry in n.entries.items()]
+                self._reset()
+                for vid, (license_plate, is_active) in entries:
+                    self._add_locked(vid, license_plate, is_active)
+
+    def add(self, vehicle):
+        """Add or update a vehicle"""
+        with self.lock:
+            self._remove_locked(vehicle.id)
+            self._add_locked(vehicle.id, vehicle.license_plate, vehicle.is_active)
+
+    # Edits may change the plate string, so an update is a remove followed by an add
+    update = add
+
+    def remove(self, vehicle_id):
+        """Remove a vehicle"""
+        with self.lock:
+            self._remove_locked(vehicle_id)
+
+    def closest(self, license_plate, max_distance=1, active_only=True, exhaustive=False):
+        """
+        Find registered plates within max_distance edits of the given string
+        Returns a list of (distance, vehicle_id, license_plate) sorted by distance;
+        an exact hit returns only the plates at distance 0 without walking the tree
+        unless exhaustive is set
+        """
+        self.ensure_loaded()
+        key = fold_plate_string(license_plate)
+        if not key:
+            return []
+
+        results = []
+        with self.lock:
+            node = None if exhaustive else self.keys.get(key)
+            if node is not None:
+                results = [(0, vehicle_id, registered) for vehicle_id, (registered, is_active) in node.entries.items()
+                           if is_active or not active_only]
+                if results:
+                    return sorted(results)
+
+            stack = [self.root] if self.root else []
+            while stack:
+                node = stack.pop()
+                distance = edit_distance(key, node.key)
+                if distance <= max_distance:
+                    for vehicle_id, (registered, is_active) in node.entries.items():
+                        if is_active or not active_only:
+                            results.append((distance, vehicle_id, registered))
+
+                # Triangle inequality: only subtrees at distance d +/- k can hold matches
+                for child_distance, child in node.children.items():
+                    if distance - max_distance <= child_distance <= distance + max_distance:
+                        stack.append(child)
+
+        results.sort()
+        return results
+
+    def search(self, text, max_distance=None, limit=20, active_only=False):
+        """
+        Search box lookup: plates containing the text, then near misses
+        Returns a list of vehicle ids, best matches first
+        """
+        self.ensure_loaded()
+        if max_distance is None:
+            max_distance = config.PLATE_SEARCH_MAX_DISTANCE
+        key = fold_plate_string(text)
+        if not key:
+            return []
+
+        with self.lock:
+            ranked = [vehicle_id for vehicle_id, node in self.nodes.items()
+                      if key in node.key and (node.entries[vehicle_id][1] or not active_only)]
+
+        for _, vehicle_id, _ in self.closest(text, max_distance, active_only=active_only, exhaustive=True):
+            if vehicle_id not in ranked:
+                ranked.append(vehicle_id)
+
+        return ranked[:limit]
+
+    def __len__(self):
+        return len(self.nodes)
+
+
+# Singleton plate index instance for global use
+_plate_index = None
+
+def get_plate_index():
+    """Get the global plate index instance, initializing if necessary"""
+    global _plate_index
+    if _plate_index is None:
+        _plate_index = PlateIndex()
+    return _plate_index
@@ -1,9 +1,19 @@
-from .camera import get_camera, Camera
-from .relay import get_relay_controller, RelayController
+from .camera import get_camera, get_cameras, Camera
+from .frame_buffer import FrameRingBuffer, FrameRef
+from .streamer import get_frame_broadcaster, get_frame_broadcasters, FrameBroadcaster
+from .relay import get_relay_controller, get_relay_controllers, get_camera_relay, RelayController
 
 __all__ = [
     'get_camera',
+    'get_cameras',
     'Camera',
+    'FrameRingBuffer',
+    'FrameRef',
+    'get_frame_broadcaster',
+    'get_frame_broadcasters',
+    'FrameBroadcaster',
     'get_relay_controller',
+    'get_relay_controllers',
+    'get_camera_relay',
     'RelayController'
 ]
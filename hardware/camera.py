@@ -1,18 +1,10 @@
 import time
 import cv2
-import numpy as np
 import threading
 import config
 import logging
-
-# Try to import picamera2, but provide fallback if not available
-PICAMERA_AVAILABLE = False
-try:
-    from picamera2 import Picamera2
-    PICAMERA_AVAILABLE = True
-except ImportError:
-    logger = logging.getLogger(__name__)
-    logger.warning("Picamera2 not available! Using mock camera implementation.")
+from .frame_buffer import FrameRingBuffer
+from .sources import create_frame_source, MockSource
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -21,23 +13,29 @@ logger = logging.getLogger(__name__)
 class Camera:
     """Interface for the Raspberry Pi Camera"""
     
-    def __init__(self, resolution=None, framerate=None, rotation=None):
-        """Initialize camera with specified parameters or use defaults from config"""
-        self.resolution = resolution or config.CAMERA_RESOLUTION
+    def __init__(self, resolution=None, framerate=None, rotation=None, camera_id=None, camera_num=0,
+                 source=None):
+        """
+        Initialize camera with specified parameters or use defaults from config
+        source is a FrameSource; by default it is built from CAMERA_SOURCE
+        """
+        self.camera_id = camera_id or config.DEFAULT_CAMERA_ID
+        self.camera_num = camera_num
+        self.resolution = tuple(resolution or config.CAMERA_RESOLUTION)
         self.framerate = framerate or config.CAMERA_FRAMERATE
         self.rotation = rotation if rotation is not None else config.CAMERA_ROTATION
-        self.picam = None
+        self.source = source or create_frame_source(
+            resolution=self.resolution, framerate=self.framerate, rotation=self.rotation,
+            camera_num=self.camera_num, camera_id=self.camera_id
+        )
         self.is_running = False
-        self.current_frame = None
+        self.buffer = FrameRingBuffer()
         self.lock = threading.Lock()
         self.capture_thread = None
-        self.use_mock = not PICAMERA_AVAILABLE
-        
-        logger.info(f"Initializing camera with resolution: {self.resolution}, "
-                   f"framerate: {self.framerate}, rotation: {self.rotation}")
+        self.use_mock = isinstance(self.source, MockSource)
         
-        if self.use_mock:
-            logger.warning("Using mock camera implementation (no hardware access)")
+        logger.info(f"Initializing camera {self.camera_id} with {type(self.source).__name__}, "
+                   f"resolution: {self.resolution}, framerate: {self.framerate}, rotation: {self.rotation}")
     
     def start(self):
         """Start the camera and begin capturing frames"""
@@ -46,27 +44,9 @@ class Camera:
             return
             
         try:
-            if not self.use_mock:
-                # Initialize and configure the real camera
-                self.picam = Picamera2()
-                
-                # Configure the camera
-                camera_config = self.picam.create_preview_configuration(
-                    main={"size": self.resolution},
-                    controls={"FrameRate": self.framerate}
-                )
-                self.picam.configure(camera_config)
-                
-                # Start the camera
-                self.picam.start()
-                
-                # Set rotation if needed
-                if self.rotation:
-                    self.picam.set_rotation(self.rotation)
-            else:
-                # Using mock camera - create a fake black frame
-                logger.info("Starting mock camera")
-                
+            # Open the device, stream or recording
+            self.source.open()
+            
             self.is_running = True
             
             # Start capture thread
@@ -78,9 +58,7 @@ class Camera:
             
         except Exception as e:
             logger.error(f"Error starting camera: {str(e)}")
-            if self.picam:
-                self.picam.close()
-                self.picam = None
+            self.source.close()
             self.is_running = False
             raise
     
@@ -96,62 +74,69 @@ class Camera:
         if self.capture_thread and self.capture_thread.is_alive():
             self.capture_thread.join(timeout=1.0)
             
-        # Close the camera if using real hardware
-        if not self.use_mock and self.picam:
-            self.picam.close()
-            self.picam = None
+        # Release the device, stream or recording
+        self.source.close()
+        
+        # Release shared memory frame slots
+        self.buffer.close()
             
         logger.info("Camera stopped")
     
     def _capture_loop(self):
-        """Background thread to continuously capture frames"""
+        """
+        Background decode thread
+        Reads frames from the source as they come and publishes them, so the
+        ring buffer always holds the latest frame however slow the consumers are
+        """
+        exhausted = False
         while self.is_running:
             try:
-                if not self.use_mock:
-                    # Capture a real frame from hardware
-                    frame = self.picam.capture_array()
-                    
-                    # Convert to BGR format for OpenCV compatibility
-                    if frame.shape[2] == 4:  # If RGBA
-                        frame = cv2.cvtColor(frame, cv2.COLOR_RGBA2BGR)
-                else:
-                    # Generate a mock frame (black with text)
-                    width, height = self.resolution
-                    frame = np.zeros((height, width, 3), dtype=np.uint8)
-                    
-                    # Add some text to the mock frame
-                    text = "MOCK CAMERA - NO HARDWARE"  
-                    font = cv2.FONT_HERSHEY_SIMPLEX
-                    text_size = cv2.getTextSize(text, font, 1, 2)[0]
-                    
-                    # Position text in center
-                    text_x = (width - text_size[0]) // 2
-                    text_y = (height + text_size[1]) // 2
-                    
-                    cv2.putText(frame, text, (text_x, text_y), font, 1, (0, 255, 0), 2)
-                    
-                    # Add timestamp
-                    timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
-                    cv2.putText(frame, timestamp, (10, height - 20), font, 0.5, (255, 255, 255), 1)
+                frame = self.source.read()
+                if frame is None:
+                    if self.source.finished:
+                        if not exhausted:
+                            logger.info(f"Frame source of camera {self.camera_id} is exhausted")
+                            exhausted = True
+                        time.sleep(0.1)
+                    continue
                 
-                # Store the frame
-                with self.lock:
-                    self.current_frame = frame
-                    
-                # Sleep briefly to simulate camera framerate in mock mode
-                if self.use_mock:
-                    time.sleep(1.0 / self.framerate)
+                # Publish the frame into the ring buffer
+                self.buffer.publish(frame, pixel_format=self.source.pixel_format)
                     
             except Exception as e:
                 logger.error(f"Error in capture loop: {str(e)}")
                 time.sleep(0.1)  # Avoid tight loop on error
     
     def get_frame(self):
-        """Get the latest camera frame"""
-        with self.lock:
-            if self.current_frame is None:
-                return None
-            return self.current_frame.copy()
+        """
+        Get a private, writable copy of the latest camera frame
+        Hot-path consumers should use acquire_frame() to avoid the copy
+        """
+        frame_ref = self.buffer.acquire()
+        if frame_ref is None:
+            return None
+        with frame_ref:
+            return frame_ref.bgr.copy()
+    
+    def acquire_frame(self):
+        """
+        Pin the latest frame without copying it
+        Returns a FrameRef (read-only .gray/.bgr/.rgb views, .seq, .timestamp) to release when done, or None
+        """
+        return self.buffer.acquire()
+    
+    def wait_for_frame(self, after_seq=0, timeout=None):
+        """
+        Block until a frame newer than after_seq is captured and pin it
+        Consumers pass the seq of the last frame they handled so each frame is processed once
+        Returns a FrameRef, or None on timeout or when the camera stops
+        """
+        return self.buffer.wait_for(after_seq, timeout)
+    
+    @property
+    def frame_seq(self):
+        """Sequence number of the latest captured frame"""
+        return self.buffer.latest_seq
     
     def capture_image(self):
         """Capture a single image and return it"""
@@ -180,12 +165,45 @@ class Camera:
         self.stop()
 
 
-# Singleton camera instance for global use
-_camera_instance = None
+# Camera registry, one instance per configured camera id
+_cameras = {}
+_cameras_lock = threading.Lock()
+
+def get_camera(camera_id=None):
+    """Get the camera with the given id (default camera if omitted), initializing if necessary"""
+    camera_id = camera_id or config.DEFAULT_CAMERA_ID
+    with _cameras_lock:
+        camera = _cameras.get(camera_id)
+        if camera is None:
+            if camera_id not in config.CAMERAS:
+                raise ValueError(f"Unknown camera: {camera_id}")
+            settings = config.CAMERAS[camera_id]
+            rotation = settings.get('rotation', config.CAMERA_ROTATION)
+            source = create_frame_source(
+                source=settings.get('source'),
+                uri=settings.get('uri'),
+                resolution=settings.get('resolution'),
+                framerate=settings.get('framerate'),
+                rotation=rotation,
+                camera_num=settings.get('camera_num', 0),
+                camera_id=camera_id,
+                frame_skip=settings.get('frame_skip'),
+                pacing=settings.get('pacing'),
+                loop=settings.get('loop'),
+                objects=settings.get('mock_objects'),
+                pixel_format=settings.get('capture_format')
+            )
+            camera = _cameras[camera_id] = Camera(
+                resolution=settings.get('resolution'),
+                framerate=settings.get('framerate'),
+                rotation=rotation,
+                camera_id=camera_id,
+                camera_num=settings.get('camera_num', 0),
+                source=source
+            )
+        return camera
 
-def get_camera():
-    """Get the global camera instance, initializing if necessary"""
-    global _camera_instance
-    if _camera_instance is None:
-        _camera_instance = Camera()
-    return _camera_instance
+def get_cameras():
+    """Get all cameras instantiated so far, keyed by camera id"""
+    with _cameras_lock:
+        return dict(_cameras)
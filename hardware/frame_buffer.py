@@ -0,0 +1,305 @@
+import time
+import threading
+import logging
+import cv2
+import numpy as np
+import config
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def _y_plane(frame):
+    """Grayscale view of an I420 frame: its first two thirds are the luma plane"""
+    return frame[:frame.shape[0] * 2 // 3]
+
+# Conversions from a captured pixel format to the formats consumers ask for
+PIXEL_CONVERSIONS = {
+    ('bgr', 'gray'): lambda frame: cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY),
+    ('bgr', 'rgb'): lambda frame: cv2.cvtColor(frame, cv2.COLOR_BGR2RGB),
+    ('yuv420', 'gray'): _y_plane,
+    ('yuv420', 'bgr'): lambda frame: cv2.cvtColor(frame, cv2.COLOR_YUV2BGR_I420),
+    ('yuv420', 'rgb'): lambda frame: cv2.cvtColor(frame, cv2.COLOR_YUV2RGB_I420)
+}
+
+class FrameRef:
+    """
+    Pinned, read-only reference to one frame in a FrameRingBuffer
+    The slot is not overwritten until the reference is released
+    .data is the frame in its captured pixel format; .gray, .bgr and .rgb are
+    converted on first use and shared by every reader of the same frame
+    """
+
+    def __init__(self, buffer, slot, generation, seq, timestamp, data, pixel_format='bgr'):
+        self.buffer = buffer
+        self.slot = slot
+        self.generation = generation
+        self.seq = seq
+        self.timestamp = timestamp
+        self.data = data
+        self.pixel_format = pixel_format
+        self.released = False
+
+    def view(self, pixel_format):
+        """Read-only view of the frame in the given pixel format ('gray', 'bgr' or 'rgb')"""
+        return self.buffer._convert(self, pixel_format)
+
+    @property
+    def gray(self):
+        return self.view('gray')
+
+    @property
+    def bgr(self):
+        return self.view('bgr')
+
+    @property
+    def rgb(self):
+        return self.view('rgb')
+
+    def shared_location(self, array):
+        """
+        (shared memory name, byte offset) of an array lying in this frame's slot,
+        e.g. .data or the luma plane of a YUV420 frame; None if the ring is not
+        in shared memory or the array is a converted copy
+        """
+        return self.buffer._shared_location(self, array)
+
+    def retain(self):
+        """
+        Take a second, independent pin on this frame's slot, e.g. for a worker
+        process still reading it after this reference is released
+        Returns a new FrameRef, or None if this one was released or the ring reallocated
+        """
+        return self.buffer._retain(self)
+
+    def release(self):
+        """Unpin the slot so the camera may reuse it"""
+        if not self.released:
+            self.released = True
+            self.data = None
+            self.buffer._release(self.slot, self.generation)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+    def __del__(self):
+        self.release()
+
+
+class FrameRingBuffer:
+    """
+    Fixed-size ring of preallocated frame arrays
+    The capture thread copies each new frame into a free slot; consumers pin
+    the latest slot and read it through a read-only view instead of copying it
+    """
+
+    def __init__(self, size=None, shared=None):
+        """Initialize ring buffer; slots are allocated on the first published frame"""
+        self.size = max(size or config.CAMERA_RING_BUFFER_SIZE, 2)
+        self.shared = config.CAMERA_SHARED_MEMORY if shared is None else shared
+        self.lock = threading.Lock()
+        self.frame_ready = threading.Condition(self.lock)
+
+        self.shape = None
+        self.dtype = None
+        self.slots = []
+        self.views = []
+        self.shared_memory = []
+        self.retired_memory = []
+
+        self.seqs = [0] * self.size
+        self.timestamps = [0.0] * self.size
+        self.formats = ['bgr'] * self.size
+        self.refcounts = [0] * self.size
+        self.converted = [{} for _ in range(self.size)]
+        self.convert_locks = [threading.Lock() for _ in range(self.size)]
+        self.latest_slot = None
+        self.generation = 0
+        self.seq = 0
+        self.frames_dropped = 0
+
+    def _allocate(self, shape, dtype):
+        """(Re)allocate every slot for frames of the given shape and dtype"""
+        # Slots still pinned keep their old arrays alive through their views;
+        # shared memory can only be closed once nobody can reach it any more
+        self.retired_memory.extend(self.shared_memory)
+        self.slots = []
+        self.views = []
+        self.shared_memory = []
+
+        nbytes = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        for _ in range(self.size):
+            if self.shared:
+                from multiprocessing import shared_memory
+                shm = shared_memory.SharedMemory(create=True, size=nbytes)
+                array = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+                self.shared_memory.append(shm)
+            else:
+                array = np.empty(shape, dtype=dtype)
+
+            view = array.view()
+            view.flags.writeable = False
+            self.slots.append(array)
+            self.views.append(view)
+
+        self.shape = shape
+        self.dtype = dtype
+        self.latest_slot = None
+        self.refcounts = [0] * self.size
+        self.converted = [{} for _ in range(self.size)]
+        self.generation += 1
+
+        logger.info(f"Allocated {self.size} frame slots of shape {shape}"
+                    f"{' in shared memory' if self.shared else ''}")
+
+    def _free_slot(self):
+        """Pick the next slot that is neither the latest frame nor pinned by a reader"""
+        start = 0 if self.latest_slot is None else self.latest_slot + 1
+        for offset in range(self.size):
+            slot = (start + offset) % self.size
+            if slot != self.latest_slot and self.refcounts[slot] == 0:
+                return slot
+        return None
+
+    def publish(self, frame, timestamp=None, pixel_format='bgr'):
+        """
+        Copy a frame into the ring and make it the latest
+        pixel_format is 'bgr' or 'yuv420' (I420, as captured by Picamera2)
+        Returns its sequence number, or None if every slot is pinned and the frame was dropped
+        """
+        with self.lock:
+            if frame.shape != self.shape or frame.dtype != self.dtype:
+                self._allocate(frame.shape, frame.dtype)
+
+            slot = self._free_slot()
+            if slot is None:
+                self.frames_dropped += 1
+                return None
+
+            # Readers only ever pin the latest slot, so nobody can pin this one while it is written
+            target = self.slots[slot]
+
+        np.copyto(target, frame)
+
+        with self.lock:
+            # A reallocation while copying means this slot no longer exists
+            if slot >= len(self.slots) or target is not self.slots[slot]:
+                self.frames_dropped += 1
+                return None
+
+            self.seq += 1
+            self.seqs[slot] = self.seq
+            self.timestamps[slot] = timestamp or time.time()
+            self.formats[slot] = pixel_format
+            self.converted[slot] = {}
+            self.latest_slot = slot
+            self.frame_ready.notify_all()
+            return self.seq
+
+    def _pin_latest(self):
+        slot = self.latest_slot
+        if slot is None:
+            return None
+        self.refcounts[slot] += 1
+        return FrameRef(self, slot, self.generation, self.seqs[slot],
+                        self.timestamps[slot], self.views[slot], self.formats[slot])
+
+    def _convert(self, frame_ref, pixel_format):
+        """Convert a pinned frame once per format; later readers get the cached result"""
+        if pixel_format == frame_ref.pixel_format:
+            return frame_ref.data
+        if frame_ref.data is None:
+            raise ValueError("Frame reference was already released")
+
+        convert = PIXEL_CONVERSIONS[(frame_ref.pixel_format, pixel_format)]
+        with self.convert_locks[frame_ref.slot]:
+            with self.lock:
+                # The cache belongs to the slot's current frame; a reallocated ring has a fresh one
+                current = frame_ref.generation == self.generation and self.seqs[frame_ref.slot] == frame_ref.seq
+                cache = self.converted[frame_ref.slot] if current else {}
+
+            converted = cache.get(pixel_format)
+            if converted is None:
+                converted = convert(frame_ref.data)
+                converted.flags.writeable = False
+                cache[pixel_format] = converted
+            return converted
+
+    def acquire(self):
+        """Pin the latest frame; returns a FrameRef or None if no frame was published yet"""
+        with self.lock:
+            return self._pin_latest()
+
+    def wait_for(self, after_seq=0, timeout=None):
+        """
+        Block until a frame newer than after_seq is published and pin it
+        Returns a FrameRef, or None if the timeout expired or the ring was closed
+        """
+        with self.frame_ready:
+            generation = self.generation
+            ready = self.frame_ready.wait_for(
+                lambda: (self.seq > after_seq and self.latest_slot is not None)
+                        or (self.generation != generation and self.latest_slot is None),
+                timeout)
+            if not ready or self.seq <= after_seq:
+                return None
+            return self._pin_latest()
+
+    def _retain(self, frame_ref):
+        with self.lock:
+            if frame_ref.released or frame_ref.generation != self.generation:
+                return None
+            self.refcounts[frame_ref.slot] += 1
+            return FrameRef(self, frame_ref.slot, frame_ref.generation, frame_ref.seq,
+                            frame_ref.timestamp, frame_ref.data, frame_ref.pixel_format)
+
+    def _release(self, slot, generation):
+        with self.lock:
+            # Pins on slots from before a reallocation no longer count
+            if generation == self.generation and self.refcounts[slot] > 0:
+                self.refcounts[slot] -= 1
+
+    @property
+    def latest_seq(self):
+        """Sequence number of the latest frame (0 if none)"""
+        return self.seq
+
+    def _shared_location(self, frame_ref, array):
+        """Locate an array inside the shared memory of a pinned frame's slot, for worker processes"""
+        with self.lock:
+            if not self.shared or frame_ref.released or frame_ref.generation != self.generation:
+                return None
+            shm = self.shared_memory[frame_ref.slot]
+            base = self.slots[frame_ref.slot].__array_interface__['data'][0]
+
+        if not array.flags.c_contiguous:
+            return None
+        offset = array.__array_interface__['data'][0] - base
+        if offset < 0 or offset + array.nbytes > shm.size:
+            return None
+        return shm.name, offset
+
+    def close(self):
+        """Release shared memory held by the ring"""
+        with self.lock:
+            memory = self.shared_memory + self.retired_memory
+            self.shared_memory = []
+            self.retired_memory = []
+            self.slots = []
+            self.views = []
+            self.shape = None
+            self.dtype = None
+            self.latest_slot = None
+            self.generation += 1
+            self.frame_ready.notify_all()
+
+        # Drop our own array references first; close() refuses while buffers are exported
+        for shm in memory:
+            try:
+                shm.close()
+                shm.unlink()
+            except Exception as e:
+                logger.error(f"Error releasing frame buffer memory: {str(e)}")
@@ -174,12 +174,26 @@ class RelayController:
         self.cleanup()
 
 
-# Singleton relay controller instance for global use
-_relay_instance = None
+# One relay controller per GPIO pin, shared by every camera that opens it
+_relay_controllers = {}
+_relay_lock = threading.Lock()
 
-def get_relay_controller():
-    """Get the global relay controller instance, initializing if necessary"""
-    global _relay_instance
-    if _relay_instance is None:
-        _relay_instance = RelayController()
-    return _relay_instance
+def get_relay_controller(gate_pin=None):
+    """Get the relay controller for a pin (the gate pin if omitted), initializing if necessary"""
+    gate_pin = gate_pin if gate_pin is not None else config.RELAY_PIN_GATE
+    with _relay_lock:
+        relay = _relay_controllers.get(gate_pin)
+        if relay is None:
+            relay = _relay_controllers[gate_pin] = RelayController(gate_pin)
+        return relay
+
+def get_camera_relay(camera_id=None):
+    """Get the relay controller of the gate or door a camera is assigned to"""
+    camera_id = camera_id or config.DEFAULT_CAMERA_ID
+    settings = config.CAMERAS.get(camera_id, {})
+    return get_relay_controller(settings.get('relay_pin'))
+
+def get_relay_controllers():
+    """Get all relay controllers instantiated so far, keyed by pin"""
+    with _relay_lock:
+        return dict(_relay_controllers)
@@ -0,0 +1,395 @@
+import os
+import time
+import logging
+import cv2
+import numpy as np
+import config
+
+# Try to import picamera2, but provide fallback if not available
+PICAMERA_AVAILABLE = False
+try:
+    from picamera2 import Picamera2
+    PICAMERA_AVAILABLE = True
+except ImportError:
+    logger = logging.getLogger(__name__)
+    logger.warning("Picamera2 not available! Using mock camera implementation.")
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+class FrameSource:
+    """
+    Base class of the frame sources a Camera can capture from
+    read() is called repeatedly from the camera's capture thread and returns
+    the next BGR frame, or None if no frame is available right now
+    """
+
+    # Live sources deliver frames at the device's rate; recorded ones are paced here
+    live = True
+
+    # Layout of the frames read() returns: 'bgr' or 'yuv420' (I420)
+    pixel_format = 'bgr'
+
+    def __init__(self, frame_skip=0, pacing='realtime', fps=None):
+        self.frame_skip = max(int(frame_skip or 0), 0)
+        self.pacing = pacing or 'realtime'
+        self.fps = fps
+        self.finished = False
+        self._next_due = 0.0
+
+    def open(self):
+        """Acquire the device, stream or files"""
+
+    def read(self):
+        """Return the next frame or None"""
+        raise NotImplementedError
+
+    def close(self):
+        """Release the device, stream or files"""
+
+    def _pace(self):
+        """Sleep until the next frame of a recorded source is due in real time"""
+        if self.live or self.pacing != 'realtime' or not self.fps:
+            return
+        interval = (self.frame_skip + 1) / float(self.fps)
+        now = time.time()
+        if self._next_due > now:
+            time.sleep(self._next_due - now)
+            now = self._next_due
+        # Never try to catch up on frames missed while the consumer was slow
+        self._next_due = max(self._next_due + interval, now)
+
+
+class PicameraSource(FrameSource):
+    """
+    Raspberry Pi camera through Picamera2
+    Captures in the sensor pipeline's native YUV420 by default so no color
+    conversion runs in the capture thread; consumers convert lazily
+    """
+
+    def __init__(self, camera_num=0, resolution=None, framerate=None, rotation=0, frame_skip=0,
+                 pixel_format=None):
+        super().__init__(frame_skip=frame_skip, fps=framerate)
+        self.camera_num = camera_num
+        self.resolution = tuple(resolution or config.CAMERA_RESOLUTION)
+        self.framerate = framerate or config.CAMERA_FRAMERATE
+        self.rotation = rotation
+        self.pixel_format = pixel_format or config.CAMERA_CAPTURE_FORMAT
+        self.picam = None
+
+    def open(self):
+        # Initialize and configure the real camera
+        # RGB888 is laid out B, G, R in memory, i.e. OpenCV's BGR
+        self.picam = Picamera2(self.camera_num)
+        camera_config = self.picam.create_preview_configuration(
+            main={"size": self.resolution,
+                  "format": "YUV420" if self.pixel_format == 'yuv420' else "RGB888"},
+            controls={"FrameRate": self.framerate}
+        )
+        self.picam.configure(camera_config)
+        self.picam.start()
+
+        # Set rotation if needed
+        if self.rotation:
+            self.picam.set_rotation(self.rotation)
+
+    def read(self):
+        # Frames are produced by the sensor anyway; skipping only saves the conversion
+        for _ in range(self.frame_skip):
+            self.picam.capture_array()
+        frame = self.picam.capture_array()
+
+        # Convert to BGR format for OpenCV compatibility
+        if frame.ndim == 3 and frame.shape[2] == 4:  # If RGBA
+            frame = cv2.cvtColor(frame, cv2.COLOR_RGBA2BGR)
+        return frame
+
+    def close(self):
+        if self.picam:
+            self.picam.close()
+            self.picam = None
+
+
+class MockSource(FrameSource):
+    """
+    Synthetic frames for running without camera hardware
+    The static background is rendered once; each frame only redraws the
+    timestamp and any moving synthetic objects in a preallocated buffer, so the
+    mock doubles as a cheap, deterministic load generator for the recognizers
+    """
+
+    live = False
+
+    def __init__(self, resolution=None, framerate=None, camera_id=None, pacing='realtime', objects=None,
+                 frame_skip=0):
+        super().__init__(frame_skip=frame_skip, pacing=pacing, fps=framerate or config.CAMERA_FRAMERATE)
+        self.resolution = tuple(resolution or config.CAMERA_RESOLUTION)
+        self.camera_id = camera_id or config.DEFAULT_CAMERA_ID
+        self.objects = [dict(obj) for obj in (objects if objects is not None else config.MOCK_CAMERA_OBJECTS)]
+        self.font = cv2.FONT_HERSHEY_SIMPLEX
+        self.frames = 0
+        self.last_timestamp = None
+
+        self.background = self._render_background()
+        self.frame = self.background.copy()
+
+        # Timestamp box: sized once for the widest timestamp the format produces
+        width, height = self.resolution
+        (text_w, text_h), baseline = cv2.getTextSize("0000-00-00 00:00:00", self.font, 0.5, 1)
+        self.timestamp_box = (max(height - 20 - text_h - 2, 0), min(height - 20 + baseline + 2, height),
+                              10, min(10 + text_w + 4, width))
+
+        # Moving objects are drawn per frame; remember where each one was drawn last
+        for obj in self.objects:
+            obj['drawn_at'] = None
+
+    def open(self):
+        logger.info("Starting mock camera")
+
+    def _object_image(self, obj):
+        """Render or load the pixels of one synthetic object"""
+        width, height = obj.get('size', (240, 80) if obj.get('type') == 'plate' else (160, 200))
+
+        if obj.get('image'):
+            image = cv2.imread(obj['image'])
+            if image is not None:
+                return cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA)
+            logger.warning(f"Could not read mock object image {obj['image']}")
+
+        if obj.get('type') == 'plate':
+            # Black characters on a white plate with a dark border
+            image = np.full((height, width, 3), 255, dtype=np.uint8)
+            cv2.rectangle(image, (0, 0), (width - 1, height - 1), (0, 0, 0), max(height // 20, 2))
+            text = obj.get('text', 'ABC123')
+            scale = height / 40.0
+            thickness = max(int(scale * 2), 1)
+            text_w, text_h = cv2.getTextSize(text, self.font, scale, thickness)[0]
+            scale *= min(1.0, 0.9 * width / max(text_w, 1))
+            text_w, text_h = cv2.getTextSize(text, self.font, scale, thickness)[0]
+            cv2.putText(image, text, ((width - text_w) // 2, (height + text_h) // 2),
+                        self.font, scale, (0, 0, 0), thickness)
+            return image
+
+        # Cartoon face; real detectors need an 'image' of a real face
+        image = np.full((height, width, 3), 80, dtype=np.uint8)
+        center = (width // 2, height // 2)
+        cv2.ellipse(image, center, (width * 2 // 5, height * 9 // 20), 0, 0, 360, (150, 180, 220), -1)
+        for eye_x in (width * 7 // 20, width * 13 // 20):
+            cv2.circle(image, (eye_x, height * 2 // 5), max(width // 20, 2), (40, 40, 40), -1)
+        cv2.ellipse(image, (width // 2, height * 13 // 20), (width // 6, height // 16), 0, 0, 180, (40, 40, 120), 2)
+        return image
+
+    def _paste(self, target, image, x, y):
+        """Copy an image into the target at (x, y), clipped to the frame"""
+        frame_h, frame_w = target.shape[:2]
+        h, w = image.shape[:2]
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + w, frame_w), min(y + h, frame_h)
+        if x0 >= x1 or y0 >= y1:
+            return None
+        target[y0:y1, x0:x1] = image[y0 - y:y1 - y, x0 - x:x1 - x]
+        return (y0, y1, x0, x1)
+
+    def _render_background(self):
+        """Static part of every mock frame: label text and non-moving objects"""
+        width, height = self.resolution
+        background = np.zeros((height, width, 3), dtype=np.uint8)
+
+        text = f"MOCK CAMERA {self.camera_id.upper()} - NO HARDWARE"
+        text_size = cv2.getTextSize(text, self.font, 1, 2)[0]
+        text_x = (width - text_size[0]) // 2
+        text_y = (height + text_size[1]) // 2
+        cv2.putText(background, text, (text_x, text_y), self.font, 1, (0, 255, 0), 2)
+
+        for obj in self.objects:
+            obj['pixels'] = self._object_image(obj)
+            if not obj.get('speed'):
+                x, y = obj.get('position', (0, 0))
+                self._paste(background, obj['pixels'], x, y)
+        return background
+
+    def _restore(self, box):
+        y0, y1, x0, x1 = box
+        self.frame[y0:y1, x0:x1] = self.background[y0:y1, x0:x1]
+
+    @staticmethod
+    def _overlaps(a, b):
+        return a[0] < b[1] and b[0] < a[1] and a[2] < b[3] and b[2] < a[3]
+
+    def read(self):
+        self._pace()
+        # Skipped frames still advance the scene, as they would on a real camera
+        self.frames += self.frame_skip + 1
+
+        # Erase every dirty region before drawing anything, so one object's
+        # restore cannot wipe out another object drawn over it this frame
+        moving = [obj for obj in self.objects if obj.get('speed')]
+        dirty = [obj['drawn_at'] for obj in moving if obj['drawn_at']]
+        for box in dirty:
+            self._restore(box)
+
+        # Moving objects travel horizontally and wrap around the frame
+        width = self.resolution[0]
+        for obj in moving:
+            x, y = obj.get('position', (0, 0))
+            span = width + obj['pixels'].shape[1]
+            x = (x + obj['pixels'].shape[1] + int(obj['speed'] * self.frames)) % span - obj['pixels'].shape[1]
+            obj['origin'] = (x, y)
+            obj['drawn_at'] = self._paste(self.frame, obj['pixels'], x, y)
+            if obj['drawn_at']:
+                dirty.append(obj['drawn_at'])
+
+        # The timestamp only changes once a second, but stays on top of objects passing under it
+        timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
+        if timestamp != self.last_timestamp or any(self._overlaps(box, self.timestamp_box) for box in dirty):
+            self.last_timestamp = timestamp
+            self._restore(self.timestamp_box)
+            for obj in moving:
+                if obj['drawn_at'] and self._overlaps(obj['drawn_at'], self.timestamp_box):
+                    self._paste(self.frame, obj['pixels'], *obj['origin'])
+            height = self.resolution[1]
+            cv2.putText(self.frame, timestamp, (10, height - 20), self.font, 0.5, (255, 255, 255), 1)
+
+        # The camera copies the frame into its ring buffer, so the buffer can be reused
+        return self.frame
+
+
+class VideoCaptureSource(FrameSource):
+    """
+    RTSP/HTTP camera stream or local video file through cv2.VideoCapture
+    Streams reconnect after failures; files are paced in real time or read
+    as fast as possible and can loop for load testing
+    """
+
+    def __init__(self, uri, frame_skip=0, pacing='realtime', loop=True, reconnect_delay=2.0):
+        super().__init__(frame_skip=frame_skip, pacing=pacing)
+        self.uri = uri
+        self.loop = loop
+        self.reconnect_delay = reconnect_delay
+        self.live = '://' in uri
+        self.capture = None
+
+    def open(self):
+        self.capture = cv2.VideoCapture(self.uri)
+        if not self.capture.isOpened():
+            raise RuntimeError(f"Could not open video source: {self.uri}")
+
+        # Keep the decoder from queueing stale frames behind the latest one
+        self.capture.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        self.fps = self.capture.get(cv2.CAP_PROP_FPS) or config.CAMERA_FRAMERATE
+        self._next_due = 0.0
+        self.finished = False
+        logger.info(f"Opened video source {self.uri} at {self.fps:.1f} fps")
+
+    def read(self):
+        if self.capture is None:
+            # A stream that failed to reconnect keeps retrying
+            time.sleep(self.reconnect_delay)
+            try:
+                self.open()
+            except Exception as e:
+                logger.error(f"Error reconnecting video stream: {str(e)}")
+            return None
+
+        self._pace()
+
+        # grab() without retrieve() skips the decode cost of dropped frames
+        for _ in range(self.frame_skip):
+            if not self.capture.grab():
+                break
+
+        ok, frame = self.capture.read()
+        if ok:
+            return frame
+
+        if self.live:
+            logger.warning(f"Lost video stream {self.uri}, reconnecting in {self.reconnect_delay}s")
+            self.close()
+        elif self.loop:
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        else:
+            self.finished = True
+        return None
+
+    def close(self):
+        if self.capture is not None:
+            self.capture.release()
+            self.capture = None
+
+
+class ImageDirectorySource(FrameSource):
+    """Replays the images of a directory in file name order"""
+
+    live = False
+
+    def __init__(self, path, framerate=None, frame_skip=0, pacing='realtime', loop=True):
+        super().__init__(frame_skip=frame_skip, pacing=pacing, fps=framerate or config.CAMERA_FRAMERATE)
+        self.path = path
+        self.loop = loop
+        self.files = []
+        self.index = 0
+
+    def open(self):
+        self.files = sorted(os.path.join(self.path, name) for name in os.listdir(self.path)
+                            if name.lower().endswith(IMAGE_EXTENSIONS))
+        if not self.files:
+            raise RuntimeError(f"No images found in {self.path}")
+        self.index = 0
+        self.finished = False
+        logger.info(f"Replaying {len(self.files)} images from {self.path}")
+
+    def read(self):
+        if self.index >= len(self.files):
+            if not self.loop:
+                self.finished = True
+                return None
+            self.index = 0
+
+        self._pace()
+        path = self.files[self.index]
+        self.index += self.frame_skip + 1
+
+        frame = cv2.imread(path)
+        if frame is None:
+            logger.warning(f"Could not read image {path}")
+        return frame
+
+
+def create_frame_source(source=None, uri=None, resolution=None, framerate=None, rotation=0,
+                        camera_num=0, camera_id=None, frame_skip=None, pacing=None, loop=None,
+                        objects=None, pixel_format=None):
+    """
+    Build the frame source for a camera
+    source is 'picamera', 'mock', 'stream' (RTSP/HTTP), 'file' or 'images';
+    it is inferred from uri if only a uri is given
+    """
+    frame_skip = frame_skip if frame_skip is not None else config.CAMERA_FRAME_SKIP
+    pacing = pacing or config.CAMERA_PACING
+    loop = loop if loop is not None else config.CAMERA_LOOP
+
+    if source is None:
+        if uri:
+            source = 'images' if os.path.isdir(uri) else 'stream' if '://' in uri else 'file'
+        else:
+            source = config.CAMERA_SOURCE
+
+    if source == 'picamera' and not PICAMERA_AVAILABLE:
+        logger.warning("Using mock camera implementation (no hardware access)")
+        source = 'mock'
+
+    if source == 'picamera':
+        return PicameraSource(camera_num, resolution, framerate, rotation, frame_skip, pixel_format)
+    if source == 'mock':
+        return MockSource(resolution, framerate, camera_id, pacing, objects, frame_skip)
+    if source in ('stream', 'file'):
+        if not uri:
+            raise ValueError(f"Camera source '{source}' needs a uri")
+        return VideoCaptureSource(uri, frame_skip, pacing, loop)
+    if source == 'images':
+        if not uri:
+            raise ValueError("Camera source 'images' needs a directory uri")
+        return ImageDirectorySource(uri, framerate, frame_skip, pacing, loop)
+    raise ValueError(f"Unknown camera source: {source}")
@@ -0,0 +1,244 @@
+import time
+import itertools
+import threading
+import logging
+import cv2
+import config
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class StreamSubscriber:
+    """
+    One viewer of a FrameBroadcaster
+    Holds only the newest encoded frame; a frame the client did not pick up
+    in time is replaced, never queued
+    """
+
+    def __init__(self, subscriber_id, remote_addr=None):
+        self.subscriber_id = subscriber_id
+        self.remote_addr = remote_addr
+        self.connected_at = time.time()
+        self.condition = threading.Condition()
+        self.jpeg = None
+        self.seq = 0
+        self.timestamp = 0.0
+        self.last_sent_seq = 0
+        self.last_sent_timestamp = 0.0
+        self.frames_sent = 0
+        self.frames_dropped = 0
+        self.closed = False
+
+    def offer(self, jpeg, seq, timestamp):
+        """Hand a new encoded frame to this subscriber, replacing any frame it has not taken yet"""
+        with self.condition:
+            if self.jpeg is not None:
+                self.frames_dropped += 1
+            self.jpeg = jpeg
+            self.seq = seq
+            self.timestamp = timestamp
+            self.condition.notify()
+
+    def take(self, timeout=None):
+        """Wait for the next encoded frame; returns JPEG bytes or None on timeout or close"""
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.jpeg is not None or self.closed, timeout):
+                return None
+            jpeg = self.jpeg
+            self.jpeg = None
+            if jpeg is not None:
+                self.last_sent_seq = self.seq
+                self.last_sent_timestamp = self.timestamp
+                self.frames_sent += 1
+            return jpeg
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+
+    def get_stats(self, latest_seq):
+        """Delivery counters and lag behind the encoder"""
+        lag_seconds = time.time() - self.last_sent_timestamp if self.last_sent_timestamp else None
+        return {
+            'id': self.subscriber_id,
+            'remote_addr': self.remote_addr,
+            'connected_for': round(time.time() - self.connected_at, 1),
+            'frames_sent': self.frames_sent,
+            'frames_dropped': self.frames_dropped,
+            'lag_frames': max(latest_seq - self.last_sent_seq, 0),
+            'lag_seconds': round(lag_seconds, 3) if lag_seconds is not None else None
+        }
+
+
+class FrameBroadcaster:
+    """
+    Single JPEG encoder per camera stream profile
+    Scales, paces and encodes each camera frame once and fans the bytes out to
+    every subscriber; the encoder thread only runs while someone is watching
+    """
+
+    def __init__(self, camera=None, profile=None, camera_id=None):
+        """Initialize broadcaster for a stream profile of a camera, or the camera registered as camera_id"""
+        self.camera = camera
+        self.camera_id = camera.camera_id if camera is not None else (camera_id or config.DEFAULT_CAMERA_ID)
+        self.profile = profile or config.STREAM_DEFAULT_PROFILE
+        settings = config.STREAM_PROFILES[self.profile]
+        self.resolution = tuple(settings['resolution']) if settings.get('resolution') else None
+        self.fps = settings.get('fps')
+        self.quality = settings.get('quality') or 90
+        self.lock = threading.Lock()
+        self.subscribers = {}
+        self.encoder_thread = None
+        self.running = False
+        self._ids = itertools.count(1)
+
+        self.latest_seq = 0
+        self.frames_encoded = 0
+        self.encode_time = 0.0
+
+    def _get_camera(self):
+        if self.camera is None:
+            from .camera import get_camera
+            self.camera = get_camera(self.camera_id)
+        return self.camera
+
+    def subscribe(self, remote_addr=None):
+        """Register a new viewer and start the encoder if it is not running"""
+        subscriber = StreamSubscriber(next(self._ids), remote_addr)
+        with self.lock:
+            self.subscribers[subscriber.subscriber_id] = subscriber
+            if not self.running:
+                self.running = True
+                self.encoder_thread = threading.Thread(target=self._encode_loop)
+                self.encoder_thread.daemon = True
+                self.encoder_thread.start()
+        logger.info(f"Stream subscriber {subscriber.subscriber_id} connected to {self.profile} "
+                    f"({len(self.subscribers)} watching)")
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        """Remove a viewer; the encoder stops by itself once nobody is left"""
+        subscriber.close()
+        with self.lock:
+            self.subscribers.pop(subscriber.subscriber_id, None)
+        logger.info(f"Stream subscriber {subscriber.subscriber_id} disconnected from {self.profile} "
+                    f"({len(self.subscribers)} watching)")
+
+    def stop(self):
+        """Disconnect all viewers and stop the encoder"""
+        with self.lock:
+            self.running = False
+            subscribers = list(self.subscribers.values())
+            self.subscribers = {}
+        for subscriber in subscribers:
+            subscriber.close()
+        if self.encoder_thread and self.encoder_thread.is_alive():
+            self.encoder_thread.join(timeout=2.0)
+
+    def _encode_loop(self):
+        """Background thread encoding each new camera frame once"""
+        camera = self._get_camera()
+        if not camera.is_running:
+            camera.start()
+
+        encode_params = [int(cv2.IMWRITE_JPEG_QUALITY), int(self.quality)]
+        min_interval = 1.0 / self.fps if self.fps else 0.0
+        last_seq = 0
+        next_due = 0.0
+        while True:
+            with self.lock:
+                if not self.subscribers:
+                    self.running = False
+                if not self.running:
+                    break
+                subscribers = list(self.subscribers.values())
+
+            try:
+                frame_ref = camera.wait_for_frame(last_seq, timeout=1.0)
+                if frame_ref is None:
+                    continue
+
+                with frame_ref:
+                    last_seq = frame_ref.seq
+                    timestamp = frame_ref.timestamp
+
+                    # Frame rate cap: frames arriving before the next deadline are never encoded.
+                    # The deadline advances by the interval rather than restarting at each sent
+                    # frame, so camera jitter does not pull the rate below the cap; after a stall
+                    # it restarts instead of bursting to catch up
+                    if timestamp < next_due:
+                        continue
+                    next_due = max(next_due + min_interval, timestamp)
+
+                    start = time.time()
+                    frame = frame_ref.bgr
+                    if self.resolution and (frame.shape[1], frame.shape[0]) != self.resolution:
+                        frame = cv2.resize(frame, self.resolution, interpolation=cv2.INTER_AREA)
+                    ret, jpeg = cv2.imencode('.jpg', frame, encode_params)
+                if not ret:
+                    continue
+
+                self.encode_time += time.time() - start
+                self.frames_encoded += 1
+                self.latest_seq = last_seq
+
+                jpeg = jpeg.tobytes()
+                for subscriber in subscribers:
+                    subscriber.offer(jpeg, last_seq, timestamp)
+
+            except Exception as e:
+                logger.error(f"Error in stream encoder: {str(e)}")
+                time.sleep(1.0)  # Sleep longer on error
+
+    def stream(self, remote_addr=None):
+        """Generator of multipart MJPEG chunks for one HTTP response"""
+        subscriber = self.subscribe(remote_addr)
+        try:
+            while not subscriber.closed:
+                jpeg = subscriber.take(timeout=1.0)
+                if jpeg is None:
+                    continue
+                yield (b'--frame\r\n'
+                       b'Content-Type: image/jpeg\r\n\r\n' + jpeg + b'\r\n')
+        finally:
+            # Runs when the client disconnects and the server closes the generator
+            self.unsubscribe(subscriber)
+
+    def get_stats(self):
+        """Encoder counters and per-viewer lag"""
+        with self.lock:
+            subscribers = list(self.subscribers.values())
+        return {
+            'camera': self.camera_id,
+            'profile': self.profile,
+            'running': self.running,
+            'resolution': self.resolution,
+            'fps': self.fps,
+            'quality': self.quality,
+            'frames_encoded': self.frames_encoded,
+            'mean_encode_ms': round(1000 * self.encode_time / self.frames_encoded, 2) if self.frames_encoded else None,
+            'subscribers': [subscriber.get_stats(self.latest_seq) for subscriber in subscribers]
+        }
+
+
+# One broadcaster per camera and stream profile, shared by all viewers of that stream
+_frame_broadcasters = {}
+_broadcasters_lock = threading.Lock()
+
+def get_frame_broadcaster(profile=None, camera_id=None):
+    """Get the global broadcaster for a camera's stream profile, initializing if necessary"""
+    profile = profile or config.STREAM_DEFAULT_PROFILE
+    camera_id = camera_id or config.DEFAULT_CAMERA_ID
+    with _broadcasters_lock:
+        broadcaster = _frame_broadcasters.get((camera_id, profile))
+        if broadcaster is None:
+            broadcaster = FrameBroadcaster(profile=profile, camera_id=camera_id)
+            _frame_broadcasters[(camera_id, profile)] = broadcaster
+        return broadcaster
+
+def get_frame_broadcasters():
+    """All broadcasters created so far, keyed by (camera id, profile)"""
+    with _broadcasters_lock:
+        return dict(_frame_broadcasters)
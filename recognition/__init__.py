@@ -1,6 +1,7 @@
 from .plate_recognition import (
     get_plate_recognizer,
     get_plate_detection_service,
+    get_plate_detection_services,
     LicensePlateRecognizer,
     PlateDetectionService
 )
@@ -8,17 +9,43 @@ from .plate_recognition import (
 from .face_recognition import (
     get_face_recognizer,
     get_face_detection_service,
+    get_face_detection_services,
     FaceRecognizer,
     FaceDetectionService
 )
 
+from .face_gallery import FaceGallery
+from .face_index import FaceIVFIndex
+from .face_store import FaceEncodingStore, get_face_encoding_store, migrate_legacy_encodings
+from .enrollment import FaceEnrollmentWorker, get_enrollment_worker
+
+from .scheduler import DetectionScheduler, get_detection_scheduler
+
+from .workers import (
+    get_worker_pool,
+    RecognitionWorkerPool
+)
+
 __all__ = [
     'get_plate_recognizer',
     'get_plate_detection_service',
+    'get_plate_detection_services',
     'LicensePlateRecognizer',
     'PlateDetectionService',
     'get_face_recognizer',
     'get_face_detection_service',
+    'get_face_detection_services',
     'FaceRecognizer',
-    'FaceDetectionService'
+    'FaceDetectionService',
+    'FaceGallery',
+    'FaceIVFIndex',
+    'FaceEncodingStore',
+    'get_face_encoding_store',
+    'migrate_legacy_encodings',
+    'FaceEnrollmentWorker',
+    'get_enrollment_worker',
+    'DetectionScheduler',
+    'get_detection_scheduler',
+    'get_worker_pool',
+    'RecognitionWorkerPool'
 ]
@@ -0,0 +1,192 @@
+import queue
+import threading
+import logging
+import cv2
+import face_recognition
+import config
+from .face_store import get_face_encoding_store
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Face.enrollment_status values
+ENROLLMENT_PENDING = 'pending'
+ENROLLMENT_PROCESSING = 'processing'
+ENROLLMENT_ENROLLED = 'enrolled'
+ENROLLMENT_NO_FACE = 'no_face'
+ENROLLMENT_FAILED = 'failed'
+
+def encode_enrollment_image(file_path, max_size=None, jitters=None):
+    """
+    Detect the largest face in an enrollment image and compute its encoding
+    Detection runs on a downscaled copy; the landmark-aligned encoding is
+    computed on the full-resolution image at the detected location
+    Returns the encoding or None if no face was found
+    """
+    image = face_recognition.load_image_file(file_path)
+    max_size = max_size or config.FACE_ENROLLMENT_MAX_SIZE
+    jitters = jitters or config.FACE_ENROLLMENT_JITTERS
+
+    height, width = image.shape[:2]
+    scale = min(1.0, max_size / max(height, width))
+    small = cv2.resize(image, (0, 0), fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1.0 else image
+
+    locations = face_recognition.face_locations(small)
+    if not locations:
+        return None
+
+    # Enrollment photos show one person; take the largest face and map it back to full size
+    top, right, bottom, left = max(locations, key=lambda l: (l[2] - l[0]) * (l[1] - l[3]))
+    location = (int(top / scale), int(right / scale), int(bottom / scale), int(left / scale))
+
+    encodings = face_recognition.face_encodings(image, known_face_locations=[location], num_jitters=jitters)
+    return encodings[0] if encodings else None
+
+
+class FaceEnrollmentWorker:
+    """
+    Background queue computing encodings for newly uploaded faces
+    Uploads return immediately; a fixed number of threads encode queued faces,
+    record the result in Face.enrollment_status and push new encodings into
+    the live gallery
+    """
+
+    def __init__(self, app=None, workers=None):
+        """Initialize worker with specified parameters or use defaults from config"""
+        self.app = app
+        self.workers = workers or config.FACE_ENROLLMENT_WORKERS
+        self.queue = queue.Queue()
+        self.threads = []
+        self.running = False
+        self.lock = threading.Lock()
+
+        self.enrolled = 0
+        self.failed = 0
+
+    def start(self, app=None):
+        """Start the worker threads and queue faces left unfinished by a previous run"""
+        with self.lock:
+            if app is not None:
+                self.app = app
+            if self.running:
+                return
+            if self.app is None:
+                from flask import current_app
+                self.app = current_app._get_current_object()
+            self.running = True
+
+            for _ in range(self.workers):
+                thread = threading.Thread(target=self._work_loop)
+                thread.daemon = True
+                thread.start()
+                self.threads.append(thread)
+
+        logger.info(f"Face enrollment worker started with {self.workers} threads")
+
+        with self.app.app_context():
+            from database import Face
+            unfinished = Face.query.filter(Face.enrollment_status.in_(
+                [ENROLLMENT_PENDING, ENROLLMENT_PROCESSING])).all()
+            for face in unfinished:
+                self.submit(face.id)
+
+    def stop(self):
+        """Stop the worker threads once their current face is done"""
+        with self.lock:
+            if not self.running:
+                return
+            self.running = False
+            threads, self.threads = self.threads, []
+        for _ in threads:
+            self.queue.put(None)
+        for thread in threads:
+            thread.join(timeout=2.0)
+
+    def submit(self, face_id):
+        """Queue a face for encoding"""
+        self.queue.put(face_id)
+
+    def _work_loop(self):
+        """Background thread encoding queued faces one at a time"""
+        while True:
+            face_id = self.queue.get()
+            if face_id is None:
+                break
+            try:
+                with self.app.app_context():
+                    self._enroll(face_id)
+            except Exception as e:
+                logger.error(f"Error enrolling face {face_id}: {str(e)}")
+
+    def _enroll(self, face_id):
+        from database import db, Face
+        from .face_recognition import get_face_recognizer
+
+        face = Face.query.get(face_id)
+        if face is None:
+            return
+
+        store = get_face_encoding_store()
+        if face_id not in store:
+            face.enrollment_status = ENROLLMENT_PROCESSING
+            db.session.commit()
+
+            try:
+                encoding = encode_enrollment_image(face.file_path)
+            except Exception as e:
+                logger.error(f"Error encoding face image {face.file_path}: {str(e)}")
+                face.enrollment_status = ENROLLMENT_FAILED
+                db.session.commit()
+                self.failed += 1
+                return
+
+            if encoding is None:
+                logger.warning(f"No face found in enrollment image {face.file_path}")
+                face.enrollment_status = ENROLLMENT_NO_FACE
+                db.session.commit()
+                self.failed += 1
+                return
+
+            try:
+                stored = store.append(face_id, encoding)
+            except Exception as e:
+                logger.error(f"Error storing encoding of face {face_id}: {str(e)}")
+                stored = False
+
+            # Without a stored encoding the face cannot be matched; keep it out of the gallery
+            if not stored:
+                face.enrollment_status = ENROLLMENT_FAILED
+                db.session.commit()
+                self.failed += 1
+                return
+
+        face.enrollment_status = ENROLLMENT_ENROLLED
+        db.session.commit()
+        self.enrolled += 1
+
+        # Incremental gallery update; a gallery that is still loading picks the face up from the store
+        get_face_recognizer().add_face(face)
+
+    def get_stats(self):
+        """Queue depth and outcome counters"""
+        return {
+            'running': self.running,
+            'workers': self.workers,
+            'queued': self.queue.qsize(),
+            'enrolled': self.enrolled,
+            'failed': self.failed
+        }
+
+
+# Global worker instance
+_enrollment_worker = None
+_enrollment_lock = threading.Lock()
+
+def get_enrollment_worker():
+    """Get the global face enrollment worker, initializing if necessary"""
+    global _enrollment_worker
+    with _enrollment_lock:
+        if _enrollment_worker is None:
+            _enrollment_worker = FaceEnrollmentWorker()
+        return _enrollment_worker
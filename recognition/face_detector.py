@@ -0,0 +1,81 @@
+import os
+import logging
+import cv2
+import config
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Cascade shipped with OpenCV; pip wheels expose its directory as cv2.data,
+# distribution packages (e.g. Raspberry Pi OS python3-opencv) install it here instead
+DEFAULT_CASCADE = 'haarcascade_frontalface_default.xml'
+SYSTEM_CASCADE_DIRS = ['/usr/share/opencv4/haarcascades', '/usr/share/opencv/haarcascades']
+
+def default_cascade_path():
+    """Path of OpenCV's bundled frontal face cascade, or None if it cannot be found"""
+    data = getattr(cv2, 'data', None)
+    directories = ([data.haarcascades] if data is not None else []) + SYSTEM_CASCADE_DIRS
+    for directory in directories:
+        path = os.path.join(directory, DEFAULT_CASCADE)
+        if os.path.exists(path):
+            return path
+    return None
+
+def region_to_location(region):
+    """Convert an (x, y, w, h) region to a face_recognition (top, right, bottom, left) location"""
+    x, y, w, h = region
+    return (y, x + w, y + h, x)
+
+class FaceCascadeDetector:
+    """
+    Cheap first-stage face detector
+    Runs an OpenCV Haar cascade on a small grayscale frame; only the regions it
+    finds are handed to the dlib encoder
+    """
+
+    def __init__(self, cascade_path=None, width=None, min_neighbors=None, min_size=None):
+        """Initialize detector with specified parameters or use defaults from config"""
+        self.cascade_path = cascade_path or config.FACE_CASCADE_PATH or default_cascade_path()
+        self.width = width or config.FACE_CASCADE_WIDTH
+        self.min_neighbors = min_neighbors or config.FACE_CASCADE_MIN_NEIGHBORS
+        self.min_size = min_size or config.FACE_CASCADE_MIN_SIZE
+
+        self.cascade = cv2.CascadeClassifier(self.cascade_path) if self.cascade_path else None
+        if self.cascade is None or self.cascade.empty():
+            logger.error(f"Could not load face cascade {self.cascade_path or DEFAULT_CASCADE}; "
+                         f"falling back to detecting faces with the encoder")
+            self.cascade = None
+
+        self.frames = 0
+        self.frames_with_faces = 0
+
+    @property
+    def available(self):
+        return self.cascade is not None
+
+    def detect(self, gray):
+        """
+        Find faces in a grayscale frame
+        Returns a list of (x, y, w, h) regions in full-frame coordinates
+        """
+        height, width = gray.shape[:2]
+        scale = min(1.0, self.width / width)
+        small = cv2.resize(gray, (0, 0), fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1.0 else gray
+        small = cv2.equalizeHist(small)
+
+        faces = self.cascade.detectMultiScale(small, scaleFactor=1.1, minNeighbors=self.min_neighbors,
+                                              minSize=(self.min_size, self.min_size))
+
+        self.frames += 1
+        if len(faces):
+            self.frames_with_faces += 1
+
+        return [tuple(int(value / scale) for value in face) for face in faces]
+
+    def get_stats(self):
+        """Frame counters of the first stage"""
+        return {
+            'frames': self.frames,
+            'frames_with_faces': self.frames_with_faces
+        }
@@ -0,0 +1,241 @@
+import numpy as np
+import threading
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Length of a face_recognition (dlib) face encoding
+ENCODING_LENGTH = 128
+
+class FaceGallery:
+    """
+    Holds every known face encoding as one contiguous float32 (N x 128) matrix
+    with parallel face id, user id and name arrays, and matches all faces of a
+    frame against the whole gallery in a single matrix operation
+
+    Encodings are keyed by Face.id so single faces can be added or removed
+    without rebuilding the matrix. With an optional FaceIVFIndex, large
+    galleries are searched approximately, scanning only nearby clusters
+    """
+
+    # Initial number of preallocated encoding rows
+    INITIAL_CAPACITY = 64
+
+    def __init__(self, index=None):
+        """Initialize an empty gallery, optionally backed by an approximate index"""
+        self.lock = threading.Lock()
+        self.index = index
+        self._allocate(self.INITIAL_CAPACITY)
+
+    def _allocate(self, capacity):
+        """Reset to an empty gallery with room for the given number of encodings"""
+        # Encoding matrix (capacity x 128); only the first `count` rows are used
+        self.encodings = np.empty((capacity, ENCODING_LENGTH), dtype=np.float32)
+        self.squared_norms = np.empty(capacity, dtype=np.float32)
+        self.count = 0
+
+        # Per-row metadata and the Face.id -> row lookup
+        self.face_ids = []
+        self.user_ids = []
+        self.names = []
+        self.rows = {}
+
+    def _grow(self, minimum):
+        """Grow the preallocated matrix geometrically so appends stay amortized O(1)"""
+        capacity = len(self.encodings)
+        if minimum <= capacity:
+            return
+
+        while capacity < minimum:
+            capacity *= 2
+
+        encodings = np.empty((capacity, ENCODING_LENGTH), dtype=np.float32)
+        encodings[:self.count] = self.encodings[:self.count]
+        squared_norms = np.empty(capacity, dtype=np.float32)
+        squared_norms[:self.count] = self.squared_norms[:self.count]
+
+        self.encodings, self.squared_norms = encodings, squared_norms
+
+    def copy(self):
+        """Independent copy for copy-on-write updates, including its own copy of the index"""
+        gallery = FaceGallery(self.index.copy() if self.index is not None else None)
+        with self.lock:
+            gallery.encodings = self.encodings.copy()
+            gallery.squared_norms = self.squared_norms.copy()
+            gallery.count = self.count
+            gallery.face_ids = list(self.face_ids)
+            gallery.user_ids = list(self.user_ids)
+            gallery.names = list(self.names)
+            gallery.rows = dict(self.rows)
+        return gallery
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, face_id):
+        return face_id in self.rows
+
+    def set_entries(self, entries):
+        """
+        Replace all encodings
+        entries is a list of (face_id, user_id, name, encoding)
+        """
+        with self.lock:
+            self._allocate(max(self.INITIAL_CAPACITY, len(entries)))
+            for face_id, user_id, name, encoding in entries:
+                self._add_locked(face_id, user_id, name, encoding)
+            face_ids = list(self.face_ids)
+            encodings = self.encodings[:self.count].copy()
+
+        if self.index is not None:
+            self.index.sync(face_ids, encodings)
+
+    def clear(self):
+        """Remove all encodings"""
+        with self.lock:
+            self._allocate(self.INITIAL_CAPACITY)
+        if self.index is not None:
+            self.index.sync([], np.empty((0, ENCODING_LENGTH), dtype=np.float32))
+
+    def add(self, face_id, user_id, name, encoding):
+        """Add an encoding, replacing any existing encoding with the same face id"""
+        with self.lock:
+            self._add_locked(face_id, user_id, name, encoding)
+            # An untrained index is trained as soon as enrollments take the gallery past its minimum size
+            train = self.index is not None and not self.index.ready and self.count >= self.index.min_size
+            if train:
+                face_ids = list(self.face_ids)
+                encodings = self.encodings[:self.count].copy()
+
+        if train:
+            self.index.sync(face_ids, encodings)
+        elif self.index is not None:
+            self.index.add(face_id, encoding)
+
+    def _add_locked(self, face_id, user_id, name, encoding):
+        row = self.rows.get(face_id)
+        if row is None:
+            self._grow(self.count + 1)
+            row = self.count
+            self.count += 1
+            self.rows[face_id] = row
+            self.face_ids.append(face_id)
+            self.user_ids.append(user_id)
+            self.names.append(name)
+        else:
+            self.user_ids[row] = user_id
+            self.names[row] = name
+
+        vector = np.asarray(encoding, dtype=np.float32).reshape(ENCODING_LENGTH)
+        self.encodings[row] = vector
+        self.squared_norms[row] = vector @ vector
+
+    def remove(self, face_id):
+        """Remove the encoding for the given face id; returns True if it was present"""
+        with self.lock:
+            removed = self._remove_locked(face_id)
+        if self.index is not None:
+            self.index.remove(face_id)
+        return removed
+
+    def _remove_locked(self, face_id):
+        row = self.rows.pop(face_id, None)
+        if row is None:
+            return False
+
+        # Move the last row into the hole so the used rows stay contiguous
+        last = self.count - 1
+        if row != last:
+            self.encodings[row] = self.encodings[last]
+            self.squared_norms[row] = self.squared_norms[last]
+            self.face_ids[row] = self.face_ids[last]
+            self.user_ids[row] = self.user_ids[last]
+            self.names[row] = self.names[last]
+            self.rows[self.face_ids[row]] = row
+
+        self.face_ids.pop()
+        self.user_ids.pop()
+        self.names.pop()
+        self.count = last
+        return True
+
+    def remove_user(self, user_id):
+        """Remove every encoding belonging to a user; returns the number removed"""
+        with self.lock:
+            face_ids = [face_id for face_id, owner in zip(self.face_ids, self.user_ids)
+                        if owner == user_id]
+            for face_id in face_ids:
+                self._remove_locked(face_id)
+        if self.index is not None:
+            for face_id in face_ids:
+                self.index.remove(face_id)
+        return len(face_ids)
+
+    def distances(self, encodings):
+        """
+        Euclidean distances between query encodings and every known encoding
+        Returns (distances, face_ids, user_ids, names) where distances is an
+        (M queries x N known) array and the lists label its columns
+        """
+        queries = np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_LENGTH)
+        query_norms = np.einsum('ij,ij->i', queries, queries)
+
+        # |a - b|^2 = |a|^2 + |b|^2 - 2ab, one GEMM for the whole frame
+        with self.lock:
+            count = self.count
+            squared = self.squared_norms[:count] - 2.0 * (queries @ self.encodings[:count].T)
+            face_ids = list(self.face_ids)
+            user_ids = list(self.user_ids)
+            names = list(self.names)
+
+        squared += query_norms[:, None]
+        return np.sqrt(np.maximum(squared, 0.0)), face_ids, user_ids, names
+
+    def _nearest(self, distances, face_ids, user_ids, names, k):
+        """Top-k (distance, face_id, user_id, name) tuples of one distance row, nearest first"""
+        k = min(k, len(face_ids))
+        if k == 0:
+            return []
+        if k < len(face_ids):
+            # Partial selection is O(N); only the k survivors are sorted
+            columns = np.argpartition(distances, k - 1)[:k]
+        else:
+            columns = np.arange(len(face_ids))
+        columns = columns[np.argsort(distances[columns])]
+        return [(float(distances[column]), face_ids[column], user_ids[column], names[column])
+                for column in columns]
+
+    def _approximate_search(self, queries, k):
+        """Score each query only against the faces in its nearest index clusters"""
+        results = []
+        for query, candidates in zip(queries, self.index.candidates(queries)):
+            with self.lock:
+                rows = [self.rows[face_id] for face_id in candidates if face_id in self.rows]
+                encodings = self.encodings[rows]
+                squared_norms = self.squared_norms[rows]
+                face_ids = [self.face_ids[row] for row in rows]
+                user_ids = [self.user_ids[row] for row in rows]
+                names = [self.names[row] for row in rows]
+
+            squared = squared_norms - 2.0 * (encodings @ query) + query @ query
+            distances = np.sqrt(np.maximum(squared, 0.0))
+            results.append(self._nearest(distances, face_ids, user_ids, names, k))
+        return results
+
+    def search(self, encodings, k=1):
+        """
+        Find the k nearest known encodings for each query encoding
+        Exact for small galleries; approximate through the index once it is trained
+        Returns one list per query of (distance, face_id, user_id, name) tuples, nearest first
+        """
+        if len(encodings) == 0:
+            return []
+
+        if self.index is not None and self.index.ready and self.count >= self.index.min_size:
+            queries = np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_LENGTH)
+            return self._approximate_search(queries, k)
+
+        distances, face_ids, user_ids, names = self.distances(encodings)
+        return [self._nearest(row, face_ids, user_ids, names, k) for row in distances]
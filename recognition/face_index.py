@@ -0,0 +1,215 @@
+import os
+import numpy as np
+import threading
+import logging
+import config
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class FaceIVFIndex:
+    """
+    Inverted-file (IVF) approximate nearest-neighbour index over face encodings
+    Encodings are clustered around k-means centroids; a query only scans the
+    faces of its `probes` nearest clusters instead of the whole gallery
+
+    The index only maps face ids to clusters; the encodings themselves stay in
+    the FaceGallery matrix. Centroids and assignments are persisted so k-means
+    is not rerun at every start
+    """
+
+    # Format version of the persisted index
+    VERSION = 1
+
+    def __init__(self, path=None, lists=None, probes=None, min_size=None):
+        """Initialize an untrained index with specified parameters or use defaults from config"""
+        self.path = path or config.FACE_ANN_INDEX_PATH
+        self.lists = lists if lists is not None else config.FACE_ANN_LISTS
+        self.probes = probes or config.FACE_ANN_PROBES
+        self.min_size = min_size if min_size is not None else config.FACE_ANN_MIN_SIZE
+        self.lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.centroids = None
+        self.members = []  # cluster -> set of face ids
+        self.assignments = {}  # face id -> cluster
+        self.trained_size = 0
+
+    @property
+    def ready(self):
+        """True once centroids exist and the index can answer queries"""
+        return self.centroids is not None
+
+    def __len__(self):
+        return len(self.assignments)
+
+    def copy(self):
+        """Independent copy for copy-on-write gallery snapshots; centroids are replaced, never modified, so they are shared"""
+        index = FaceIVFIndex(self.path, self.lists, self.probes, self.min_size)
+        with self.lock:
+            index.centroids = self.centroids
+            index.members = [set(members) for members in self.members]
+            index.assignments = dict(self.assignments)
+            index.trained_size = self.trained_size
+        return index
+
+    def _nearest_centroids(self, vectors, count=1):
+        """Indices of the `count` nearest centroids of each vector"""
+        squared = (np.einsum('ij,ij->i', self.centroids, self.centroids)[None, :]
+                   - 2.0 * (vectors @ self.centroids.T))
+        if count >= len(self.centroids):
+            return np.argsort(squared, axis=1)
+        nearest = np.argpartition(squared, count - 1, axis=1)[:, :count]
+        return nearest
+
+    def train(self, face_ids, encodings, iterations=10, seed=0):
+        """Cluster the given encodings with k-means and assign every face to a cluster"""
+        encodings = np.asarray(encodings, dtype=np.float32)
+        count = len(face_ids)
+        lists = self.lists or max(int(np.sqrt(count)), 1)
+        lists = min(lists, count)
+
+        # Plain Lloyd iterations seeded from a random sample; deterministic for a given gallery
+        rng = np.random.default_rng(seed)
+        centroids = encodings[rng.choice(count, lists, replace=False)].copy()
+        for _ in range(iterations):
+            squared = (np.einsum('ij,ij->i', centroids, centroids)[None, :]
+                       - 2.0 * (encodings @ centroids.T))
+            labels = np.argmin(squared, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, encodings)
+            sizes = np.bincount(labels, minlength=lists)
+            filled = sizes > 0
+            centroids[filled] = sums[filled] / sizes[filled, None]
+
+        with self.lock:
+            self.centroids = centroids
+            self.members = [set() for _ in range(lists)]
+            self.assignments = {}
+            for face_id, label in zip(face_ids, self._nearest_centroids(encodings)[:, 0]):
+                self.members[label].add(face_id)
+                self.assignments[face_id] = int(label)
+            self.trained_size = count
+
+        logger.info(f"Trained face index with {lists} clusters over {count} encodings")
+
+    def sync(self, face_ids, encodings):
+        """
+        Bring the index in line with the gallery after a full load
+        Reuses the persisted centroids when possible and retrains once the
+        gallery has doubled since the last training
+        """
+        if len(face_ids) < self.min_size:
+            with self.lock:
+                self._reset()
+            return
+
+        if not self.ready:
+            self.load()
+        if not self.ready or len(face_ids) >= 2 * max(self.trained_size, 1):
+            self.train(face_ids, encodings)
+            self.save()
+            return
+
+        # Assign faces enrolled while the index was not running, drop deleted ones
+        known = set(face_ids)
+        with self.lock:
+            stale = [face_id for face_id in self.assignments if face_id not in known]
+            for face_id in stale:
+                self._remove_locked(face_id)
+            missing = [(face_id, encoding) for face_id, encoding in zip(face_ids, encodings)
+                       if face_id not in self.assignments]
+            for face_id, encoding in missing:
+                self._add_locked(face_id, encoding)
+
+        if stale or missing:
+            self.save()
+
+    def add(self, face_id, encoding):
+        """
+        Assign a new or changed face to its nearest cluster
+        An untrained index ignores it; the gallery trains the index through sync() once it is large enough
+        """
+        if not self.ready:
+            return
+        with self.lock:
+            self._add_locked(face_id, encoding)
+
+    def _add_locked(self, face_id, encoding):
+        self._remove_locked(face_id)
+        vector = np.asarray(encoding, dtype=np.float32).reshape(1, -1)
+        label = int(self._nearest_centroids(vector)[0, 0])
+        self.members[label].add(face_id)
+        self.assignments[face_id] = label
+
+    def remove(self, face_id):
+        """Remove a face from its cluster"""
+        with self.lock:
+            self._remove_locked(face_id)
+
+    def _remove_locked(self, face_id):
+        label = self.assignments.pop(face_id, None)
+        if label is not None:
+            self.members[label].discard(face_id)
+
+    def candidates(self, queries, probes=None):
+        """
+        Face ids worth scanning for each query: the members of its nearest clusters
+        Returns one list of face ids per query
+        """
+        probes = probes or self.probes
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.centroids.shape[1])
+        with self.lock:
+            nearest = self._nearest_centroids(queries, min(probes, len(self.centroids)))
+            return [[face_id for label in labels for face_id in self.members[label]]
+                    for labels in nearest]
+
+    def save(self):
+        """Persist centroids and assignments atomically"""
+        if not self.ready:
+            return
+        with self.lock:
+            face_ids = np.array(list(self.assignments), dtype=np.int64)
+            labels = np.array([self.assignments[face_id] for face_id in face_ids], dtype=np.int32)
+            centroids = self.centroids.copy()
+            trained_size = self.trained_size
+
+        try:
+            # np.savez appends .npz to names without it; write through a file object instead
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                np.savez(f, version=self.VERSION, centroids=centroids, face_ids=face_ids,
+                         labels=labels, trained_size=trained_size)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.error(f"Error saving face index: {str(e)}")
+
+    def load(self):
+        """Load a persisted index; returns True if one was found"""
+        if not os.path.exists(self.path):
+            return False
+        try:
+            with np.load(self.path) as data:
+                if int(data['version']) != self.VERSION:
+                    return False
+                centroids = data['centroids'].astype(np.float32)
+                face_ids = data['face_ids'].tolist()
+                labels = data['labels'].tolist()
+                trained_size = int(data['trained_size'])
+        except Exception as e:
+            logger.error(f"Error loading face index: {str(e)}")
+            return False
+
+        with self.lock:
+            self.centroids = centroids
+            self.members = [set() for _ in range(len(centroids))]
+            self.assignments = {}
+            for face_id, label in zip(face_ids, labels):
+                self.members[label].add(face_id)
+                self.assignments[face_id] = label
+            self.trained_size = trained_size
+
+        logger.info(f"Loaded face index with {len(centroids)} clusters from {self.path}")
+        return True
@@ -1,228 +1,408 @@
 import cv2
-import numpy as np
-import os
 import time
 import threading
 import logging
+from contextlib import nullcontext
 import face_recognition
-import pickle
 from pathlib import Path
 import config
-from database import log_access
+from .workers import get_worker_pool, use_worker_pool
+from .face_detector import FaceCascadeDetector, region_to_location
+from .tracking import FaceTracker
+from .scheduler import get_detection_scheduler
+from .face_gallery import FaceGallery
+from .face_index import FaceIVFIndex
+from .face_store import get_face_encoding_store
+from .enrollment import get_enrollment_worker, ENROLLMENT_NO_FACE, ENROLLMENT_FAILED
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def detect_and_encode_faces(frame, scale=0.25, rgb=False):
+    """
+    Find faces in a BGR frame (RGB if rgb is True) and compute their 128-d encodings
+    Returns (face_locations, face_encodings) with locations in full-frame coordinates
+    """
+    # Resize frame for faster face recognition
+    small_frame = cv2.resize(frame, (0, 0), fx=scale, fy=scale)
+    
+    # Convert from BGR to RGB (face_recognition uses RGB)
+    if rgb:
+        rgb_small_frame = small_frame
+    else:
+        rgb_small_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
+    
+    # Find face locations and encodings
+    face_locations = face_recognition.face_locations(rgb_small_frame)
+    face_encodings = face_recognition.face_encodings(rgb_small_frame, face_locations)
+    
+    # Scale face locations back to original frame size
+    face_locations = [tuple(int(value / scale) for value in location) for location in face_locations]
+    
+    return face_locations, face_encodings
+
+def encode_faces(frame, face_locations, rgb=True):
+    """
+    Compute 128-d encodings for faces already located in an RGB frame (BGR if rgb is False)
+    Only the landmark and encoder networks run; no detection pass is made
+    """
+    if not rgb:
+        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    return face_recognition.face_encodings(frame, face_locations)
+
+
 class FaceRecognizer:
-    """Recognizes faces in images and matches them against the database"""
+    """
+    Recognizes faces in images and matches them against the database
+    
+    The known faces live in a copy-on-write gallery snapshot: recognition reads
+    whatever snapshot is current without locking, while reloads and enrollment
+    changes build a new snapshot and swap it in with a single assignment
+    """
     
     def __init__(self, match_threshold=None):
         """Initialize face recognizer"""
         self.match_threshold = match_threshold or config.FACE_MATCH_THRESHOLD
-        self.known_face_encodings = []
-        self.known_face_names = []
-        self.known_face_user_ids = []
+        
+        # Known encodings as one contiguous matrix with parallel face id, user id and name arrays,
+        # optionally searched through an approximate index for large deployments
+        self.gallery = FaceGallery(FaceIVFIndex() if config.FACE_ANN_ENABLED else None)
+        self.loaded = False
+        
+        # Serializes writers (reloads and enrollment changes); recognition never takes it
         self.lock = threading.Lock()
         
+        # Enrollment changes waiting for the writer lock; they are applied to one copy together
+        self.pending_changes = []
+        self.pending_lock = threading.Lock()
+        
+        # Index changes are persisted after a quiet period, not on every change
+        self.index_save_timer = None
+        self.index_dirty = False
+        
+        # Background reload state
+        self.app = None
+        self.reload_thread = None
+        self.reload_lock = threading.Lock()
+        
         # Encodings will be loaded on first use or when explicitly called
         logger.info("Face recognizer initialized; encodings will be loaded when needed")
+    
+    def _get_app(self, app=None):
+        """Remember the Flask app so reloads can run in their own application context"""
+        from flask import current_app, has_app_context
+        if app is not None:
+            self.app = app
+        elif self.app is None and has_app_context():
+            self.app = current_app._get_current_object()
+        return self.app
+    
+    def reload_async(self, app=None):
+        """
+        Rebuild the gallery from the database in a background thread and swap it in when done
+        Returns the reload thread, or None if no application is known yet
+        """
+        app = self._get_app(app)
+        if app is None:
+            logger.warning("No Flask application available to reload face encodings")
+            return None
         
+        with self.reload_lock:
+            # One reload at a time; a running reload already picks up the latest rows
+            if self.reload_thread and self.reload_thread.is_alive():
+                return self.reload_thread
+            
+            self.reload_thread = threading.Thread(target=self._reload_in_context, args=(app,))
+            self.reload_thread.daemon = True
+            self.reload_thread.start()
+            return self.reload_thread
+    
+    def _reload_in_context(self, app):
+        with app.app_context():
+            self.load_face_encodings()
+    
     def load_face_encodings(self):
-        """Load face encodings from the database"""
+        """
+        Load face encodings from the database into a new gallery snapshot
+        Runs synchronously; use reload_async() to keep the caller responsive
+        """
         try:
             # Import here to avoid circular imports
             from flask import current_app
             
             with self.lock:
-                # Clear existing encodings
-                self.known_face_encodings = []
-                self.known_face_names = []
-                self.known_face_user_ids = []
+                # Encodings are collected first and swapped into the gallery in one go
+                entries = []
                 
                 # Check if we're in an application context
                 if not current_app._get_current_object():
                     logger.warning("No Flask application context available to load face encodings")
                     return
+                self._get_app()
                 
                 # Import here to avoid circular imports
-                from database import User, Face, db
+                from database import User, Face
                 
-                # Get all active users with face records
-                users = User.query.filter_by(is_active=True).all()
+                # Every active face of every active user in one query
+                rows = Face.query.join(User) \
+                    .add_columns(User.first_name, User.last_name) \
+                    .filter(Face.is_active.is_(True), User.is_active.is_(True)) \
+                    .all()
                 
-                for user in users:
-                    # Get all active faces for this user
-                    faces = Face.query.filter_by(user_id=user.id, is_active=True).all()
+                # All stored encodings in one memory-mapped read
+                stored = get_face_encoding_store().load()
+                
+                for face, first_name, last_name in rows:
+                    encoding = stored.get(face.id)
+                    if encoding is None:
+                        # Encoding is never computed here; the enrollment worker adds it to the gallery when done
+                        if face.enrollment_status not in (ENROLLMENT_NO_FACE, ENROLLMENT_FAILED):
+                            get_enrollment_worker().submit(face.id)
+                        continue
                     
-                    for face in faces:
-                        # Check if encoding file exists
-                        if face.encoding_path and os.path.exists(face.encoding_path):
-                            try:
-                                # Load encoding from file
-                                with open(face.encoding_path, 'rb') as f:
-                                    encoding = pickle.load(f)
-                                    
-                                # Add to known faces
-                                self.known_face_encodings.append(encoding)
-                                self.known_face_names.append(f"{user.first_name} {user.last_name}")
-                                self.known_face_user_ids.append(user.id)
-                                
-                            except Exception as e:
-                                logger.error(f"Error loading face encoding {face.encoding_path}: {str(e)}")
-                        
-                        # If no encoding file but image file exists, generate encoding
-                        elif face.file_path and os.path.exists(face.file_path):
-                            try:
-                                # Load image
-                                image = face_recognition.load_image_file(face.file_path)
-                                
-                                # Generate encoding
-                                encodings = face_recognition.face_encodings(image)
-                                
-                                # If face found in image, use first encoding
-                                if encodings:
-                                    encoding = encodings[0]
-                                    
-                                    # Save encoding to file
-                                    encoding_filename = f"{os.path.splitext(os.path.basename(face.file_path))[0]}_encoding.dat"
-                                    encoding_path = os.path.join(config.FACE_IMAGES_DIR, encoding_filename)
-                                    
-                                    with open(encoding_path, 'wb') as f:
-                                        pickle.dump(encoding, f)
-                                    
-                                    # Update database record
-                                    face.encoding_path = encoding_path
-                                    db.session.commit()
-                                    
-                                    # Add to known faces
-                                    self.known_face_encodings.append(encoding)
-                                    self.known_face_names.append(f"{user.first_name} {user.last_name}")
-                                    self.known_face_user_ids.append(user.id)
-                                    
-                            except Exception as e:
-                                logger.error(f"Error generating face encoding for {face.file_path}: {str(e)}")
+                    # Add to known faces
+                    entries.append((face.id, face.user_id, f"{first_name} {last_name}", encoding))
                 
-                logger.info(f"Loaded {len(self.known_face_encodings)} face encodings")
+                # Build the new snapshot completely before readers can see it
+                index = self.gallery.index
+                gallery = FaceGallery(index.copy() if index is not None else None)
+                gallery.set_entries(entries)
+                self.gallery = gallery
+                self.loaded = True
+                logger.info(f"Loaded {len(gallery)} face encodings")
         except Exception as e:
             logger.error(f"Error loading face encodings: {str(e)}")
     
-    def recognize_faces(self, frame):
+    def add_face(self, face):
         """
-        Recognize faces in the given frame
-        Returns list of (name, user_id, confidence, face_location) tuples
+        Add a newly enrolled Face to the gallery (and its index) without reloading everything
+        Returns True if the face's encoding was in the encoding store
         """
-        if frame is None:
-            return []
-        
-        # Make sure encodings are loaded
-        if not self.known_face_encodings:
-            self.load_face_encodings()
+        return self.add_faces([face]) == 1
+    
+    def add_faces(self, faces):
+        """
+        Add or refresh several Faces with a single gallery swap
+        Returns the number of faces whose encoding was in the encoding store
+        """
+        store = get_face_encoding_store()
+        entries = []
+        for face in faces:
+            user = face.user
+            if not face.is_active or user is None or not user.is_active:
+                continue
             
-        # If still no encodings after loading attempt, return empty list
-        if not self.known_face_encodings:
-            return []
+            encoding = store.get(face.id)
+            if encoding is None:
+                continue
             
-        # Resize frame for faster face recognition
-        small_frame = cv2.resize(frame, (0, 0), fx=0.25, fy=0.25)
+            entries.append((face.id, user.id, f"{user.first_name} {user.last_name}", encoding))
         
-        # Convert from BGR to RGB (face_recognition uses RGB)
-        rgb_small_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
+        def add_entries(gallery):
+            for entry in entries:
+                gallery.add(*entry)
         
-        # Find face locations and encodings
-        face_locations = face_recognition.face_locations(rgb_small_frame)
-        face_encodings = face_recognition.face_encodings(rgb_small_frame, face_locations)
+        if entries:
+            self._update_gallery(add_entries)
+        return len(entries)
+    
+    def remove_face(self, face_id):
+        """Remove a deleted Face from the gallery (and its index) and the encoding store"""
+        get_face_encoding_store().remove([face_id])
+        return self._update_gallery(lambda gallery: gallery.remove(face_id))
+    
+    def remove_user(self, user_id):
+        """Remove every face of a deleted user from the gallery (and its index) and the encoding store"""
+        gallery = self.gallery
+        get_face_encoding_store().remove([face_id for face_id, owner in zip(gallery.face_ids, gallery.user_ids)
+                                          if owner == user_id])
+        return self._update_gallery(lambda gallery: gallery.remove_user(user_id))
+    
+    def update_user(self, user):
+        """
+        Bring the gallery in line with an edited user
+        Encodings stay in the encoding store, so a reactivated user needs no re-encoding
+        """
+        # Deactivated users must no longer match
+        if not user.is_active:
+            return self._update_gallery(lambda gallery: gallery.remove_user(user.id))
         
-        # Match each face against known faces
-        recognized_faces = []
+        # Re-adding a face replaces its entry, which also picks up a changed name
+        return self.add_faces(user.faces)
+    
+    def _update_gallery(self, change):
+        """
+        Apply a change to a copy of the current gallery and swap the copy in
+        Changes queued while another writer holds the lock are coalesced: the
+        next writer applies all of them to one copy and swaps once
+        """
+        pending = [change, None]
+        with self.pending_lock:
+            self.pending_changes.append(pending)
         
-        for face_encoding, face_location in zip(face_encodings, face_locations):
-            # Compare face with known faces
-            matches = face_recognition.compare_faces(
-                self.known_face_encodings, face_encoding, tolerance=self.match_threshold)
-            
-            # Calculate face distances for confidence score
-            face_distances = face_recognition.face_distance(self.known_face_encodings, face_encoding)
+        with self.lock:
+            with self.pending_lock:
+                changes, self.pending_changes = self.pending_changes, []
             
-            if any(matches) and len(face_distances) > 0:
-                # Find the best match
-                best_match_index = np.argmin(face_distances)
+            # An earlier writer may already have applied this change
+            if changes:
+                gallery = self.gallery.copy()
+                for entry in changes:
+                    entry[1] = entry[0](gallery)
+                self.gallery = gallery
                 
-                if matches[best_match_index]:
-                    name = self.known_face_names[best_match_index]
-                    user_id = self.known_face_user_ids[best_match_index]
-                    confidence = 1.0 - face_distances[best_match_index]  # Convert distance to confidence score
-                    
-                    # Scale face location back to original frame size
-                    top, right, bottom, left = face_location
-                    top *= 4
-                    right *= 4
-                    bottom *= 4
-                    left *= 4
-                    
-                    recognized_faces.append((name, user_id, confidence, (top, right, bottom, left)))
+                if gallery.index is not None:
+                    self._schedule_index_save()
+        
+        return pending[1]
+    
+    def _schedule_index_save(self):
+        """Persist the index once no change has arrived for FACE_ANN_SAVE_DELAY seconds"""
+        self.index_dirty = True
+        if self.index_save_timer is not None:
+            self.index_save_timer.cancel()
+        self.index_save_timer = threading.Timer(config.FACE_ANN_SAVE_DELAY, self.save_index)
+        self.index_save_timer.daemon = True
+        self.index_save_timer.start()
+    
+    def save_index(self):
+        """Persist the current snapshot's index if it changed since the last save; also called at shutdown"""
+        with self.lock:
+            if self.index_save_timer is not None:
+                self.index_save_timer.cancel()
+                self.index_save_timer = None
+            if not self.index_dirty:
+                return
+            self.index_dirty = False
+            index = self.gallery.index
+        
+        if index is not None:
+            index.save()
+    
+    def _current_gallery(self):
+        """
+        The current gallery snapshot, or None if it has not been loaded yet
+        A missing gallery is loaded in the background; recognition does not wait for it
+        """
+        if not self.loaded:
+            self.reload_async()
+            return None
+        return self.gallery
+    
+    def recognize_faces(self, frame, rgb=False):
+        """
+        Recognize faces in the given BGR frame (RGB if rgb is True)
+        Returns list of (name, user_id, confidence, face_location) tuples
+        """
+        if frame is None:
+            return []
         
+        # Skip detection entirely until there is something to match against
+        gallery = self._current_gallery()
+        if gallery is None or not len(gallery):
+            return []
+            
+        face_locations, face_encodings = detect_and_encode_faces(frame, rgb=rgb)
+        return self.match_faces(face_locations, face_encodings, gallery)
+    
+    def match_faces(self, face_locations, face_encodings, gallery=None):
+        """
+        Match face encodings (e.g. computed by a worker process) against known faces
+        Returns list of (name, user_id, confidence, face_location) tuples
+        """
+        recognized_faces = []
+        matches = self._match_encodings(face_encodings, gallery or self.gallery)
+        for face_location, match in zip(face_locations, matches):
+            if match:
+                name, user_id, confidence = match
+                recognized_faces.append((name, user_id, confidence, face_location))
         return recognized_faces
     
-    def process_frame(self, frame):
+    def identify_encodings(self, face_encodings):
+        """
+        Match face encodings one to one against known faces
+        Returns one (name, user_id, confidence) tuple or None per encoding,
+        or None if the gallery has not been loaded yet
+        """
+        gallery = self._current_gallery()
+        if gallery is None:
+            return None
+        return self._match_encodings(face_encodings, gallery)
+    
+    def _match_encodings(self, face_encodings, gallery):
+        # Score every face of the frame against the whole gallery at once
+        matches = []
+        for candidates in gallery.search(face_encodings, k=1):
+            match = None
+            if candidates:
+                # Accept the best match only within the distance tolerance
+                distance, _, user_id, name = candidates[0]
+                if distance <= self.match_threshold:
+                    confidence = 1.0 - distance  # Convert distance to confidence score
+                    match = (name, user_id, confidence)
+            matches.append(match)
+        return matches
+    
+    def process_frame(self, frame, rgb=False):
         """
-        Process a frame to recognize faces
+        Process a BGR frame (RGB if rgb is True) to recognize faces
         Returns list of (name, user_id, confidence, face_location) tuples
         """
-        with self.lock:
-            return self.recognize_faces(frame)
+        # Reads an immutable gallery snapshot, so no lock is needed
+        return self.recognize_faces(frame, rgb=rgb)
     
-    def allow_access(self, user_id, name, frame, confidence):
+    def process_encodings(self, face_locations, face_encodings):
         """
-        Allow access to user by activating the appropriate relay
-        Logs the access event in the database
+        Match faces detected and encoded elsewhere, e.g. in a worker process
+        Returns list of (name, user_id, confidence, face_location) tuples
         """
-        try:
-            from flask import current_app
-            from hardware import get_relay_controller
-            
-            # Convert frame to binary for storage
-            _, jpg_data = cv2.imencode('.jpg', frame)
-            binary_image = jpg_data.tobytes()
-            
-            # Check if we're in an application context
-            if not current_app._get_current_object():
-                logger.warning("No Flask application context available to log face access")
-                # Still try to open gate
-                try:
-                    relay = get_relay_controller()
-                    relay.open_gate()
-                    return True
-                except Exception as e:
-                    logger.error(f"Error activating relay: {str(e)}")
-                return False
+        gallery = self._current_gallery()
+        if gallery is None:
+            return []
             
-            # Import here to avoid circular imports
-            from database import log_access
+        return self.match_faces(face_locations, face_encodings, gallery)
+    
+    def allow_access(self, user_id, name, frame, confidence, camera_id=None, face_location=None):
+        """
+        Allow access to user by activating the relay of the camera's door
+        The relay fires first; the access event is queued for the background writer
+        """
+        from hardware import get_camera_relay
+        from database import get_access_event_writer
+        
+        camera_id = camera_id or config.DEFAULT_CAMERA_ID
+        opened = False
+        
+        # Activate the relay assigned to this camera before anything touches the disk
+        try:
+            relay = get_camera_relay(camera_id)
+            relay.open_gate()
+            opened = True
+        except Exception as e:
+            logger.error(f"Error activating relay: {str(e)}")
+        
+        # Log authorized access; images are encoded and written by the writer thread
+        try:
+            crop = None
+            if face_location is not None:
+                top, right, bottom, left = face_location
+                crop = frame[max(top, 0):bottom, max(left, 0):right]
             
-            # Log authorized access
-            log_access(
+            get_access_event_writer().submit(
+                frame=frame,
+                crop=crop,
                 access_type='pedestrian',
                 recognition_type='face',
-                image_data=binary_image,
                 user_id=user_id,
                 is_authorized=True,
                 confidence_score=confidence,
-                notes=f"Face recognized: {name}"
+                notes=f"Face recognized: {name} on camera {camera_id}"
             )
-            
-            # Activate appropriate relay (can be extended for different doors)
-            try:
-                relay = get_relay_controller()
-                relay.open_gate()  # For now, use the same gate relay
-                return True
-            except Exception as e:
-                logger.error(f"Error activating relay: {str(e)}")
-                return False
-                
         except Exception as e:
-            logger.error(f"Error in face allow_access: {str(e)}")
-            return False
+            logger.error(f"Error queueing access event: {str(e)}")
+        
+        return opened
 
 
 # Singleton recognizer instance for global use
@@ -237,16 +417,38 @@ def get_face_recognizer():
 
 
 class FaceDetectionService:
-    """Service for continuously detecting faces from camera feed"""
+    """
+    Service for continuously detecting faces from camera feed
     
-    def __init__(self, interval=None):
-        """Initialize face detection service"""
+    With the cascade detector a cheap first stage finds faces on a small gray
+    frame; the encoder only runs on faces that are new, still unidentified or
+    due for re-verification, so an idle door costs one cascade pass per frame
+    """
+    
+    def __init__(self, camera_id=None, interval=None):
+        """Initialize face detection service for a camera (the default camera if omitted)"""
+        self.camera_id = camera_id or config.DEFAULT_CAMERA_ID
         self.interval = interval or config.FACE_DETECTION_INTERVAL
         self.running = False
         self.detection_thread = None
+        self.app = None
+        self.schedule = None
+        self.detector = None
+        if config.FACE_DETECTOR == 'cascade':
+            detector = FaceCascadeDetector()
+            self.detector = detector if detector.available else None
+        self.tracker = FaceTracker()
+        self.frames_processed = 0
+        self.faces_encoded = 0
+        self.faces_skipped = 0
+        self.grants = 0
+        self.recent_grants = {}  # user id -> time of last grant on the untracked path
     
-    def start(self):
-        """Start the face detection service"""
+    def start(self, app=None):
+        """
+        Start the face detection service
+        Recognition runs in the application context of app (the current app if omitted)
+        """
         if not config.FACE_RECOGNITION_ENABLED:
             logger.info("Face recognition is disabled in configuration")
             return
@@ -255,12 +457,15 @@ class FaceDetectionService:
             logger.warning("Face detection service is already running")
             return
             
+        # The recognizer remembers the app for its own background reloads too
+        self.app = get_face_recognizer()._get_app(app)
         self.running = True
+        self.schedule = get_detection_scheduler().register(f'face:{self.camera_id}', self.camera_id, self.interval)
         self.detection_thread = threading.Thread(target=self._detection_loop)
         self.detection_thread.daemon = True
         self.detection_thread.start()
         
-        logger.info("Face detection service started")
+        logger.info(f"Face detection service started on camera {self.camera_id}")
     
     def stop(self):
         """Stop the face detection service"""
@@ -269,18 +474,19 @@ class FaceDetectionService:
             return
             
         self.running = False
+        get_detection_scheduler().unregister(self.schedule)
         
         if self.detection_thread and self.detection_thread.is_alive():
             self.detection_thread.join(timeout=2.0)
             
-        logger.info("Face detection service stopped")
+        logger.info(f"Face detection service stopped on camera {self.camera_id}")
     
     def _detection_loop(self):
         """Main detection loop that runs in a background thread"""
         from hardware import get_camera
         
-        # Get camera and recognizer instances
-        camera = get_camera()
+        # Get this service's camera and the recognizer shared by all cameras
+        camera = get_camera(self.camera_id)
         recognizer = get_face_recognizer()
         
         # Start camera if not already started
@@ -288,50 +494,159 @@ class FaceDetectionService:
             camera.start()
         
         # Main detection loop
-        last_detection_time = 0
+        last_seq = 0
         while self.running:
             try:
-                # Get current time
+                # Sleep until the adaptive schedule is due: fast while faces are in view, backing off when idle
+                self.schedule.wait()
+                if not self.running:
+                    break
+                
+                # Block until the camera captures a frame this loop has not seen yet,
+                # so a stale frame is never processed twice
+                frame_ref = camera.wait_for_frame(last_seq, timeout=1.0)
+                if frame_ref is None:
+                    continue
+                
                 current_time = time.time()
                 
-                # Check if it's time for next detection
-                if current_time - last_detection_time >= self.interval:
-                    # Update last detection time
-                    last_detection_time = current_time
-                    
-                    # Capture frame from camera
-                    frame = camera.get_frame()
-                    if frame is None:
-                        continue
-                    
-                    # Process frame to detect faces
-                    recognized_faces = recognizer.process_frame(frame)
+                with frame_ref, self._app_context():
+                    last_seq = frame_ref.seq
+                    self.frames_processed += 1
                     
-                    # Allow access for each recognized face with sufficient confidence
-                    for name, user_id, confidence, face_location in recognized_faces:
-                        logger.info(f"Recognized face: {name} with confidence: {confidence:.2f}")
-                        
-                        # Allow access
-                        recognizer.allow_access(user_id, name, frame, confidence)
+                    if self.detector:
+                        # Cascade on the gray view first; RGB is only converted when a face needs encoding
+                        active = self._process_tracked(frame_ref, recognizer, current_time)
+                    else:
+                        active = self._process_untracked(frame_ref, recognizer, current_time)
                 
-                # Sleep briefly to avoid hogging CPU
-                time.sleep(0.1)
+                self.schedule.record(active, time.time() - current_time)
                 
             except Exception as e:
                 logger.error(f"Error in face detection loop: {str(e)}")
                 time.sleep(1.0)  # Sleep longer on error
     
+    def _app_context(self):
+        if self.app is None:
+            return nullcontext()
+        return self.app.app_context()
+    
+    def _process_untracked(self, frame_ref, recognizer, now):
+        """
+        Detect, encode and match every face of a pinned frame with dlib
+        Without tracks, a person is granted access at most once per FACE_GRANT_COOLDOWN
+        Returns True if someone was granted access
+        """
+        # face_recognition works on RGB; the view is converted once per frame and shared
+        frame = frame_ref.rgb
+        
+        # Process frame to detect faces
+        if use_worker_pool():
+            # Detection and encoding run in a worker process, off this process's GIL
+            face_locations, face_encodings = get_worker_pool().run('face', frame)
+            recognized_faces = recognizer.process_encodings(face_locations, face_encodings)
+        else:
+            recognized_faces = recognizer.process_frame(frame, rgb=True)
+        
+        # Forget grants old enough for the same person to be let in again
+        self.recent_grants = {user: granted for user, granted in self.recent_grants.items()
+                              if now - granted < config.FACE_GRANT_COOLDOWN}
+        
+        # Allow access for each recognized face with sufficient confidence
+        granted = False
+        for name, user_id, confidence, face_location in recognized_faces:
+            # Someone waiting at the door is neither granted again nor counted as activity
+            if user_id in self.recent_grants:
+                continue
+            logger.info(f"Recognized face: {name} with confidence: {confidence:.2f}")
+            
+            # Allow access
+            recognizer.allow_access(user_id, name, frame_ref.bgr, confidence, self.camera_id, face_location)
+            self.recent_grants[user_id] = now
+            self.grants += 1
+            granted = True
+        
+        return granted
+    
+    def _process_tracked(self, frame_ref, recognizer, now):
+        """
+        Run one two-stage recognition step on a pinned frame
+        Grants access once per face track and identity
+        Returns True while any face is being tracked
+        """
+        regions = self.detector.detect(frame_ref.gray)
+        
+        # Associate this frame's face regions with existing tracks
+        assignments = self.tracker.associate(regions, now)
+        
+        # Faces identified recently are not encoded again
+        pending = [track for track, _ in assignments if self.tracker.needs_encoding(track, now)]
+        self.faces_skipped += len(assignments) - len(pending)
+        
+        if pending:
+            locations = [region_to_location(track.region) for track in pending]
+            frame = frame_ref.rgb
+            if use_worker_pool():
+                # Encoding runs in a worker process, off this process's GIL
+                face_encodings = get_worker_pool().run('face_encode', frame, locations)
+            else:
+                face_encodings = encode_faces(frame, locations)
+            
+            # None while the gallery is still loading; the tracks are retried on the next frame
+            matches = recognizer.identify_encodings(face_encodings)
+            if matches is not None:
+                self.faces_encoded += len(pending)
+                for track, match in zip(pending, matches):
+                    name, user_id, confidence = match or (None, None, 0.0)
+                    track.identify(user_id, name, confidence, now)
+        
+        for track, _ in assignments:
+            if track.user_id is None or track.granted_user_id == track.user_id:
+                continue
+            track.granted_user_id = track.user_id
+            self.grants += 1
+            logger.info(f"Recognized face: {track.name} with confidence: {track.confidence:.2f}")
+            
+            # Allow access
+            recognizer.allow_access(track.user_id, track.name, frame_ref.bgr, track.confidence, self.camera_id,
+                                    region_to_location(track.region))
+        
+        self.tracker.expire(now)
+        return bool(self.tracker.tracks)
+    
+    def get_stats(self):
+        """Return frame counters for the detection service"""
+        stats = {
+            'camera': self.camera_id,
+            'running': self.running,
+            'detector': 'cascade' if self.detector else 'hog',
+            'frames_processed': self.frames_processed,
+            'faces_encoded': self.faces_encoded,
+            'faces_skipped': self.faces_skipped,
+            'grants': self.grants,
+            'active_tracks': len(self.tracker.tracks)
+        }
+        if self.detector:
+            stats['cascade'] = self.detector.get_stats()
+        if self.schedule:
+            stats['schedule'] = self.schedule.get_stats()
+        return stats
+    
     def __del__(self):
         """Ensure the service is stopped when object is destroyed"""
         self.stop()
 
 
-# Singleton detection service instance for global use
-_detection_service = None
+# One detection service per camera, all sharing the global recognizer
+_detection_services = {}
+
+def get_face_detection_service(camera_id=None):
+    """Get the face detection service of a camera (the default camera if omitted), initializing if necessary"""
+    camera_id = camera_id or config.DEFAULT_CAMERA_ID
+    if camera_id not in _detection_services:
+        _detection_services[camera_id] = FaceDetectionService(camera_id)
+    return _detection_services[camera_id]
 
-def get_face_detection_service():
-    """Get the global face detection service instance, initializing if necessary"""
-    global _detection_service
-    if _detection_service is None:
-        _detection_service = FaceDetectionService()
-    return _detection_service
+def get_face_detection_services():
+    """Get all face detection services instantiated so far, keyed by camera id"""
+    return dict(_detection_services)
@@ -0,0 +1,286 @@
+import os
+import json
+import zlib
+import pickle
+import threading
+import logging
+import numpy as np
+import config
+from .face_gallery import ENCODING_LENGTH
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class FaceEncodingStore:
+    """
+    Packed on-disk store of face encodings
+
+    Encodings are appended as raw float32 rows to one binary file that is
+    memory-mapped at load time, next to a JSON manifest holding the Face.id of
+    every row and a CRC32 of the data. Removed faces only leave the manifest;
+    their rows are reclaimed once dead rows outnumber live ones
+    """
+
+    VERSION = 1
+
+    # Bytes per stored encoding
+    ROW_BYTES = ENCODING_LENGTH * 4
+
+    def __init__(self, data_path=None):
+        """Initialize the store at the given data path or the configured default"""
+        self.data_path = data_path or config.FACE_ENCODING_STORE_PATH
+        self.manifest_path = os.path.splitext(self.data_path)[0] + '.json'
+        self.lock = threading.Lock()
+
+        # Row -> Face.id (None for removed rows), Face.id -> row and the running data checksum
+        self.face_ids = []
+        self.rows = {}
+        self.checksum = 0
+        self._read_manifest()
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __contains__(self, face_id):
+        return face_id in self.rows
+
+    def _reset_locked(self):
+        """
+        Forget every stored encoding and empty the data file
+        Rows are only meaningful through the manifest; keeping stale bytes would
+        shift every later append and hand out another face's encoding
+        """
+        self.face_ids = []
+        self.rows = {}
+        self.checksum = 0
+        try:
+            if os.path.exists(self.data_path):
+                with open(self.data_path, 'r+b') as f:
+                    f.truncate(0)
+            self._write_manifest()
+        except Exception as e:
+            logger.error(f"Error resetting face encoding store: {str(e)}")
+
+    def _read_manifest(self):
+        """Read the manifest and check it against the data file; starts empty if either is unusable"""
+        if not os.path.exists(self.manifest_path):
+            if os.path.exists(self.data_path) and os.path.getsize(self.data_path):
+                logger.warning("Face encoding store has no manifest; its encodings will be regenerated")
+                self._reset_locked()
+            return
+
+        try:
+            with open(self.manifest_path, 'r') as f:
+                manifest = json.load(f)
+
+            if manifest.get('version') != self.VERSION or manifest.get('dimension') != ENCODING_LENGTH:
+                logger.warning("Face encoding store has an unknown format; its encodings will be regenerated")
+                self._reset_locked()
+                return
+
+            face_ids = manifest.get('face_ids', [])
+            size = os.path.getsize(self.data_path) if os.path.exists(self.data_path) else 0
+            expected = len(face_ids) * self.ROW_BYTES
+            if size < expected:
+                logger.warning("Face encoding store manifest does not match its data; "
+                               "its encodings will be regenerated")
+                self._reset_locked()
+                return
+            if size > expected:
+                # An append that crashed before its manifest was written; drop the orphaned bytes
+                with open(self.data_path, 'r+b') as f:
+                    f.truncate(expected)
+
+            self.face_ids = face_ids
+            self.rows = {face_id: row for row, face_id in enumerate(face_ids) if face_id is not None}
+            self.checksum = manifest.get('checksum', 0)
+
+        except Exception as e:
+            logger.error(f"Error reading face encoding store manifest: {str(e)}; "
+                         f"its encodings will be regenerated")
+            self._reset_locked()
+
+    def _write_manifest(self):
+        # Written to a temporary file and swapped in so a crash never leaves a torn manifest
+        manifest_tmp = self.manifest_path + '.tmp'
+        with open(manifest_tmp, 'w') as f:
+            json.dump({'version': self.VERSION, 'dimension': ENCODING_LENGTH,
+                       'checksum': self.checksum, 'face_ids': self.face_ids}, f)
+        os.replace(manifest_tmp, self.manifest_path)
+
+    def load(self):
+        """
+        Memory-map the store and verify its checksum
+        Returns a dict of Face.id -> encoding, where each encoding is a
+        read-only view into the mapped file; empty if the store is missing or corrupt
+        """
+        with self.lock:
+            if not self.face_ids:
+                return {}
+
+            try:
+                data = np.memmap(self.data_path, dtype=np.float32, mode='r',
+                                 shape=(len(self.face_ids), ENCODING_LENGTH))
+                if zlib.crc32(data) != self.checksum:
+                    logger.error("Face encoding store failed its checksum; encodings will be regenerated")
+                    # Release the mapping before truncating, then drop the rows so
+                    # the enrollment worker really encodes every face again
+                    del data
+                    self._reset_locked()
+                    return {}
+                return {face_id: data[row] for face_id, row in self.rows.items()}
+
+            except Exception as e:
+                logger.error(f"Error loading face encoding store: {str(e)}")
+                return {}
+
+    def get(self, face_id):
+        """Encoding of a single face, or None if it is not stored"""
+        with self.lock:
+            row = self.rows.get(face_id)
+            if row is None or row >= len(self.face_ids) or self.face_ids[row] != face_id:
+                return None
+            try:
+                with open(self.data_path, 'rb') as f:
+                    f.seek(row * self.ROW_BYTES)
+                    row_data = f.read(self.ROW_BYTES)
+                # A short read means the data file no longer holds this row
+                if len(row_data) != self.ROW_BYTES:
+                    logger.error(f"Face encoding store is missing the row of face {face_id}")
+                    return None
+                return np.frombuffer(row_data, dtype=np.float32).copy()
+            except Exception as e:
+                logger.error(f"Error reading face encoding {face_id}: {str(e)}")
+                return None
+
+    def append(self, face_id, encoding):
+        """Append the encoding of a face, superseding any earlier encoding for it"""
+        row_data = np.asarray(encoding, dtype=np.float32).reshape(ENCODING_LENGTH).tobytes()
+        with self.lock:
+            try:
+                with open(self.data_path, 'ab') as f:
+                    f.write(row_data)
+
+                previous = self.rows.get(face_id)
+                if previous is not None:
+                    self.face_ids[previous] = None
+                self.rows[face_id] = len(self.face_ids)
+                self.face_ids.append(face_id)
+
+                # CRC32 extends over appended bytes without rereading the file
+                self.checksum = zlib.crc32(row_data, self.checksum)
+                self._write_manifest()
+                return True
+
+            except Exception as e:
+                logger.error(f"Error storing face encoding {face_id}: {str(e)}")
+                return False
+
+    def remove(self, face_ids):
+        """Forget the encodings of the given faces; returns the number removed"""
+        with self.lock:
+            removed = 0
+            for face_id in face_ids:
+                row = self.rows.pop(face_id, None)
+                if row is not None:
+                    self.face_ids[row] = None
+                    removed += 1
+            if not removed:
+                return 0
+
+            try:
+                if len(self.face_ids) > 2 * len(self.rows):
+                    self._compact_locked()
+                else:
+                    self._write_manifest()
+            except Exception as e:
+                logger.error(f"Error updating face encoding store: {str(e)}")
+            return removed
+
+    def _compact_locked(self):
+        """Rewrite the data file with only the live rows"""
+        live = [(face_id, row) for row, face_id in enumerate(self.face_ids) if face_id is not None]
+        data = np.fromfile(self.data_path, dtype=np.float32).reshape(-1, ENCODING_LENGTH)
+        packed = np.ascontiguousarray(data[[row for _, row in live]], dtype=np.float32)
+
+        data_tmp = self.data_path + '.tmp'
+        with open(data_tmp, 'wb') as f:
+            f.write(packed.tobytes())
+        os.replace(data_tmp, self.data_path)
+
+        self.face_ids = [face_id for face_id, _ in live]
+        self.rows = {face_id: row for row, face_id in enumerate(self.face_ids)}
+        self.checksum = zlib.crc32(packed)
+        self._write_manifest()
+        logger.info(f"Compacted face encoding store to {len(self.face_ids)} encodings")
+
+
+# Global store instance
+_face_encoding_store = None
+_store_lock = threading.Lock()
+
+def get_face_encoding_store():
+    """Get the global face encoding store, initializing if necessary"""
+    global _face_encoding_store
+    with _store_lock:
+        if _face_encoding_store is None:
+            _face_encoding_store = FaceEncodingStore()
+        return _face_encoding_store
+
+
+class _EncodingUnpickler(pickle.Unpickler):
+    """Unpickler for legacy encoding files that only rebuilds numpy arrays"""
+
+    ALLOWED = {
+        ('numpy', 'ndarray'),
+        ('numpy', 'dtype'),
+        ('numpy.core.multiarray', '_reconstruct'),
+        ('numpy._core.multiarray', '_reconstruct'),
+    }
+
+    def find_class(self, module, name):
+        if (module, name) not in self.ALLOWED:
+            raise pickle.UnpicklingError(f"Refusing to load {module}.{name} from an encoding file")
+        return super().find_class(module, name)
+
+def migrate_legacy_encodings(store=None, remove_files=True):
+    """
+    Move per-face pickled *_encoding.dat files into the encoding store
+    Must run inside a Flask application context
+    Faces whose file is missing are marked pending so they are encoded again
+    Returns (migrated, failed) counts
+    """
+    from database import db, Face
+    from .enrollment import ENROLLMENT_PENDING
+
+    store = store or get_face_encoding_store()
+    migrated = failed = 0
+
+    for face in Face.query.filter(Face.encoding_path.isnot(None)).all():
+        path = face.encoding_path
+        if os.path.exists(path):
+            try:
+                with open(path, 'rb') as f:
+                    encoding = np.asarray(_EncodingUnpickler(f).load(), dtype=np.float32)
+                if encoding.size != ENCODING_LENGTH or not store.append(face.id, encoding):
+                    raise ValueError("not a face encoding")
+            except Exception as e:
+                logger.error(f"Could not migrate face encoding {path}: {str(e)}")
+                failed += 1
+                continue
+
+            if remove_files:
+                os.remove(path)
+            migrated += 1
+        else:
+            # Nothing to migrate; the enrollment worker encodes the image again
+            logger.warning(f"Face encoding {path} is missing; face {face.id} will be re-encoded")
+            face.enrollment_status = ENROLLMENT_PENDING
+            failed += 1
+
+        face.encoding_path = None
+
+    db.session.commit()
+    logger.info(f"Migrated {migrated} face encodings into {store.data_path} ({failed} failed)")
+    return migrated, failed
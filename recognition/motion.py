@@ -0,0 +1,117 @@
+import cv2
+import numpy as np
+import time
+import threading
+import logging
+import config
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class MotionDetector:
+    """
+    Cheap change detector used to gate the expensive recognition pipelines
+    Works on a downscaled grayscale copy of the frame against a running-average background
+    """
+
+    def __init__(self, width=None, pixel_threshold=None, min_area=None, roi=None,
+                 hold_time=None, learning_rate=None):
+        """Initialize motion detector with specified parameters or use defaults from config"""
+        self.width = width or config.MOTION_DOWNSCALE_WIDTH
+        self.pixel_threshold = pixel_threshold or config.MOTION_PIXEL_THRESHOLD
+        self.min_area = min_area if min_area is not None else config.MOTION_MIN_AREA
+        self.roi = roi if roi is not None else config.MOTION_ROI
+        self.hold_time = hold_time if hold_time is not None else config.MOTION_HOLD_TIME
+        self.learning_rate = learning_rate or config.MOTION_LEARNING_RATE
+        self.lock = threading.Lock()
+
+        self.background = None
+        self.mask = None
+        self.mask_area = 0
+        self.last_motion_time = 0
+
+        # Counters for frames that woke the recognizer versus frames that were skipped
+        self.frames_processed = 0
+        self.frames_skipped = 0
+        self.motion_events = 0
+
+    def _build_mask(self, shape):
+        """Rasterize the ROI polygon (normalized 0-1 coordinates) at the downscaled size"""
+        height, width = shape
+        if not self.roi:
+            self.mask = None
+            self.mask_area = height * width
+            return
+
+        points = np.array([[int(x * width), int(y * height)] for x, y in self.roi], dtype=np.int32)
+        self.mask = np.zeros((height, width), dtype=np.uint8)
+        cv2.fillPoly(self.mask, [points], 255)
+        self.mask_area = max(int(cv2.countNonZero(self.mask)), 1)
+
+    def detect(self, frame):
+        """
+        Compare the frame against the background model
+        Returns True if enough of the ROI changed
+        """
+        if frame is None:
+            return False
+
+        # Downscale first so every later step touches only a few thousand pixels
+        height = max(int(frame.shape[0] * self.width / frame.shape[1]), 1)
+        small = cv2.resize(frame, (self.width, height), interpolation=cv2.INTER_AREA)
+        if len(small.shape) == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        small = cv2.GaussianBlur(small, (5, 5), 0)
+
+        with self.lock:
+            # (Re)initialize the background on the first frame or a resolution change
+            if self.background is None or self.background.shape != small.shape:
+                self.background = small.astype(np.float32)
+                self._build_mask(small.shape)
+                return True
+
+            diff = cv2.absdiff(small, cv2.convertScaleAbs(self.background))
+            _, changed = cv2.threshold(diff, self.pixel_threshold, 255, cv2.THRESH_BINARY)
+            if self.mask is not None:
+                changed = cv2.bitwise_and(changed, self.mask)
+
+            # Slowly adapt to lighting changes and parked objects
+            cv2.accumulateWeighted(small, self.background, self.learning_rate)
+
+            return cv2.countNonZero(changed) / self.mask_area >= self.min_area
+
+    def should_process(self, frame, now=None):
+        """
+        Decide whether the expensive pipeline should run on this frame
+        Keeps waking it for hold_time seconds after the last motion so stopped vehicles are still read
+        """
+        now = now or time.time()
+
+        if self.detect(frame):
+            if now - self.last_motion_time > self.hold_time:
+                self.motion_events += 1
+            self.last_motion_time = now
+
+        if now - self.last_motion_time <= self.hold_time:
+            self.frames_processed += 1
+            return True
+
+        self.frames_skipped += 1
+        return False
+
+    def reset(self):
+        """Forget the background model"""
+        with self.lock:
+            self.background = None
+            self.mask = None
+            self.last_motion_time = 0
+
+    def get_stats(self):
+        """Return counters for skipped versus processed frames"""
+        return {
+            'frames_processed': self.frames_processed,
+            'frames_skipped': self.frames_skipped,
+            'motion_events': self.motion_events,
+            'last_motion_time': self.last_motion_time
+        }
@@ -0,0 +1,155 @@
+import cv2
+import numpy as np
+import os
+import logging
+import config
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Characters the classifier can produce
+PLATE_CHARACTERS = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
+
+class PlateCharacterClassifier:
+    """
+    Small nearest-neighbour classifier for segmented plate characters
+    Samples are loaded from PLATE_OCR_MODEL_PATH if present, otherwise
+    synthesized from OpenCV's built-in Hershey fonts
+    """
+
+    def __init__(self, model_path=None, glyph_size=None):
+        """Initialize classifier and load or synthesize its samples"""
+        self.model_path = model_path or config.PLATE_OCR_MODEL_PATH
+        self.glyph_size = tuple(glyph_size or config.PLATE_OCR_GLYPH_SIZE)
+        self.samples = None
+        self.labels = None
+
+        if self.model_path and os.path.exists(self.model_path):
+            self.load(self.model_path)
+        else:
+            self._synthesize()
+
+    def normalize_glyph(self, glyph):
+        """
+        Fit a binary glyph (white on black) into the canonical glyph size
+        keeping its aspect ratio, centred on a black canvas
+        """
+        width, height = self.glyph_size
+        h, w = glyph.shape[:2]
+        scale = min(width / w, height / h)
+        resized = cv2.resize(glyph, (max(int(w * scale), 1), max(int(h * scale), 1)),
+                             interpolation=cv2.INTER_AREA)
+
+        canvas = np.zeros((height, width), dtype=np.uint8)
+        y = (height - resized.shape[0]) // 2
+        x = (width - resized.shape[1]) // 2
+        canvas[y:y+resized.shape[0], x:x+resized.shape[1]] = resized
+        return canvas
+
+    def _features(self, glyphs):
+        """Zero-mean, unit-norm float32 feature rows so a dot product is a correlation"""
+        features = np.stack([glyph.astype(np.float32).reshape(-1) for glyph in glyphs])
+        features -= features.mean(axis=1, keepdims=True)
+        norms = np.linalg.norm(features, axis=1, keepdims=True)
+        return features / np.maximum(norms, 1e-6)
+
+    def _synthesize(self):
+        """Render every plate character in several fonts and weights as training samples"""
+        fonts = [cv2.FONT_HERSHEY_SIMPLEX, cv2.FONT_HERSHEY_DUPLEX,
+                 cv2.FONT_HERSHEY_TRIPLEX, cv2.FONT_HERSHEY_COMPLEX]
+        glyphs = []
+        labels = []
+        for character in PLATE_CHARACTERS:
+            for font in fonts:
+                for thickness in (2, 3, 5):
+                    canvas = np.zeros((120, 130), dtype=np.uint8)
+                    cv2.putText(canvas, character, (15, 95), font, 3, 255, thickness)
+
+                    # Crop to the ink so synthetic glyphs are framed like segmented ones
+                    x, y, w, h = cv2.boundingRect(canvas)
+                    glyphs.append(self.normalize_glyph(canvas[y:y+h, x:x+w]))
+                    labels.append(character)
+
+        self.samples = self._features(glyphs)
+        self.labels = np.array(labels)
+        logger.info(f"Synthesized {len(labels)} character samples for plate OCR")
+
+    def load(self, path):
+        """Load glyph samples and labels from an .npz file"""
+        data = np.load(path)
+        glyphs = [self.normalize_glyph(glyph) for glyph in data['glyphs']]
+        self.samples = self._features(glyphs)
+        self.labels = data['labels']
+        logger.info(f"Loaded {len(self.labels)} character samples from {path}")
+
+    def classify(self, glyphs):
+        """
+        Classify normalized glyphs in one batch
+        Returns a list of (character, confidence) tuples
+        """
+        if not glyphs:
+            return []
+        similarities = self._features(glyphs) @ self.samples.T
+        best = np.argmax(similarities, axis=1)
+        return [(str(self.labels[index]), float(similarities[row, index]))
+                for row, index in enumerate(best)]
+
+
+class PlateCharacterReader:
+    """Reads a plate string from a plate crop by segmenting and classifying its characters"""
+
+    def __init__(self, classifier=None):
+        """Initialize reader with a character classifier"""
+        self.classifier = classifier or PlateCharacterClassifier()
+
+    def segment(self, plate_image):
+        """
+        Split a grayscale or binary plate crop into character glyphs
+        Returns the normalized glyphs ordered left to right
+        """
+        if len(plate_image.shape) == 3:
+            plate_image = cv2.cvtColor(plate_image, cv2.COLOR_BGR2GRAY)
+
+        _, binary = cv2.threshold(plate_image, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+
+        # Characters must be white on black; plates are mostly light background
+        if cv2.countNonZero(binary) > binary.size // 2:
+            binary = cv2.bitwise_not(binary)
+
+        contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+        height, width = binary.shape
+        boxes = []
+        for contour in contours:
+            x, y, w, h = cv2.boundingRect(contour)
+
+            # Keep blobs shaped like characters; drops the plate border, bolts and noise
+            if not (0.3 * height <= h <= 0.95 * height):
+                continue
+            if not (0.01 * width <= w <= 0.2 * width):
+                continue
+            if not (0.1 <= float(w) / h <= 1.2):
+                continue
+            boxes.append((x, y, w, h))
+
+        boxes.sort(key=lambda box: box[0])
+        return [self.classifier.normalize_glyph(binary[y:y+h, x:x+w]) for x, y, w, h in boxes]
+
+    def read(self, plate_image):
+        """
+        Read the characters of a plate crop
+        Returns (plate string, mean character confidence)
+        """
+        if plate_image is None:
+            return '', 0.0
+
+        glyphs = self.segment(plate_image)
+        if len(glyphs) < config.PLATE_OCR_MIN_CHARACTERS:
+            return '', 0.0
+
+        results = self.classifier.classify(glyphs)
+        text = ''.join(character for character, _ in results)
+        confidence = sum(score for _, score in results) / len(results)
+        return text, max(confidence, 0.0)
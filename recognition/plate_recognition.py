@@ -4,9 +4,18 @@ import os
 import time
 import threading
 import logging
+from contextlib import nullcontext
 from pathlib import Path
 import config
-from database import find_vehicle_by_plate, get_all_vehicles, log_access
+from database import find_vehicle_by_plate, get_all_vehicles, get_plate_index
+from database.plate_index import fold_plate_string
+from .plate_templates import PlateTemplateMatcher
+from .template_cache import PlateTemplateCache
+from .motion import MotionDetector
+from .tracking import PlateTracker
+from .scheduler import get_detection_scheduler
+from .plate_ocr import PlateCharacterReader
+from .workers import get_worker_pool, use_worker_pool
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -22,54 +31,176 @@ class LicensePlateRecognizer:
         self.detector = None
         self.running = False
         self.lock = threading.Lock()
-        self.templates = {}
+        self.matcher = PlateTemplateMatcher()
+        self.templates_loaded = False
+        self.templates_attempted_at = 0.0
+        self.template_cache = PlateTemplateCache()
         
-        # Templates will be loaded on first use or when explicitly called
-        logger.info("Plate recognizer initialized; templates will be loaded when needed")
+        # Recognition mode: 'template' matches crops against stored images,
+        # 'ocr' reads characters and looks the string up in the plate index
+        self.mode = config.PLATE_RECOGNITION_MODE
+        self.reader = PlateCharacterReader() if self.mode == 'ocr' else None
+        
+        # Localization settings: detection ROI and coarse-to-fine search
+        self.roi = config.PLATE_DETECTION_ROI
+        self.coarse_to_fine = config.PLATE_COARSE_TO_FINE
+        self.coarse_scale = config.PLATE_COARSE_SCALE
+        self._roi_cache = {}
+        
+        # Templates are loaded by start_services, inside an application context
+        logger.info("Plate recognizer initialized; templates will be loaded at startup")
         
     def load_templates(self):
         """Load all registered license plate images as templates for matching"""
+        self.templates_attempted_at = time.time()
         try:
-            # Clear existing templates
-            self.templates = {}
-            
             # Import here to avoid circular imports
-            from flask import current_app
+            from flask import has_app_context
             
             # Check if we're in an application context
-            if not current_app._get_current_object():
+            if not has_app_context():
                 logger.warning("No Flask application context available to load templates")
                 return
             
+            # Reading characters only needs the plate index, not template images
+            if self.mode != 'template':
+                get_plate_index().ensure_loaded()
+                self.templates_loaded = True
+                logger.info(f"Using {len(get_plate_index())} indexed plates for {self.mode} recognition")
+                return
+            
             # Get all active vehicles from the database
-            from database import get_all_vehicles
             vehicles = get_all_vehicles(active_only=True)
             
-            # Load plate images for each vehicle
+            # Memory-map the compiled templates from the previous run
+            cached = self.template_cache.load()
+            
+            # Load plate images for each vehicle, decoding only rows whose source changed
+            entries = []
+            records = []
+            decoded = 0
             for vehicle in vehicles:
-                plate_images = []
                 for plate_image in vehicle.plate_images:
-                    # Check if file exists
-                    if os.path.exists(plate_image.file_path):
-                        try:
-                            # Load image
-                            img = cv2.imread(plate_image.file_path, cv2.IMREAD_GRAYSCALE)
-                            if img is not None:
-                                plate_images.append(img)
-                        except Exception as e:
-                            logger.error(f"Error loading plate image {plate_image.file_path}: {str(e)}")
-                
-                # Store plate images for this vehicle
-                if plate_images:
-                    self.templates[vehicle.license_plate] = plate_images
-                    logger.info(f"Loaded {len(plate_images)} template(s) for plate {vehicle.license_plate}")
+                    signature = PlateTemplateCache.source_signature(plate_image.file_path)
+                    if signature is None:
+                        continue
+                    
+                    record = {
+                        'id': plate_image.id,
+                        'vehicle_id': vehicle.id,
+                        'plate': vehicle.license_plate,
+                        'file_path': plate_image.file_path,
+                        'mtime': signature[0],
+                        'size': signature[1]
+                    }
+                    
+                    hit = cached.get(plate_image.id)
+                    if hit and all(hit[0].get(key) == record[key] for key in ('file_path', 'mtime', 'size')):
+                        img = hit[1]
+                    else:
+                        img = self._read_template(plate_image.file_path)
+                        if img is None:
+                            continue
+                        img = cv2.resize(img, config.PLATE_TEMPLATE_SIZE)
+                        decoded += 1
+                    
+                    entries.append((plate_image.id, vehicle.id, vehicle.license_plate, img))
+                    records.append(record)
+            
+            # Pre-size and stack all templates once so matching is a single batched operation
+            self.matcher.set_templates(entries)
+            self.templates_loaded = True
+            
+            logger.info(f"Loaded {len(entries)} templates for {len(vehicles)} vehicles "
+                        f"({decoded} decoded, {len(entries) - decoded} from cache)")
             
-            logger.info(f"Loaded templates for {len(self.templates)} license plates")
+            # Recompile the store only if something changed since it was written
+            if decoded or len(records) != len(cached) or any(
+                    cached[record['id']][0] != record for record in records):
+                self.template_cache.save(records, [img for _, _, _, img in entries])
             
         except Exception as e:
             logger.error(f"Error loading license plate templates: {str(e)}")
             # Initialize with empty templates
-            self.templates = {}
+            self.matcher.clear()
+    
+    def lookup_plate_string(self, text):
+        """
+        Resolve a read plate string to a registered license plate via the plate index
+        Returns (license_plate, distance), or (None, None) if nothing is close enough
+        """
+        # Allow as many edits as PLATE_MATCH_THRESHOLD leaves room for
+        max_distance = int(len(fold_plate_string(text)) * (1 - self.match_threshold))
+        matches = get_plate_index().closest(text, max_distance)
+        if not matches:
+            return None, None
+            
+        distance, _, license_plate = matches[0]
+        return license_plate, distance
+    
+    def _read_template(self, file_path, image_data=None):
+        """Decode a plate image as grayscale, from memory if the bytes are already at hand"""
+        try:
+            if image_data is not None:
+                buffer = np.frombuffer(image_data, dtype=np.uint8)
+                return cv2.imdecode(buffer, cv2.IMREAD_GRAYSCALE)
+            
+            # Check if file exists
+            if file_path and os.path.exists(file_path):
+                return cv2.imread(file_path, cv2.IMREAD_GRAYSCALE)
+        except Exception as e:
+            logger.error(f"Error loading plate image {file_path}: {str(e)}")
+        return None
+    
+    def add_plate_image(self, plate_image, image_data=None):
+        """
+        Add or replace a single PlateImage in the template index
+        Costs one image decode instead of a full reload
+        """
+        # A full load will pick the image up anyway
+        if not self.templates_loaded or self.mode != 'template':
+            return
+            
+        vehicle = plate_image.vehicle
+        if vehicle is None or not vehicle.is_active:
+            return
+            
+        img = self._read_template(plate_image.file_path, image_data)
+        if img is None:
+            logger.warning(f"Could not decode plate image {plate_image.file_path}")
+            return
+            
+        self.matcher.add(plate_image.id, vehicle.id, vehicle.license_plate, img)
+        logger.info(f"Added template {plate_image.id} for plate {vehicle.license_plate}")
+    
+    def remove_plate_image(self, plate_image_id):
+        """Remove a single PlateImage from the template index"""
+        if self.matcher.remove(plate_image_id):
+            logger.info(f"Removed template {plate_image_id}")
+    
+    def update_vehicle(self, vehicle):
+        """Bring the template index in line with an edited vehicle"""
+        if not self.templates_loaded:
+            return
+            
+        # Deactivated vehicles must no longer match
+        if not vehicle.is_active:
+            self.remove_vehicle(vehicle.id)
+            return
+            
+        # Re-key existing templates to the (possibly changed) plate string
+        self.matcher.rename_vehicle(vehicle.id, vehicle.license_plate)
+        
+        # A reactivated vehicle needs its images back in the index
+        for plate_image in vehicle.plate_images:
+            if plate_image.id not in self.matcher:
+                self.add_plate_image(plate_image)
+    
+    def remove_vehicle(self, vehicle_id):
+        """Remove all templates of a vehicle from the index"""
+        removed = self.matcher.remove_vehicle(vehicle_id)
+        if removed:
+            logger.info(f"Removed {removed} template(s) for vehicle {vehicle_id}")
     
     def preprocess(self, image):
         """Preprocess image for license plate detection"""
@@ -80,7 +211,7 @@ class LicensePlateRecognizer:
         if len(image.shape) == 3:
             gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
         else:
-            gray = image.copy()
+            gray = image
         
         # Apply bilateral filter to reduce noise while preserving edges
         filtered = cv2.bilateralFilter(gray, 11, 17, 17)
@@ -90,25 +221,47 @@ class LicensePlateRecognizer:
         
         return edges
     
-    def find_plate_region(self, image):
+    def _roi_geometry(self, shape):
         """
-        Attempt to find license plate regions in the image
-        Returns a list of potential license plate regions as (x, y, w, h)
+        Return the ROI bounding box (x, y, w, h) and polygon mask for a frame shape
+        The mask is None when no ROI polygon is configured
         """
-        if image is None:
-            return []
+        height, width = shape[:2]
+        if not self.roi:
+            return (0, 0, width, height), None
             
-        # Preprocess image
-        processed = self.preprocess(image)
-        if processed is None:
-            return []
-        
+        if shape[:2] not in self._roi_cache:
+            points = np.array([[int(x * width), int(y * height)] for x, y in self.roi], dtype=np.int32)
+            x, y, w, h = cv2.boundingRect(points)
+            
+            # Mask is relative to the bounding box crop
+            mask = np.zeros((h, w), dtype=np.uint8)
+            cv2.fillPoly(mask, [(points - [x, y]).astype(np.int32)], 255)
+            self._roi_cache[shape[:2]] = ((x, y, w, h), mask)
+            
+        return self._roi_cache[shape[:2]]
+    
+    def _edges(self, gray, mask=None):
+        """Preprocess a grayscale image and drop edges outside the ROI mask"""
+        processed = self.preprocess(gray)
+        if processed is not None and mask is not None:
+            if mask.shape != processed.shape:
+                mask = cv2.resize(mask, (processed.shape[1], processed.shape[0]),
+                                  interpolation=cv2.INTER_NEAREST)
+            processed = cv2.bitwise_and(processed, mask)
+        return processed
+    
+    def _contour_regions(self, processed, scale=1.0, limit=10):
+        """
+        Find plate-shaped contours in an edge image
+        Returns regions as (x, y, w, h) mapped back to unscaled coordinates
+        """
         # Find contours
         contours, _ = cv2.findContours(processed, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
         
         # Filter contours by size and shape
         plate_regions = []
-        for contour in sorted(contours, key=cv2.contourArea, reverse=True)[:10]:
+        for contour in sorted(contours, key=cv2.contourArea, reverse=True)[:limit]:
             # Get approximate polygon
             peri = cv2.arcLength(contour, True)
             approx = cv2.approxPolyDP(contour, 0.02 * peri, True)
@@ -119,10 +272,68 @@ class LicensePlateRecognizer:
                 
                 # Filter by aspect ratio (license plates are typically wider than tall)
                 aspect_ratio = float(w) / h
-                if 1.0 < aspect_ratio < 5.0 and w > 100 and h > 20:
-                    plate_regions.append((x, y, w, h))
+                if 1.0 < aspect_ratio < 5.0 and w > 100 * scale and h > 20 * scale:
+                    plate_regions.append((int(x / scale), int(y / scale), int(w / scale), int(h / scale)))
         
         return plate_regions
+    
+    def _refine_region(self, gray, region):
+        """
+        Re-localize a coarse region at full resolution inside a padded box
+        Falls back to the coarse region if no plate contour is found there
+        """
+        x, y, w, h = region
+        margin_x = int(w * config.PLATE_REFINE_MARGIN)
+        margin_y = int(h * config.PLATE_REFINE_MARGIN)
+        x0, y0 = max(x - margin_x, 0), max(y - margin_y, 0)
+        x1 = min(x + w + margin_x, gray.shape[1])
+        y1 = min(y + h + margin_y, gray.shape[0])
+        
+        processed = self._edges(gray[y0:y1, x0:x1])
+        refined = self._contour_regions(processed, limit=3) if processed is not None else []
+        if not refined:
+            return region
+            
+        rx, ry, rw, rh = refined[0]
+        return (rx + x0, ry + y0, rw, rh)
+    
+    def find_plate_region(self, image):
+        """
+        Attempt to find license plate regions in the image
+        Returns a list of potential license plate regions as (x, y, w, h)
+        """
+        if image is None:
+            return []
+            
+        # Convert once; every later stage works on grayscale
+        if len(image.shape) == 3:
+            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        else:
+            gray = image
+        
+        # Only search inside the configured detection ROI
+        (roi_x, roi_y, roi_w, roi_h), mask = self._roi_geometry(gray.shape)
+        roi = gray[roi_y:roi_y+roi_h, roi_x:roi_x+roi_w]
+        if roi.size == 0:
+            return []
+        
+        if self.coarse_to_fine and self.coarse_scale < 1.0:
+            # Localize candidates on a downscaled image, then refine each at full resolution
+            small = cv2.resize(roi, None, fx=self.coarse_scale, fy=self.coarse_scale,
+                               interpolation=cv2.INTER_AREA)
+            processed = self._edges(small, mask)
+            if processed is None:
+                return []
+            regions = [self._refine_region(roi, region)
+                       for region in self._contour_regions(processed, scale=self.coarse_scale)]
+        else:
+            processed = self._edges(roi, mask)
+            if processed is None:
+                return []
+            regions = self._contour_regions(processed)
+        
+        # Map back to frame coordinates
+        return [(x + roi_x, y + roi_y, w, h) for x, y, w, h in regions]
 
     def extract_plate(self, image, region):
         """Extract license plate from image using the given region"""
@@ -141,7 +352,7 @@ class LicensePlateRecognizer:
             plate_gray = plate.copy()
         
         # Resize to standard size for matching
-        plate_resized = cv2.resize(plate_gray, (240, 80))
+        plate_resized = cv2.resize(plate_gray, config.PLATE_TEMPLATE_SIZE)
         
         # Apply threshold to enhance contrast
         _, plate_threshold = cv2.threshold(plate_resized, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
@@ -156,34 +367,38 @@ class LicensePlateRecognizer:
         if plate_image is None:
             return None, 0.0
             
-        # Make sure templates are loaded
-        if not self.templates:
+        return self.match_plates([plate_image])[0]
+    
+    def match_plates(self, plate_images):
+        """
+        Match several plate images against all templates in one batched operation
+        Returns a list of (license_plate, confidence), one per plate image
+        """
+        if not plate_images:
+            return []
+            
+        # Templates are loaded at startup and later changes arrive incrementally;
+        # if that load failed, retry now and then rather than on every frame
+        if not self.templates_loaded and \
+                time.time() - self.templates_attempted_at >= config.PLATE_TEMPLATE_RETRY_INTERVAL:
             self.load_templates()
             
-        # If still no templates after loading attempt, return no match
-        if not self.templates:
+        if self.mode == 'ocr':
+            return [self.read_plate(plate_image) for plate_image in plate_images]
+            
+        return self.matcher.match(plate_images)
+    
+    def read_plate(self, plate_image):
+        """
+        Read a plate crop character by character and resolve it against registered plates
+        Returns (license_plate, confidence); near misses are penalized per edit
+        """
+        text, confidence = self.reader.read(plate_image)
+        license_plate, distance = self.lookup_plate_string(text)
+        if license_plate is None:
             return None, 0.0
-        
-        best_match = None
-        best_confidence = 0.0
-        
-        # For each template in the database
-        for license_plate, templates in self.templates.items():
-            # Try to match against each template for this plate
-            for template in templates:
-                # Resize template to match the extracted plate
-                template_resized = cv2.resize(template, (plate_image.shape[1], plate_image.shape[0]))
-                
-                # Apply template matching
-                result = cv2.matchTemplate(plate_image, template_resized, cv2.TM_CCOEFF_NORMED)
-                _, confidence, _, _ = cv2.minMaxLoc(result)
-                
-                # Update best match if this one is better
-                if confidence > best_confidence:
-                    best_confidence = confidence
-                    best_match = license_plate
-        
-        return best_match, best_confidence
+            
+        return license_plate, confidence * (1.0 - distance / max(len(text), 1))
     
     def recognize_plate(self, image):
         """
@@ -193,24 +408,23 @@ class LicensePlateRecognizer:
         if image is None:
             return None, 0.0, None, None
         
-        # Find potential plate regions
-        regions = self.find_plate_region(image)
+        # Find potential plate regions and extract a plate image from each
+        candidates = []
+        for region in self.find_plate_region(image):
+            plate_image = self.extract_plate(image, region)
+            if plate_image is not None:
+                candidates.append((plate_image, region))
         
-        # Extract and match each region
+        # Keep track of the best matching region
         best_match = None
         best_confidence = 0.0
         best_plate_image = None
         best_region = None
         
-        for region in regions:
-            # Extract plate
-            plate_image = self.extract_plate(image, region)
-            if plate_image is None:
-                continue
-            
-            # Match plate
-            license_plate, confidence = self.match_plate(plate_image)
-            
+        # Score every candidate region against the whole fleet at once
+        matches = self.match_plates([plate_image for plate_image, _ in candidates])
+        
+        for (plate_image, region), (license_plate, confidence) in zip(candidates, matches):
             # Update best match if this one is better
             if confidence > best_confidence:
                 best_confidence = confidence
@@ -231,92 +445,89 @@ class LicensePlateRecognizer:
             
             # Check confidence threshold
             if license_plate and confidence >= self.confidence_threshold:
-                try:
-                    # Import here to avoid circular imports
-                    from flask import current_app
-                    from database import find_vehicle_by_plate
-                    
-                    # Check if we're in an application context
-                    if current_app._get_current_object():
-                        # Look up vehicle in database
-                        vehicle = find_vehicle_by_plate(license_plate)
-                        # Return vehicle and recognition details
-                        return vehicle, confidence, plate_image, region
-                    else:
-                        logger.warning("No Flask application context available to find vehicle")
-                        return None, confidence, plate_image, region
-                except Exception as e:
-                    logger.error(f"Error finding vehicle: {str(e)}")
+                vehicle = self.find_vehicle(license_plate)
+                return vehicle, confidence, plate_image, region
             
             return None, confidence, plate_image, region
         except Exception as e:
             logger.error(f"Error in process_frame: {str(e)}")
             return None, 0.0, None, None
     
-    def allow_access(self, vehicle, frame, confidence):
-        """
-        Allow access to vehicle by activating the gate relay
-        Logs the access event in the database
-        """
+    def find_vehicle(self, license_plate):
+        """Look up the vehicle registered for a recognized license plate"""
         try:
+            # Import here to avoid circular imports
             from flask import current_app
-            from hardware import get_relay_controller
-            
-            # Convert frame to binary for storage
-            _, jpg_data = cv2.imencode('.jpg', frame)
-            binary_image = jpg_data.tobytes()
+            from database import find_vehicle_by_plate
             
             # Check if we're in an application context
-            if not current_app._get_current_object():
-                logger.warning("No Flask application context available to log access")
-                # Still try to open gate if vehicle is recognized
-                if vehicle:
-                    try:
-                        relay = get_relay_controller()
-                        relay.open_gate()
-                        return True
-                    except Exception as e:
-                        logger.error(f"Error activating gate relay: {str(e)}")
-                return False
-            
-            # Import here to avoid circular imports
-            from database import log_access
-            
+            if current_app._get_current_object():
+                # Look up vehicle in database
+                return find_vehicle_by_plate(license_plate)
+            else:
+                logger.warning("No Flask application context available to find vehicle")
+        except Exception as e:
+            logger.error(f"Error finding vehicle: {str(e)}")
+        return None
+    
+    def allow_access(self, vehicle, frame, confidence, camera_id=None, plate_image=None):
+        """
+        Allow access to vehicle by activating the relay of the camera's gate
+        The relay fires first; the access event is queued for the background writer
+        """
+        from hardware import get_camera_relay
+        from database import get_access_event_writer
+        
+        camera_id = camera_id or config.DEFAULT_CAMERA_ID
+        opened = False
+        
+        # Activate gate relay before anything touches the disk
+        if vehicle:
+            try:
+                relay = get_camera_relay(camera_id)
+                relay.open_gate()
+                opened = True
+            except Exception as e:
+                logger.error(f"Error activating gate relay: {str(e)}")
+        
+        # Log the attempt, authorized or not; images are encoded and written by the writer thread
+        try:
             if vehicle:
-                # Log authorized access
-                log_access(
+                get_access_event_writer().submit(
+                    frame=frame,
+                    crop=plate_image,
                     access_type='vehicle',
                     recognition_type='plate',
-                    image_data=binary_image,
                     vehicle_id=vehicle.id,
                     user_id=vehicle.owner_id,
                     is_authorized=True,
                     confidence_score=confidence,
-                    notes=f"License plate recognized: {vehicle.license_plate}"
+                    notes=f"License plate recognized: {vehicle.license_plate} on camera {camera_id}"
                 )
-                
-                # Activate gate relay
-                try:
-                    relay = get_relay_controller()
-                    relay.open_gate()
-                    return True
-                except Exception as e:
-                    logger.error(f"Error activating gate relay: {str(e)}")
-                    return False
             else:
-                # Log unauthorized access attempt
-                log_access(
+                get_access_event_writer().submit(
+                    frame=frame,
+                    crop=plate_image,
                     access_type='vehicle',
                     recognition_type='plate',
-                    image_data=binary_image,
                     is_authorized=False,
                     confidence_score=confidence,
-                    notes="Unrecognized license plate"
+                    notes=f"Unrecognized license plate on camera {camera_id}"
                 )
-                return False
         except Exception as e:
-            logger.error(f"Error in allow_access: {str(e)}")
-            return False
+            logger.error(f"Error queueing access event: {str(e)}")
+        
+        return opened
+
+
+def _resolve_app(app=None):
+    """The given Flask app, else the current one, else None (detection then runs without database access)"""
+    from flask import current_app, has_app_context
+    if app is None and has_app_context():
+        app = current_app._get_current_object()
+    if app is None:
+        logger.warning("No Flask application available; plate lookups will fail")
+    return app
 
 
 # Singleton recognizer instance for global use
@@ -333,24 +544,38 @@ def get_plate_recognizer():
 class PlateDetectionService:
     """Service for continuously detecting license plates from camera feed"""
     
-    def __init__(self, interval=None):
-        """Initialize plate detection service"""
+    def __init__(self, camera_id=None, interval=None):
+        """Initialize plate detection service for a camera (the default camera if omitted)"""
+        self.camera_id = camera_id or config.DEFAULT_CAMERA_ID
         self.interval = interval or config.PLATE_DETECTION_INTERVAL
         self.running = False
         self.detection_thread = None
+        self.app = None
+        self.schedule = None
+        self.motion_detector = MotionDetector() if config.PLATE_MOTION_GATING else None
+        self.tracker = PlateTracker()
+        self.frames_processed = 0
+        self.regions_matched = 0
+        self.regions_skipped = 0
+        self.decisions = 0
     
-    def start(self):
-        """Start the plate detection service"""
+    def start(self, app=None):
+        """
+        Start the plate detection service
+        Database lookups run in the application context of app (the current app if omitted)
+        """
         if self.running:
             logger.warning("Plate detection service is already running")
             return
             
+        self.app = _resolve_app(app)
         self.running = True
+        self.schedule = get_detection_scheduler().register(f'plate:{self.camera_id}', self.camera_id, self.interval)
         self.detection_thread = threading.Thread(target=self._detection_loop)
         self.detection_thread.daemon = True
         self.detection_thread.start()
         
-        logger.info("Plate detection service started")
+        logger.info(f"Plate detection service started on camera {self.camera_id}")
     
     def stop(self):
         """Stop the plate detection service"""
@@ -359,18 +584,19 @@ class PlateDetectionService:
             return
             
         self.running = False
+        get_detection_scheduler().unregister(self.schedule)
         
         if self.detection_thread and self.detection_thread.is_alive():
             self.detection_thread.join(timeout=2.0)
             
-        logger.info("Plate detection service stopped")
+        logger.info(f"Plate detection service stopped on camera {self.camera_id}")
     
     def _detection_loop(self):
         """Main detection loop that runs in a background thread"""
         from hardware import get_camera
         
-        # Get camera and recognizer instances
-        camera = get_camera()
+        # Get this service's camera and the recognizer shared by all cameras
+        camera = get_camera(self.camera_id)
         recognizer = get_plate_recognizer()
         
         # Start camera if not already started
@@ -378,54 +604,144 @@ class PlateDetectionService:
             camera.start()
         
         # Main detection loop
-        last_detection_time = 0
+        last_seq = 0
         while self.running:
             try:
-                # Get current time
+                # Sleep until the adaptive schedule is due: fast while something moves, backing off when idle
+                self.schedule.wait()
+                if not self.running:
+                    break
+                
+                # Block until the camera captures a frame this loop has not seen yet,
+                # so a stale frame is never processed twice
+                frame_ref = camera.wait_for_frame(last_seq, timeout=1.0)
+                if frame_ref is None:
+                    continue
+                
                 current_time = time.time()
                 
-                # Check if it's time for next detection
-                if current_time - last_detection_time >= self.interval:
-                    # Update last detection time
-                    last_detection_time = current_time
-                    
-                    # Capture frame from camera
-                    frame = camera.get_frame()
-                    if frame is None:
-                        continue
-                    
-                    # Process frame to detect license plate
-                    vehicle, confidence, plate_image, region = recognizer.process_frame(frame)
-                    
-                    # If vehicle is recognized with sufficient confidence, allow access
-                    if vehicle and confidence >= recognizer.confidence_threshold:
-                        logger.info(f"Recognized license plate: {vehicle.license_plate} "
-                                   f"with confidence: {confidence:.2f}")
-                        
-                        # Allow access
-                        recognizer.allow_access(vehicle, frame, confidence)
-                    
-                    elif confidence > 0:
-                        logger.info(f"Detected plate with insufficient confidence: {confidence:.2f}")
+                # A fresh application context per frame, so vehicle lookups see committed edits
+                with frame_ref, self._app_context():
+                    last_seq = frame_ref.seq
+                    active = self._process_frame(frame_ref, recognizer, current_time)
                 
-                # Sleep briefly to avoid hogging CPU
-                time.sleep(0.1)
+                self.schedule.record(active, time.time() - current_time)
                 
             except Exception as e:
                 logger.error(f"Error in plate detection loop: {str(e)}")
                 time.sleep(1.0)  # Sleep longer on error
     
+    def _app_context(self):
+        if self.app is None:
+            return nullcontext()
+        return self.app.app_context()
+    
+    def _process_frame(self, frame_ref, recognizer, now):
+        """
+        Run the pipeline on a pinned frame
+        Returns True if there was motion or a plate in view
+        """
+        # Plate detection only needs luma; a YUV420 capture provides it without conversion
+        gray = frame_ref.gray
+        
+        # Only wake the expensive recognizer when something moves, but keep
+        # ending tracks so a vehicle that stopped moving still gets its decision
+        if self.motion_detector and not self.motion_detector.should_process(gray, now):
+            self._act_on_decisions(frame_ref, recognizer, now)
+            return False
+        self.frames_processed += 1
+        
+        # Follow plate regions across frames and only match undecided tracks
+        self._process_tracked(frame_ref, recognizer, now)
+        
+        # Getting past the motion gate means motion (or its hold time) already
+        return bool(self.motion_detector) or bool(self.tracker.tracks)
+    
+    def _process_tracked(self, frame_ref, recognizer, now):
+        """
+        Run one tracked recognition step on a pinned frame
+        Emits at most one access decision per vehicle passage
+        """
+        frame = frame_ref.gray
+        if use_worker_pool():
+            # Localization and extraction run in a worker process, off this process's GIL
+            located = dict(get_worker_pool().run('plate', frame, source=frame_ref))
+            regions = list(located)
+        else:
+            located = None
+            regions = recognizer.find_plate_region(frame)
+        
+        # Associate this frame's plate regions with existing tracks
+        assignments = self.tracker.associate(regions, now)
+        
+        # Tracks that already reached a decision need no further matching
+        pending = [(track, region) for track, region in assignments if not track.decided]
+        self.regions_skipped += len(assignments) - len(pending)
+        
+        candidates = []
+        for track, region in pending:
+            if located is not None:
+                plate_image = located[region]
+            else:
+                plate_image = recognizer.extract_plate(frame, region)
+            if plate_image is not None:
+                candidates.append((track, plate_image))
+        
+        matches = recognizer.match_plates([plate_image for _, plate_image in candidates])
+        self.regions_matched += len(candidates)
+        
+        for (track, plate_image), (license_plate, confidence) in zip(candidates, matches):
+            track.vote(license_plate, confidence, plate_image)
+            if license_plate and confidence < recognizer.confidence_threshold:
+                logger.info(f"Detected plate with insufficient confidence: {confidence:.2f}")
+        
+        self._act_on_decisions(frame_ref, recognizer, now)
+    
+    def _act_on_decisions(self, frame_ref, recognizer, now):
+        """Act once per passage on conclusive votes and expire ended tracks"""
+        for decision in self.tracker.collect_decisions(now):
+            self.decisions += 1
+            vehicle = recognizer.find_vehicle(decision.license_plate)
+            if vehicle:
+                logger.info(f"Recognized license plate: {vehicle.license_plate} "
+                           f"with confidence: {decision.confidence:.2f} over {decision.votes} frame(s)")
+                
+                # Allow access; the color frame is only converted for the access log image
+                recognizer.allow_access(vehicle, frame_ref.bgr, decision.confidence, self.camera_id,
+                                        decision.plate_image)
+    
+    def get_stats(self):
+        """Return frame counters for the detection service"""
+        stats = {
+            'camera': self.camera_id,
+            'running': self.running,
+            'frames_processed': self.frames_processed,
+            'regions_matched': self.regions_matched,
+            'regions_skipped': self.regions_skipped,
+            'decisions': self.decisions,
+            'active_tracks': len(self.tracker.tracks)
+        }
+        if self.schedule:
+            stats['schedule'] = self.schedule.get_stats()
+        if self.motion_detector:
+            stats['motion'] = self.motion_detector.get_stats()
+        return stats
+    
     def __del__(self):
         """Ensure the service is stopped when object is destroyed"""
         self.stop()
 
 
-# Singleton detection service instance for global use
-_detection_service = None
+# One detection service per camera, all sharing the global recognizer
+_detection_services = {}
+
+def get_plate_detection_service(camera_id=None):
+    """Get the plate detection service of a camera (the default camera if omitted), initializing if necessary"""
+    camera_id = camera_id or config.DEFAULT_CAMERA_ID
+    if camera_id not in _detection_services:
+        _detection_services[camera_id] = PlateDetectionService(camera_id)
+    return _detection_services[camera_id]
 
-def get_plate_detection_service():
-    """Get the global plate detection service instance, initializing if necessary"""
-    global _detection_service
-    if _detection_service is None:
-        _detection_service = PlateDetectionService()
-    return _detection_service
+def get_plate_detection_services():
+    """Get all plate detection services instantiated so far, keyed by camera id"""
+    return dict(_detection_services)
@@ -0,0 +1,212 @@
+import cv2
+import numpy as np
+import threading
+import logging
+import config
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class PlateTemplateMatcher:
+    """
+    Holds every registered plate template as one contiguous float32 tensor
+    and scores candidate plates against the whole fleet in a single batched
+    normalized cross-correlation
+
+    Templates are keyed by PlateImage.id so single images can be added,
+    updated or removed without rebuilding the whole tensor
+    """
+
+    # Initial number of preallocated template rows
+    INITIAL_CAPACITY = 64
+
+    def __init__(self, size=None):
+        """Initialize an empty matcher for templates of the given (width, height)"""
+        self.size = tuple(size or config.PLATE_TEMPLATE_SIZE)
+        self.vector_length = self.size[0] * self.size[1]
+        self.lock = threading.Lock()
+        self._allocate(self.INITIAL_CAPACITY)
+
+    def _allocate(self, capacity):
+        """Reset to an empty index with room for the given number of templates"""
+        # Template tensor (capacity x width*height); only the first `count` rows are used
+        self.templates = np.empty((capacity, self.vector_length), dtype=np.float32)
+        self.means = np.empty(capacity, dtype=np.float32)
+        self.norms = np.empty(capacity, dtype=np.float32)
+        self.count = 0
+
+        # Per-row metadata and the PlateImage.id -> row lookup
+        self.plates = []
+        self.image_ids = []
+        self.vehicle_ids = []
+        self.rows = {}
+
+    def _grow(self, minimum):
+        """Grow the preallocated tensor geometrically so appends stay amortized O(1)"""
+        capacity = len(self.templates)
+        if minimum <= capacity:
+            return
+
+        while capacity < minimum:
+            capacity *= 2
+
+        templates = np.empty((capacity, self.vector_length), dtype=np.float32)
+        templates[:self.count] = self.templates[:self.count]
+        means = np.empty(capacity, dtype=np.float32)
+        means[:self.count] = self.means[:self.count]
+        norms = np.empty(capacity, dtype=np.float32)
+        norms[:self.count] = self.norms[:self.count]
+
+        self.templates, self.means, self.norms = templates, means, norms
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, image_id):
+        return image_id in self.rows
+
+    def prepare(self, image):
+        """Resize a grayscale image to the canonical size and flatten it to float32"""
+        if image.shape[1] != self.size[0] or image.shape[0] != self.size[1]:
+            image = cv2.resize(image, self.size)
+        return image.astype(np.float32).reshape(-1)
+
+    def _write_row(self, row, vector):
+        """Store a template vector and precompute the mean and norm of its centred form"""
+        mean = vector.mean()
+        self.templates[row] = vector
+        self.means[row] = mean
+        self.norms[row] = np.linalg.norm(vector - mean)
+
+    def set_templates(self, entries):
+        """
+        Replace all templates
+        entries is a list of (image_id, vehicle_id, license_plate, grayscale image)
+        """
+        # Prepare outside the lock so matching is not held up by resizing
+        vectors = [self.prepare(image) for _, _, _, image in entries]
+
+        with self.lock:
+            self._allocate(max(self.INITIAL_CAPACITY, len(entries)))
+            for (image_id, vehicle_id, license_plate, _), vector in zip(entries, vectors):
+                self._add_locked(image_id, vehicle_id, license_plate, vector)
+
+    def clear(self):
+        """Remove all templates"""
+        with self.lock:
+            self._allocate(self.INITIAL_CAPACITY)
+
+    def add(self, image_id, vehicle_id, license_plate, image):
+        """Add a template, replacing any existing template with the same image id"""
+        vector = self.prepare(image)
+        with self.lock:
+            self._add_locked(image_id, vehicle_id, license_plate, vector)
+
+    def _add_locked(self, image_id, vehicle_id, license_plate, vector):
+        row = self.rows.get(image_id)
+        if row is None:
+            self._grow(self.count + 1)
+            row = self.count
+            self.count += 1
+            self.rows[image_id] = row
+            self.plates.append(license_plate)
+            self.image_ids.append(image_id)
+            self.vehicle_ids.append(vehicle_id)
+        else:
+            self.plates[row] = license_plate
+            self.vehicle_ids[row] = vehicle_id
+
+        self._write_row(row, vector)
+
+    # Replacing the image of an existing PlateImage is the same operation as adding it
+    update = add
+
+    def remove(self, image_id):
+        """Remove the template for the given image id; returns True if it was present"""
+        with self.lock:
+            return self._remove_locked(image_id)
+
+    def _remove_locked(self, image_id):
+        row = self.rows.pop(image_id, None)
+        if row is None:
+            return False
+
+        # Move the last row into the hole so the used rows stay contiguous
+        last = self.count - 1
+        if row != last:
+            self.templates[row] = self.templates[last]
+            self.means[row] = self.means[last]
+            self.norms[row] = self.norms[last]
+            self.plates[row] = self.plates[last]
+            self.image_ids[row] = self.image_ids[last]
+            self.vehicle_ids[row] = self.vehicle_ids[last]
+            self.rows[self.image_ids[row]] = row
+
+        self.plates.pop()
+        self.image_ids.pop()
+        self.vehicle_ids.pop()
+        self.count = last
+        return True
+
+    def rename_vehicle(self, vehicle_id, license_plate):
+        """Update the license plate string of every template belonging to a vehicle"""
+        with self.lock:
+            for row, owner in enumerate(self.vehicle_ids):
+                if owner == vehicle_id:
+                    self.plates[row] = license_plate
+
+    def remove_vehicle(self, vehicle_id):
+        """Remove every template belonging to a vehicle; returns the number removed"""
+        with self.lock:
+            image_ids = [image_id for image_id, owner in zip(self.image_ids, self.vehicle_ids)
+                         if owner == vehicle_id]
+            for image_id in image_ids:
+                self._remove_locked(image_id)
+            return len(image_ids)
+
+    def score(self, candidates):
+        """
+        Score candidate plate images against every template
+        Returns (scores, plates) where scores is an (N templates x M candidates)
+        array of TM_CCOEFF_NORMED scores and plates labels its rows
+        """
+        # Stack candidates and centre them; a centred candidate makes the
+        # template mean drop out of the cross-correlation
+        stacked = np.stack([self.prepare(candidate) for candidate in candidates])
+        stacked -= stacked.mean(axis=1, keepdims=True)
+        candidate_norms = np.linalg.norm(stacked, axis=1)
+
+        # Rows are modified in place by add/remove, so score under the lock
+        with self.lock:
+            count = self.count
+            scores = self.templates[:count] @ stacked.T
+            denominator = np.outer(self.norms[:count], candidate_norms)
+            plates = list(self.plates)
+
+        # Flat images have no correlation with anything
+        scores = np.divide(scores, denominator, out=np.zeros_like(scores), where=denominator > 0)
+        return scores, plates
+
+    def match(self, candidates):
+        """
+        Find the best template for each candidate plate image
+        Returns a list of (license_plate, confidence) tuples, one per candidate
+        """
+        if not candidates:
+            return []
+
+        scores, plates = self.score(candidates)
+        if not plates:
+            return [(None, 0.0)] * len(candidates)
+
+        best_rows = np.argmax(scores, axis=0)
+
+        results = []
+        for column, row in enumerate(best_rows):
+            confidence = float(scores[row, column])
+            if confidence > 0:
+                results.append((plates[row], confidence))
+            else:
+                results.append((None, 0.0))
+        return results
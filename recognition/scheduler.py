@@ -0,0 +1,147 @@
+import time
+import threading
+import logging
+import config
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class PipelineSchedule:
+    """
+    Sampling schedule of one detection pipeline
+    Drops to the minimum interval as soon as its pipeline sees activity and
+    backs off exponentially towards the maximum interval while nothing happens
+    """
+
+    # Weight of the newest sample in the running mean of the processing cost
+    COST_SMOOTHING = 0.2
+
+    def __init__(self, scheduler, name, camera_id, min_interval, max_interval):
+        self.scheduler = scheduler
+        self.name = name
+        self.camera_id = camera_id
+        self.min_interval = min_interval
+        self.max_interval = max(max_interval, min_interval)
+        self.interval = self.max_interval
+        self.last_run = 0.0
+        self.mean_cost = 0.0
+        self.wakeup = threading.Event()
+
+        self.runs = 0
+        self.active_runs = 0
+
+    def wait(self):
+        """Sleep until the next sample is due; returns early when the pipeline is boosted or stopped"""
+        while True:
+            delay = self.last_run + self.interval * self.scheduler.stretch() - time.time()
+            if delay <= 0:
+                return
+            if self.wakeup.wait(delay):
+                self.wakeup.clear()
+                return
+
+    def record(self, active, cost, now=None):
+        """
+        Report one processed sample: whether the pipeline saw motion or a candidate,
+        and the seconds spent processing it
+        """
+        now = now or time.time()
+        self.last_run = now
+        self.runs += 1
+        self.mean_cost += self.COST_SMOOTHING * (cost - self.mean_cost)
+
+        if active:
+            self.active_runs += 1
+            self.interval = self.min_interval
+            self.scheduler.boost(self.camera_id, source=self)
+        else:
+            self.interval = min(self.interval * self.scheduler.backoff, self.max_interval)
+
+    def boost(self):
+        """Switch to the fast rate and wake the pipeline if it is waiting"""
+        self.interval = self.min_interval
+        self.wakeup.set()
+
+    def get_stats(self):
+        """Current interval, processing cost and activity counters"""
+        return {
+            'interval': round(self.interval, 3),
+            'mean_cost_ms': round(1000 * self.mean_cost, 2),
+            'runs': self.runs,
+            'active_runs': self.active_runs
+        }
+
+
+class DetectionScheduler:
+    """
+    Adaptive sampling shared by all detection pipelines
+    Each pipeline samples fast while its camera shows activity and slows down
+    exponentially while idle; when the pipelines together would use more than
+    the CPU budget, every interval is stretched by the same factor
+    """
+
+    def __init__(self, min_interval=None, backoff=None, cpu_budget=None):
+        """Initialize scheduler with specified parameters or use defaults from config"""
+        self.min_interval = min_interval or config.DETECTION_MIN_INTERVAL
+        self.backoff = backoff or config.DETECTION_BACKOFF
+        self.cpu_budget = cpu_budget or config.DETECTION_CPU_BUDGET
+        self.lock = threading.Lock()
+        self.schedules = []
+
+    def register(self, name, camera_id, max_interval, min_interval=None):
+        """Add a pipeline; returns its PipelineSchedule"""
+        schedule = PipelineSchedule(self, name, camera_id, min_interval or self.min_interval, max_interval)
+        with self.lock:
+            self.schedules.append(schedule)
+        return schedule
+
+    def unregister(self, schedule):
+        """Remove a pipeline and wake it so it can exit"""
+        with self.lock:
+            if schedule in self.schedules:
+                self.schedules.remove(schedule)
+        schedule.wakeup.set()
+
+    def boost(self, camera_id, source=None):
+        """Activity on a camera speeds up every pipeline watching it, e.g. faces after a moving car"""
+        with self.lock:
+            schedules = [schedule for schedule in self.schedules
+                         if schedule.camera_id == camera_id and schedule is not source]
+        for schedule in schedules:
+            if schedule.interval > schedule.min_interval:
+                schedule.boost()
+
+    def load(self):
+        """Seconds of detection work per second the pipelines would use at their current intervals"""
+        with self.lock:
+            schedules = list(self.schedules)
+        return sum(schedule.mean_cost / schedule.interval for schedule in schedules)
+
+    def stretch(self):
+        """Factor all intervals are multiplied by to stay within the CPU budget"""
+        return max(1.0, self.load() / self.cpu_budget)
+
+    def get_stats(self):
+        """Budget usage and per-pipeline schedules"""
+        with self.lock:
+            schedules = list(self.schedules)
+        return {
+            'cpu_budget': self.cpu_budget,
+            'load': round(self.load(), 3),
+            'stretch': round(self.stretch(), 2),
+            'pipelines': {schedule.name: schedule.get_stats() for schedule in schedules}
+        }
+
+
+# Global scheduler instance
+_detection_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def get_detection_scheduler():
+    """Get the global detection scheduler, initializing if necessary"""
+    global _detection_scheduler
+    with _scheduler_lock:
+        if _detection_scheduler is None:
+            _detection_scheduler = DetectionScheduler()
+        return _detection_scheduler
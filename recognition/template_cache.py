@@ -0,0 +1,112 @@
+import os
+import glob
+import json
+import uuid
+import logging
+import numpy as np
+import config
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+class PlateTemplateCache:
+    """
+    Compiled on-disk store of preprocessed plate templates
+
+    Templates are kept as one uint8 (N x height x width) .npy file that is
+    memory-mapped at startup, next to a JSON index holding the PlateImage id,
+    vehicle id, plate string and the source file's mtime and size per row
+
+    Every save writes a new, uniquely named data file; the index names the data
+    file it describes and is swapped in last, so a crash at any point leaves an
+    index that still matches its data
+    """
+
+    VERSION = 2
+
+    def __init__(self, cache_dir=None, size=None):
+        """Initialize the cache in the given directory or the configured default"""
+        self.cache_dir = cache_dir or config.PLATE_TEMPLATE_CACHE_DIR
+        self.size = tuple(size or config.PLATE_TEMPLATE_SIZE)
+        self.data_path = None  # data file named by the current index
+        self.index_path = os.path.join(self.cache_dir, 'plate_templates.json')
+
+    @staticmethod
+    def source_signature(file_path):
+        """Return (mtime, size) of a source image, or None if it is missing"""
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return None
+        return stat.st_mtime, stat.st_size
+
+    def load(self):
+        """
+        Memory-map the compiled templates
+        Returns a dict of image_id -> (record, template) where template is a
+        read-only view into the mapped file; empty if there is no valid cache
+        """
+        if not os.path.exists(self.index_path):
+            return {}
+
+        try:
+            with open(self.index_path, 'r') as f:
+                index = json.load(f)
+
+            if index.get('version') != self.VERSION or tuple(index.get('size', ())) != self.size:
+                logger.info("Plate template cache has an outdated format; it will be rebuilt")
+                return {}
+
+            data_path = os.path.join(self.cache_dir, os.path.basename(index.get('data_file', '')))
+            if not index.get('data_file') or not os.path.exists(data_path):
+                logger.warning("Plate template cache data file is missing; it will be rebuilt")
+                return {}
+
+            templates = np.load(data_path, mmap_mode='r')
+            records = index.get('entries', [])
+            if len(records) != len(templates):
+                logger.warning("Plate template cache index does not match its data; ignoring it")
+                return {}
+
+            self.data_path = data_path
+            return {record['id']: (record, templates[row]) for row, record in enumerate(records)}
+
+        except Exception as e:
+            logger.error(f"Error loading plate template cache: {str(e)}")
+            return {}
+
+    def save(self, records, templates):
+        """
+        Write the compiled templates and their index
+        records[i] describes templates[i], a canonical-size uint8 grayscale image
+        """
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+            width, height = self.size
+            data = np.empty((len(templates), height, width), dtype=np.uint8)
+            for row, template in enumerate(templates):
+                data[row] = template
+
+            # The data goes to a new file; swapping in the index that names it is the only commit point
+            data_file = f"plate_templates.{uuid.uuid4().hex}.npy"
+            data_path = os.path.join(self.cache_dir, data_file)
+            index_tmp = self.index_path + '.tmp'
+            with open(data_path, 'wb') as f:
+                np.save(f, data)
+            with open(index_tmp, 'w') as f:
+                json.dump({'version': self.VERSION, 'size': list(self.size), 'data_file': data_file,
+                           'entries': records}, f)
+            os.replace(index_tmp, self.index_path)
+            self.data_path = data_path
+
+            # Data files of earlier saves are unreachable now; open mappings stay valid after unlinking
+            for path in glob.glob(os.path.join(self.cache_dir, 'plate_templates*.npy')):
+                if path != data_path:
+                    os.remove(path)
+
+            logger.info(f"Saved {len(records)} plate templates to {data_path}")
+
+        except Exception as e:
+            logger.error(f"Error saving plate template cache: {str(e)}")
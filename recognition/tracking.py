@@ -0,0 +1,280 @@
+import time
+import itertools
+import logging
+import config
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def region_iou(a, b):
+    """Intersection over union of two (x, y, w, h) regions"""
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    ix = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    iy = max(0, min(ay + ah, by + bh) - max(ay, by))
+    intersection = ix * iy
+    union = aw * ah + bw * bh - intersection
+    return intersection / union if union > 0 else 0.0
+
+
+def merge_overlapping_regions(regions, iou_threshold, containment=0.8):
+    """
+    Non-maximum suppression for one frame's regions: a region overlapping a
+    larger one (IoU above the threshold, or mostly inside it) is dropped, e.g.
+    the inner and outer border contours of the same plate
+    Returns the kept regions in their original order
+    """
+    kept = []
+    for index in sorted(range(len(regions)), key=lambda i: regions[i][2] * regions[i][3], reverse=True):
+        x, y, w, h = regions[index]
+        duplicate = False
+        for other in kept:
+            ox, oy, ow, oh = regions[other]
+            ix = max(0, min(x + w, ox + ow) - max(x, ox))
+            iy = max(0, min(y + h, oy + oh) - max(y, oy))
+            if region_iou(regions[index], regions[other]) >= iou_threshold or \
+                    (w * h > 0 and ix * iy / (w * h) >= containment):
+                duplicate = True
+                break
+        if not duplicate:
+            kept.append(index)
+    return [regions[index] for index in sorted(kept)]
+
+
+class PlateTrack:
+    """A plate region followed across frames, with votes on its identity"""
+
+    def __init__(self, track_id, region, now):
+        self.track_id = track_id
+        self.region = region
+        self.first_seen = now
+        self.last_seen = now
+        self.frames = 0
+        self.votes = {}  # license plate -> [frame count, summed confidence]
+        self.decided = False
+        self.best_confidence = 0.0
+        self.best_plate_image = None
+
+    def vote(self, license_plate, confidence, plate_image=None):
+        """Record one frame's recognition result for this track"""
+        self.frames += 1
+        if not license_plate:
+            return
+
+        count, total = self.votes.get(license_plate, (0, 0.0))
+        self.votes[license_plate] = (count + 1, total + confidence)
+
+        if confidence > self.best_confidence:
+            self.best_confidence = confidence
+            self.best_plate_image = plate_image
+
+    def leader(self):
+        """Return (license_plate, votes, mean confidence) of the leading identity"""
+        if not self.votes:
+            return None, 0, 0.0
+        license_plate, (count, total) = max(self.votes.items(), key=lambda item: item[1][1])
+        return license_plate, count, total / count
+
+
+class PlateDecision:
+    """One decision per vehicle passage, emitted by the tracker"""
+
+    def __init__(self, track, license_plate, votes, confidence):
+        self.track_id = track.track_id
+        self.license_plate = license_plate
+        self.votes = votes
+        self.confidence = confidence
+        self.region = track.region
+        self.plate_image = track.best_plate_image
+
+    def __repr__(self):
+        return f'<PlateDecision {self.license_plate} ({self.votes} votes, {self.confidence:.2f})>'
+
+
+class RegionTracker:
+    """Associates (x, y, w, h) regions across frames with tracks of track_class"""
+
+    track_class = None
+
+    def __init__(self, iou_threshold, max_shift, timeout):
+        self.iou_threshold = iou_threshold
+        self.max_shift = max_shift
+        self.timeout = timeout
+        self.tracks = []
+        self._ids = itertools.count(1)
+
+    def _affinity(self, track, region):
+        """Association score between a track and a new region; 0 means no match"""
+        iou = region_iou(track.region, region)
+        if iou >= self.iou_threshold:
+            return iou
+
+        # Objects can move further than their own size between sparse samples;
+        # accept a nearby centre with a small score so overlaps still win
+        tx, ty, tw, th = track.region
+        rx, ry, rw, rh = region
+        dx = (tx + tw / 2) - (rx + rw / 2)
+        dy = (ty + th / 2) - (ry + rh / 2)
+        if (dx * dx + dy * dy) ** 0.5 <= self.max_shift * max(tw, rw):
+            return 0.01
+        return 0.0
+
+    def associate(self, regions, now=None):
+        """
+        Assign each region to an existing or new track
+        Overlapping regions of the same frame are merged first, so one object never starts two tracks
+        Returns a list of (track, region) pairs for the kept regions, in the order of regions
+        """
+        now = now or time.time()
+        regions = merge_overlapping_regions(regions, self.iou_threshold)
+
+        # Greedy one-to-one assignment by descending affinity
+        pairs = []
+        for region_index, region in enumerate(regions):
+            for track in self.tracks:
+                affinity = self._affinity(track, region)
+                if affinity > 0:
+                    pairs.append((affinity, region_index, track))
+        pairs.sort(key=lambda pair: pair[0], reverse=True)
+
+        assigned = {}
+        used_tracks = set()
+        for _, region_index, track in pairs:
+            if region_index in assigned or track.track_id in used_tracks:
+                continue
+            assigned[region_index] = track
+            used_tracks.add(track.track_id)
+
+        result = []
+        for region_index, region in enumerate(regions):
+            track = assigned.get(region_index)
+            if track is None:
+                track = self.track_class(next(self._ids), region, now)
+                self.tracks.append(track)
+            track.region = region
+            track.last_seen = now
+            result.append((track, region))
+        return result
+
+
+class PlateTracker(RegionTracker):
+    """
+    Associates plate regions across frames and votes on plate identity
+    so each vehicle passage produces a single decision
+    """
+
+    track_class = PlateTrack
+
+    def __init__(self, vote_frames=None, min_confidence=None, iou_threshold=None,
+                 max_shift=None, timeout=None, decision_grace=None):
+        """Initialize tracker with specified parameters or use defaults from config"""
+        super().__init__(iou_threshold or config.PLATE_TRACK_IOU_THRESHOLD,
+                         max_shift or config.PLATE_TRACK_MAX_SHIFT,
+                         timeout or config.PLATE_TRACK_TIMEOUT)
+        self.vote_frames = vote_frames or config.PLATE_VOTE_FRAMES
+        self.min_confidence = min_confidence if min_confidence is not None else config.PLATE_CONFIDENCE_THRESHOLD
+        self.decision_grace = decision_grace if decision_grace is not None else config.PLATE_TRACK_DECISION_GRACE
+        self.recent_decisions = {}  # license plate -> time of last decision
+
+    def _decide(self, track, now, final=False):
+        """Turn a track into a decision if its votes are conclusive"""
+        license_plate, count, confidence = track.leader()
+        if not license_plate or confidence < self.min_confidence:
+            return None
+        if count < self.vote_frames and not final:
+            return None
+
+        # A vehicle that flickers out of view and back is still the same passage;
+        # the duplicate track is settled so it stops matching, without extending the window
+        last = self.recent_decisions.get(license_plate)
+        if last is not None and now - last < self.timeout:
+            track.decided = True
+            return None
+
+        track.decided = True
+        self.recent_decisions[license_plate] = now
+        return PlateDecision(track, license_plate, count, confidence)
+
+    def collect_decisions(self, now=None):
+        """
+        Return decisions for tracks whose votes became conclusive or that just ended
+        and drop expired tracks; a track that ended long before this call (the
+        pipeline was not sampling) is dropped without a decision
+        """
+        now = now or time.time()
+        decisions = []
+
+        active = []
+        for track in self.tracks:
+            unseen = now - track.last_seen
+            expired = unseen > self.timeout
+            if not track.decided and unseen <= self.timeout + self.decision_grace:
+                decision = self._decide(track, now, final=expired)
+                if decision:
+                    decisions.append(decision)
+            if not expired:
+                active.append(track)
+        self.tracks = active
+
+        # Forget old decisions so the same vehicle can pass again later
+        self.recent_decisions = {plate: seen for plate, seen in self.recent_decisions.items()
+                                 if now - seen < self.timeout}
+
+        return decisions
+
+
+class FaceTrack:
+    """A face followed across frames, with the identity of its last encoding"""
+
+    def __init__(self, track_id, region, now):
+        self.track_id = track_id
+        self.region = region
+        self.first_seen = now
+        self.last_seen = now
+        self.attempts = 0
+        self.encoded_at = 0.0
+        self.user_id = None
+        self.name = None
+        self.confidence = 0.0
+        self.granted_user_id = None
+
+    def identify(self, user_id, name, confidence, now):
+        """Record the result of encoding and matching this face; user_id is None if unknown"""
+        self.attempts += 1
+        self.encoded_at = now
+        self.user_id = user_id
+        self.name = name
+        self.confidence = confidence
+
+
+class FaceTracker(RegionTracker):
+    """
+    Associates cheaply detected face regions across frames so the expensive
+    encoder only runs on new faces, faces still unidentified, and periodically
+    to re-verify a face that stays in view
+    """
+
+    track_class = FaceTrack
+
+    def __init__(self, refresh=None, attempts=None, iou_threshold=None, max_shift=None, timeout=None):
+        """Initialize tracker with specified parameters or use defaults from config"""
+        super().__init__(iou_threshold or config.FACE_TRACK_IOU_THRESHOLD,
+                         max_shift or config.FACE_TRACK_MAX_SHIFT,
+                         timeout or config.FACE_TRACK_TIMEOUT)
+        self.refresh = refresh or config.FACE_TRACK_REFRESH
+        self.attempts = attempts or config.FACE_TRACK_ATTEMPTS
+
+    def needs_encoding(self, track, now):
+        """True if the track's identity should be (re)computed on this frame"""
+        if track.encoded_at == 0.0:
+            return True
+        if track.user_id is None and track.attempts < self.attempts:
+            # An approaching face often only becomes recognizable after a few frames
+            return True
+        return now - track.encoded_at >= self.refresh
+
+    def expire(self, now=None):
+        """Drop tracks not seen for longer than the timeout"""
+        now = now or time.time()
+        self.tracks = [track for track in self.tracks if now - track.last_seen <= self.timeout]
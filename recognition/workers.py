@@ -0,0 +1,371 @@
+import collections
+import itertools
+import logging
+import multiprocessing
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+import numpy as np
+import config
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def _attach_shared_memory(name):
+    """Attach to a frame slot created by the parent process"""
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        # The parent owns the slot; keep this process's resource tracker from unlinking it on exit
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, 'shared_memory')
+    except Exception:
+        pass
+    return shm
+
+def _plate_task(frame, state):
+    """Locate plate regions in a grayscale or BGR frame and extract normalized plate crops"""
+    recognizer = state.get('plate')
+    if recognizer is None:
+        from recognition.plate_recognition import LicensePlateRecognizer
+        recognizer = state['plate'] = LicensePlateRecognizer()
+
+    results = []
+    for region in recognizer.find_plate_region(frame):
+        plate_image = recognizer.extract_plate(frame, region)
+        if plate_image is not None:
+            results.append((region, plate_image))
+    return results
+
+def _face_task(frame, state):
+    """Detect faces in an RGB frame and compute their encodings"""
+    from recognition.face_recognition import detect_and_encode_faces
+    return detect_and_encode_faces(frame, rgb=True)
+
+def _face_encode_task(frame, state, face_locations):
+    """Compute encodings for faces already located in an RGB frame"""
+    from recognition.face_recognition import encode_faces
+    return encode_faces(frame, face_locations)
+
+# Camera ring segments a worker keeps mapped; more than any ring has slots
+MAX_RING_ATTACHMENTS = 32
+
+TASK_HANDLERS = {
+    'plate': _plate_task,
+    'face': _face_task,
+    'face_encode': _face_encode_task
+}
+
+def _worker_main(task_queue, result_queue):
+    """Entry point of a recognition worker process"""
+    state = {}
+    attachments = {}  # slot -> shared memory currently backing it
+    ring_attachments = collections.OrderedDict()  # camera ring segment name -> shared memory
+
+    while True:
+        item = task_queue.get()
+        if item is None:
+            break
+
+        task_id, task, slot, segment_name, offset, shape, dtype, args = item
+        frame = None
+        try:
+            if slot is None:
+                # The frame is read straight from the camera's ring buffer
+                shm = ring_attachments.get(segment_name)
+                if shm is None:
+                    shm = ring_attachments[segment_name] = _attach_shared_memory(segment_name)
+                    # Segments of a reallocated ring are never used again
+                    while len(ring_attachments) > MAX_RING_ATTACHMENTS:
+                        ring_attachments.popitem(last=False)[1].close()
+                else:
+                    ring_attachments.move_to_end(segment_name)
+            else:
+                shm = attachments.get(slot)
+                if shm is None or shm.name != segment_name:
+                    # The parent reallocated the slot for a larger frame; drop the old segment
+                    if shm is not None:
+                        shm.close()
+                    shm = attachments[slot] = _attach_shared_memory(segment_name)
+
+            # Read-only view of the frame in shared memory; no copy is made
+            frame = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf, offset=offset)
+            frame.flags.writeable = False
+
+            result = TASK_HANDLERS[task](frame, state, *args)
+            frame = None
+            result_queue.put((task_id, slot, True, result))
+
+        except Exception as e:
+            frame = None
+            result_queue.put((task_id, slot, False, f"{type(e).__name__}: {str(e)}"))
+
+    for shm in list(attachments.values()) + list(ring_attachments.values()):
+        shm.close()
+
+
+class RecognitionWorkerPool:
+    """
+    Pool of recognition worker processes
+    Frames are handed over through shared memory slots, or read in place from a
+    camera ring buffer in shared memory (CAMERA_SHARED_MEMORY); results come back on a queue
+
+    Each task is sent to one worker and owns its slot until that worker
+    answers. Slots of a worker that dies, or hangs well past the task timeout,
+    are reclaimed and the worker is restarted
+    """
+
+    # A task outstanding this many task timeouts means its worker is hung
+    HANG_FACTOR = 3
+
+    def __init__(self, workers=None, timeout=None):
+        """Initialize worker pool with specified parameters or use defaults from config"""
+        self.workers = workers or config.RECOGNITION_WORKERS
+        self.timeout = timeout or config.RECOGNITION_TASK_TIMEOUT
+        self.context = multiprocessing.get_context(config.RECOGNITION_START_METHOD)
+        self.processes = []
+        self.task_queues = []
+        self.running = False
+        self.lock = threading.Lock()
+        self.collector_thread = None
+
+        # Two slots per worker lets one frame be copied in while another is processed
+        self.slots = [None] * (self.workers * 2)
+        self.free_slots = self._all_slots_free()
+
+        self.in_flight = {}  # task id -> (future, slot, worker, submitted at)
+        self._task_ids = itertools.count()
+        self.workers_restarted = 0
+
+    def _all_slots_free(self):
+        free_slots = queue.Queue()
+        for slot in range(len(self.slots)):
+            free_slots.put(slot)
+        return free_slots
+
+    def start(self):
+        """Start the worker processes and the result collector"""
+        with self.lock:
+            if self.running:
+                return
+
+            self.result_queue = self.context.Queue()
+            self.processes = [None] * self.workers
+            self.task_queues = [None] * self.workers
+            for worker in range(self.workers):
+                self._spawn_locked(worker)
+
+            self.running = True
+            self.collector_thread = threading.Thread(target=self._collect_results, args=(self.result_queue,))
+            self.collector_thread.daemon = True
+            self.collector_thread.start()
+
+        logger.info(f"Recognition worker pool started with {self.workers} processes")
+
+    def _spawn_locked(self, worker):
+        """Start (or replace) the worker process with the given index, with its own task queue"""
+        task_queue = self.context.Queue()
+        process = self.context.Process(target=_worker_main, args=(task_queue, self.result_queue))
+        process.daemon = True
+        process.start()
+        self.processes[worker] = process
+        self.task_queues[worker] = task_queue
+
+    def stop(self):
+        """Stop the worker processes and release shared memory"""
+        with self.lock:
+            if not self.running:
+                return
+            self.running = False
+
+        for task_queue in self.task_queues:
+            task_queue.put(None)
+        for process in self.processes:
+            process.join(timeout=2.0)
+            if process.is_alive():
+                process.terminate()
+
+        # Wake the collector so it notices the pool stopped
+        self.result_queue.put(None)
+        if self.collector_thread:
+            self.collector_thread.join(timeout=1.0)
+
+        with self.lock:
+            in_flight, self.in_flight = self.in_flight, {}
+            self.processes = []
+            self.task_queues = []
+
+            # No worker is left to read a slot, so a restarted pool starts with every slot free
+            self.free_slots = self._all_slots_free()
+
+            for slot, shm in enumerate(self.slots):
+                if shm is not None:
+                    shm.close()
+                    shm.unlink()
+                    self.slots[slot] = None
+
+        self._fail(in_flight.values(), "Recognition worker pool stopped")
+        logger.info("Recognition worker pool stopped")
+
+    def _slot_for(self, slot, nbytes):
+        """
+        Return the shared memory of a slot, (re)allocating it if it is too small
+        Workers notice the new segment name and detach from the old one
+        """
+        shm = self.slots[slot]
+        if shm is None or shm.size < nbytes:
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+            shm = self.slots[slot] = shared_memory.SharedMemory(create=True, size=nbytes)
+        return shm
+
+    def submit(self, task, frame, *args, source=None):
+        """
+        Queue a recognition task on a frame, with extra picklable task arguments
+        source is the pinned FrameRef the frame came from; if the frame lies in
+        the camera's shared memory, workers read it there and nothing is copied.
+        The task holds its own pin on the slot until its future resolves, so a
+        caller that gives up waiting may release source right away
+        Returns a Future resolved with the task result
+        """
+        if not self.running:
+            self.start()
+
+        location = source.shared_location(frame) if source is not None else None
+        pin = source.retain() if location is not None else None
+        if pin is not None:
+            segment_name, offset = location
+            try:
+                future = self._dispatch(task, None, segment_name, offset, frame, args)
+            except Exception:
+                pin.release()
+                raise
+            # The camera may only reuse the slot once the worker is done with it
+            future.add_done_callback(lambda _: pin.release())
+            return future
+
+        free_slots = self.free_slots
+        slot = free_slots.get(timeout=self.timeout)
+        try:
+            shm = self._slot_for(slot, frame.nbytes)
+
+            # The only copy: camera frame into the shared slot
+            np.ndarray(frame.shape, dtype=frame.dtype, buffer=shm.buf)[...] = frame
+        except Exception:
+            free_slots.put(slot)
+            raise
+
+        return self._dispatch(task, slot, shm.name, 0, frame, args, free_slots)
+
+    def _dispatch(self, task, slot, segment_name, offset, frame, args, free_slots=None):
+        """Hand a task on a frame in shared memory to the least busy worker; slot is None for ring frames"""
+        future = Future()
+        with self.lock:
+            # A stop in the meantime already marked every slot free again
+            if not self.running or (free_slots is not None and free_slots is not self.free_slots):
+                raise RuntimeError("Recognition worker pool stopped")
+
+            task_id = next(self._task_ids)
+            worker = self._least_busy_locked()
+            self.in_flight[task_id] = (future, slot, worker, time.time())
+            self.task_queues[worker].put((task_id, task, slot, segment_name, offset,
+                                          frame.shape, frame.dtype.str, args))
+        return future
+
+    def _least_busy_locked(self):
+        """Index of the worker with the fewest tasks in flight"""
+        load = [0] * len(self.processes)
+        for _, _, worker, _ in self.in_flight.values():
+            load[worker] += 1
+        return load.index(min(load))
+
+    def run(self, task, frame, *args, source=None):
+        """Run a recognition task in a worker process and wait for its result"""
+        return self.submit(task, frame, *args, source=source).result(timeout=self.timeout)
+
+    def _collect_results(self, result_queue):
+        """Resolve futures as results arrive from the workers, and watch for dead workers"""
+        last_check = time.time()
+        while self.running:
+            try:
+                item = result_queue.get(timeout=1.0)
+            except queue.Empty:
+                item = False
+            if item is None:
+                break
+
+            if item:
+                task_id, slot, ok, payload = item
+                with self.lock:
+                    task = self.in_flight.pop(task_id, None)
+                    if task is not None and slot is not None:
+                        self.free_slots.put(slot)
+
+                # Tasks of a restarted worker were already failed and their slots reclaimed
+                if task is not None and not task[0].done():
+                    if ok:
+                        task[0].set_result(payload)
+                    else:
+                        task[0].set_exception(RuntimeError(payload))
+
+            if time.time() - last_check >= 1.0:
+                last_check = time.time()
+                self._check_workers()
+
+    def _check_workers(self):
+        """Fail the tasks of dead or hung workers, reclaim their slots and restart the workers"""
+        now = time.time()
+        failed = []
+        with self.lock:
+            if not self.running:
+                return
+
+            for worker, process in enumerate(self.processes):
+                tasks = [task_id for task_id, (_, _, owner, _) in self.in_flight.items() if owner == worker]
+                hung = any(now - self.in_flight[task_id][3] > self.HANG_FACTOR * self.timeout
+                           for task_id in tasks)
+                if process.is_alive() and not hung:
+                    continue
+
+                if process.is_alive():
+                    logger.warning(f"Recognition worker {process.pid} is hung; terminating it")
+                    process.terminate()
+                    process.join(timeout=1.0)
+                else:
+                    logger.warning(f"Recognition worker {process.pid} died with exit code {process.exitcode}")
+
+                # The worker is gone, so nothing reads its slots any more
+                for task_id in tasks:
+                    task = self.in_flight.pop(task_id)
+                    if task[1] is not None:
+                        self.free_slots.put(task[1])
+                    failed.append(task)
+
+                self._spawn_locked(worker)
+                self.workers_restarted += 1
+
+        self._fail(failed, "Recognition worker died")
+
+    @staticmethod
+    def _fail(tasks, message):
+        for future, _, _, _ in tasks:
+            if not future.done():
+                future.set_exception(RuntimeError(message))
+
+
+# Singleton worker pool instance for global use
+_worker_pool = None
+
+def get_worker_pool():
+    """Get the global recognition worker pool, initializing if necessary"""
+    global _worker_pool
+    if _worker_pool is None:
+        _worker_pool = RecognitionWorkerPool()
+    return _worker_pool
+
+def use_worker_pool():
+    """True if recognition should run in worker processes instead of threads"""
+    return config.RECOGNITION_EXECUTION_MODE == 'process'